@@ -0,0 +1,116 @@
+"""
+Compares finding the latest PUB scene of a shot's department by listing the
+department folder and parsing every file name, as farm and review tools did,
+against one lookup in the project's save ledger.
+
+Every shot gets the same department files, a third of them tagged PUB, and all
+of them are recorded in the ledger first.
+
+Usage:
+    python benchmarks/bench_ledger.py [episodes] [sequences] [shots] [departments] [files]
+"""
+import os
+import sys
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_saver_core import SaveLedger, compile_name_format, list_files, version_from_token
+from synthetic import DEPARTMENTS, make_project
+
+REPEAT = 5
+NAME_FORMAT = "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}"
+
+def shots(episodes, sequences, shot_count):
+    """
+    (ep, sq, sh) folder names of every shot, as make_project names them
+    """
+    return [(f"EP{ep:03d}", f"SQ{sq:03d}", f"SH{sh:04d}") for ep in range(1, episodes + 1)
+            for sq in range(1, sequences + 1) for sh in range(1, shot_count + 1)]
+
+def tag_files(root, shot_names, departments):
+    """
+    Rename every third scene to a PUB and record them all in the ledger
+    """
+    ledger = SaveLedger(root)
+    saves = []
+    for ep, sq, sh in shot_names:
+        for dept in DEPARTMENTS[:departments]:
+            dept_folder = os.path.join(root, ep, sq, sh, dept)
+            for n, file_name in enumerate(sorted(list_files(dept_folder))):
+                if n % 3 == 0:
+                    os.rename(os.path.join(dept_folder, file_name), os.path.join(dept_folder, file_name.replace("_WIP_", "_PUB_")))
+                    file_name = file_name.replace("_WIP_", "_PUB_")
+                fields = compile_name_format(NAME_FORMAT).parse(file_name)
+                entry = {"version": fields["ver"], "tag": fields["tag"], "artist": "bench",
+                         "timestamp": f"20260101_{n:06d}", "format": fields["ftype"]}
+                saves.append((os.path.join(dept_folder, file_name), entry, fields))
+    ledger.record_many(saves)
+    ledger.close()
+
+def latest_by_listing(root, ep, sq, sh, dept, tag):
+    template = compile_name_format(NAME_FORMAT)
+    dept_folder = os.path.join(root, ep, sq, sh, dept)
+    best = None
+    for file_name in list_files(dept_folder):
+        fields = template.parse(file_name)
+        if fields and fields["tag"] == tag:
+            version = version_from_token(fields["ver"])
+            if best is None or version > best[0]:
+                best = (version, os.path.join(dept_folder, file_name))
+    return best[1] if best else None
+
+def latest_from_ledger(ledger, ep, sq, sh, dept, tag):
+    save = ledger.latest(ep, sq, sh, dept, (tag,))
+    return save["path"] if save else None
+
+def timed(lookup, queries):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        results = [lookup(*query) for query in queries]
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), results
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compare finding the latest PUB by listing folders with a ledger lookup")
+    parser.add_argument("episodes", type=int, nargs="?", default=4, help="Episodes (default: 4)")
+    parser.add_argument("sequences", type=int, nargs="?", default=8, help="Sequences per episode (default: 8)")
+    parser.add_argument("shots", type=int, nargs="?", default=20, help="Shots per sequence (default: 20)")
+    parser.add_argument("departments", type=int, nargs="?", default=6, help="Departments per shot (default: 6)")
+    parser.add_argument("files", type=int, nargs="?", default=30, help="Scenes per department (default: 30)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    episodes, sequences, shot_count, departments, files = args.episodes, args.sequences, args.shots, args.departments, args.files
+    root = tempfile.mkdtemp(prefix="scene_saver_bench_")
+
+    try:
+        project_root = os.path.join(root, "Show")
+        make_project(project_root, episodes, sequences, shot_count, departments, files=files, age=0)
+        shot_names = shots(episodes, sequences, shot_count)
+        tag_files(project_root, shot_names, departments)
+        dept = DEPARTMENTS[min(departments, len(DEPARTMENTS)) - 1]
+        queries = [(ep, sq, sh, dept, "PUB") for ep, sq, sh in shot_names]
+        print(f"Project: {len(queries)} shots x {departments} departments x {files} scenes, latest PUB of every shot")
+
+        listing, expected = timed(lambda *query: latest_by_listing(project_root, *query), queries)
+        ledger = SaveLedger(project_root)
+        looked_up, results = timed(lambda *query: latest_from_ledger(ledger, *query), queries)
+        assert results == expected
+
+        print(f"listing {listing * 1000:9.1f} ms  {listing / len(queries) * 1e6:7.1f} us per shot")
+        print(f"ledger  {looked_up * 1000:9.1f} ms  {looked_up / len(queries) * 1e6:7.1f} us per shot")
+        print(f"The ledger answers {listing / looked_up:.1f}x faster")
+        ledger.close()
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
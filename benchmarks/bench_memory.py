@@ -0,0 +1,148 @@
+"""
+Compares the memory held by the project index for very large projects: the
+former dict of relative path -> list of names (plus a dict of mtimes) against
+the compact node store of ProjectIndex, and the project dict built from it.
+
+The crawl is simulated in memory, batch by batch in the breadth first order of
+ProjectIndex.iter_scan, so million folder projects can be measured without
+creating them on disk. Every name is a fresh string, as os.scandir returns them.
+
+Usage:
+    python benchmarks/bench_memory.py [folders ...]    (default: 100000 1000000)
+"""
+import os
+import sys
+import argparse
+import gc
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_saver_core import ProjectIndex, join_rel
+from synthetic import DEPARTMENTS, NOISE_FOLDERS
+
+EPISODES, SEQUENCES, SHOTS = 10, 20, 50
+BATCH_SIZE = 500
+
+def fresh(name):
+    """
+    A new string object equal to name, like each entry of a directory listing
+    """
+    return (name + ".")[:-1]
+
+def project_shape(folders):
+    """
+    Department and cache folder counts that bring an episodic project close to the wanted number of folders
+    """
+    shot_folders = EPISODES * SEQUENCES * SHOTS
+    base = 1 + EPISODES + EPISODES * SEQUENCES + shot_folders
+    departments = max(1, min(len(DEPARTMENTS), (folders - base) // shot_folders))
+    noise = max(0, (folders - base - shot_folders * departments) // (shot_folders * departments))
+    return departments, noise
+
+def sub_folder_names(rel_path, departments, noise):
+    depth = rel_path.count(os.sep) + 1 if rel_path else 0
+    if depth == 0:
+        return [f"EP{ep:03d}" for ep in range(1, EPISODES + 1)]
+    if depth == 1:
+        return [f"SQ{sq:03d}" for sq in range(1, SEQUENCES + 1)]
+    if depth == 2:
+        return [f"SH{sh:04d}" for sh in range(1, SHOTS + 1)]
+    if depth == 3:
+        return sorted(fresh(name) for name in DEPARTMENTS[:departments])
+    if depth == 4:
+        return sorted(fresh(NOISE_FOLDERS[n % len(NOISE_FOLDERS)]) + (f"_{n // len(NOISE_FOLDERS)}" if n >= len(NOISE_FOLDERS) else "")
+                      for n in range(noise))
+    return []
+
+def simulated_batches(folders):
+    """
+    Yield {rel_path: (mtime, sub_folders)} batches of a synthetic project of about that many folders
+    """
+    departments, noise = project_shape(folders)
+    mtime = time.time_ns() - 60 * 10 ** 9
+    pending = [""]
+    batch = {}
+
+    while pending:
+        next_level = []
+        for rel_path in pending:
+            sub_folders = sub_folder_names(rel_path, departments, noise)
+            mtime += 1
+            batch[rel_path] = (mtime, sub_folders)
+            next_level.extend(join_rel(rel_path, name) for name in sub_folders)
+
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = {}
+        pending = next_level
+
+    if batch:
+        yield batch
+
+def legacy_index(folders):
+    """
+    The former ProjectIndex storage: a list of names and an mtime per relative path
+    """
+    children, mtimes = {}, {}
+    for batch in simulated_batches(folders):
+        for rel_path, (mtime, sub_folders) in batch.items():
+            mtimes[rel_path] = mtime
+            children[rel_path] = sub_folders
+    return children, mtimes
+
+def compact_index(folders):
+    index = ProjectIndex(os.path.join(os.sep, "projects", "Show"))
+    for batch in simulated_batches(folders):
+        index.merge(batch)
+    return index
+
+def measure(build):
+    """
+    (result, bytes still held, peak bytes while building)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+def megabytes(size):
+    return f"{size / 1024 / 1024:8.1f} MB"
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compare the memory held by the former folder dicts and the compact project index")
+    parser.add_argument("folders", type=int, nargs="*", default=[100000, 1000000],
+                        help="Folder counts of the simulated projects (default: 100000 1000000)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sizes = args.folders
+
+    for folders in sizes:
+        departments, noise = project_shape(folders)
+        print(f"~{folders} folders: {EPISODES} episodes x {SEQUENCES} sequences x {SHOTS} shots x "
+              f"{departments} departments x {noise} cache folders")
+
+        (children, mtimes), legacy_bytes, legacy_peak = measure(lambda: legacy_index(folders))
+        count = len(children)
+        del children, mtimes
+
+        index, compact_bytes, compact_peak = measure(lambda: compact_index(folders))
+        _, project_dict_bytes, _ = measure(index.to_project_dict)
+        assert index.folder_count() == count
+
+        print(f"  dict of paths  {megabytes(legacy_bytes)} held, {megabytes(legacy_peak)} peak, "
+              f"{legacy_bytes / count:6.0f} bytes per folder")
+        print(f"  node store     {megabytes(compact_bytes)} held, {megabytes(compact_peak)} peak, "
+              f"{compact_bytes / count:6.0f} bytes per folder")
+        print(f"  project dict   {megabytes(project_dict_bytes)} held ({EPISODES * SEQUENCES * SHOTS} shots)")
+        print(f"  {count} folders, the node store holds {legacy_bytes / compact_bytes:.1f}x less")
+        del index
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compares crawling a project with the former substring heuristic ("ep", "sq" or "sh"
+anywhere in the name, every folder listed) against the default hierarchy rules,
+which prune department contents, caches and renders.
+
+The synthetic project gets a few decoy folders ("prep", "shared") that the
+heuristic mistakes for episodes and shots.
+
+Usage:
+    python benchmarks/bench_rules.py [episodes] [sequences] [shots] [departments] [noise levels]
+"""
+import os
+import sys
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_saver_core import ProjectIndex, HierarchyRules
+from synthetic import backdate, make_project
+
+REPEAT = 5
+DECOY_FOLDERS = ("prep/references", "EP001/SQ001/shared", "EP001/sequence_notes")
+
+def heuristic_rules():
+    """
+    Rules behaving like the former substring tests: any name containing the prefix, nothing pruned
+    """
+    return HierarchyRules(episode=".*ep", sequence=".*sq", shot=".*sh", ignore=(), department_depth=None)
+
+def timed_scan(root, rules, previous=None):
+    """
+    (median seconds, index) of crawling the project with these rules
+    """
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        index = ProjectIndex(root, rules).scan(previous=previous)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), index
+
+def run(label, root, rules):
+    seconds, index = timed_scan(root, rules)
+    cached_seconds, _ = timed_scan(root, rules, previous=index)
+
+    episodes = index.to_project_dict()[index.project_name]
+    shots = sum(len(shots) for sequences in episodes.values() for shots in sequences.values())
+
+    print(f"{label:<10} {seconds * 1000:9.1f} ms cold {cached_seconds * 1000:9.1f} ms cached "
+          f"{index.folder_count():8d} folders listed   {len(episodes)} episodes, {shots} shots")
+    return seconds
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compare the substring crawl with the default hierarchy rules")
+    parser.add_argument("episodes", type=int, nargs="?", default=4, help="Episodes (default: 4)")
+    parser.add_argument("sequences", type=int, nargs="?", default=8, help="Sequences per episode (default: 8)")
+    parser.add_argument("shots", type=int, nargs="?", default=20, help="Shots per sequence (default: 20)")
+    parser.add_argument("departments", type=int, nargs="?", default=6, help="Departments per shot (default: 6)")
+    parser.add_argument("noise", type=int, nargs="?", default=3, help="Cache folder levels per department (default: 3)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    episodes, sequences, shots, departments, noise = args.episodes, args.sequences, args.shots, args.departments, args.noise
+    root = tempfile.mkdtemp(prefix="scene_saver_bench_")
+    os.environ["SCENE_SAVER_CACHE_DIR"] = os.path.join(root, "cache")
+
+    try:
+        project_root = os.path.join(root, "Project")
+        folders = make_project(project_root, episodes, sequences, shots, departments, noise=noise, age=0)
+        for decoy in DECOY_FOLDERS:
+            os.makedirs(os.path.join(project_root, decoy))
+        backdate(project_root, 60)  # Settled folders, so cached crawls reuse them
+        print(f"Project: {episodes} episodes x {sequences} sequences x {shots} shots x {departments} departments "
+              f"x {noise} cache levels, {folders + len(DECOY_FOLDERS) + 1} folders")
+
+        heuristic = run("heuristic", project_root, heuristic_rules())
+        pruned = run("rules", project_root, HierarchyRules())
+        print(f"The rules crawl {heuristic / pruned:.1f}x faster")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
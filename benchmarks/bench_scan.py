@@ -0,0 +1,133 @@
+"""
+Compares the filesystem calls made by the old two-pass crawl (add_subfolders + make_project_dict)
+against the single os.scandir pass of ProjectIndex.
+
+Usage:
+    python benchmarks/bench_scan.py [episodes] [sequences] [shots] [departments]
+"""
+import os
+import sys
+import argparse
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_saver_core import ProjectIndex
+from synthetic import make_project
+
+def legacy_add_subfolders(parent_path):
+    """
+    Replica of the old recursive os.listdir + os.path.isdir tree walk
+    """
+    for item in os.listdir(parent_path):
+        item_path = os.path.join(parent_path, item)
+        if os.path.isdir(item_path):
+            legacy_add_subfolders(item_path)
+
+def legacy_folder_to_dict(project_dict, item_path, project):
+    """
+    Replica of the old SceneSaver.folder_to_dict
+    """
+    if not os.path.isdir(item_path):
+        return
+
+    ep_name = os.path.basename(item_path)
+    if "ep" in ep_name.lower():
+        project_dict[project].setdefault(ep_name, {})
+        for sq_item in os.listdir(item_path):
+            sq_item_path = os.path.join(item_path, sq_item)
+            if os.path.isdir(sq_item_path) and "sq" in sq_item.lower():
+                project_dict[project][ep_name].setdefault(sq_item, {})
+                for sh_item in os.listdir(sq_item_path):
+                    sh_item_path = os.path.join(sq_item_path, sh_item)
+                    if os.path.isdir(sh_item_path) and "sh" in sh_item.lower():
+                        project_dict[project][ep_name][sq_item][sh_item] = sh_item_path
+    else:
+        for sub_item in os.listdir(item_path):
+            sub_item_path = os.path.join(item_path, sub_item)
+            if os.path.isdir(sub_item_path) and "ep" in sub_item.lower():
+                legacy_folder_to_dict(project_dict, sub_item_path, project)
+
+def legacy_crawl(root):
+    legacy_add_subfolders(root)
+
+    project = os.path.basename(root)
+    project_dict = {project: {}}
+    for each in os.listdir(root):
+        item_path = os.path.join(root, each)
+        if os.path.isdir(item_path):
+            legacy_folder_to_dict(project_dict, item_path, project)
+    return project_dict
+
+def indexed_crawl(root):
+    return ProjectIndex(root).scan().to_project_dict()
+
+class CallCounter(object):
+    """
+    Counts calls to the os functions that hit the filesystem
+    """
+    names = ("listdir", "scandir", "stat")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.names, 0)
+        self.originals = {}
+
+    def __enter__(self):
+        for name in self.names:
+            original = getattr(os, name)
+            self.originals[name] = original
+            setattr(os, name, self._wrap(name, original))
+        return self
+
+    def __exit__(self, *args):
+        for name, original in self.originals.items():
+            setattr(os, name, original)
+
+    def _wrap(self, name, original):
+        def wrapper(*args, **kwargs):
+            self.counts[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+def run(label, crawl, root):
+    with CallCounter() as counter:
+        start = time.perf_counter()
+        result = crawl(root)
+        elapsed = time.perf_counter() - start
+
+    total = sum(counter.counts.values())
+    calls = ", ".join(f"{name}={count}" for name, count in counter.counts.items())
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms   {total:8d} fs calls ({calls})")
+    return result
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compare the filesystem calls of the old crawl with ProjectIndex")
+    parser.add_argument("episodes", type=int, nargs="?", default=5, help="Episodes (default: 5)")
+    parser.add_argument("sequences", type=int, nargs="?", default=10, help="Sequences per episode (default: 10)")
+    parser.add_argument("shots", type=int, nargs="?", default=20, help="Shots per sequence (default: 20)")
+    parser.add_argument("departments", type=int, nargs="?", default=6, help="Departments per shot (default: 6)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sizes = [args.episodes, args.sequences, args.shots, args.departments]
+    root = tempfile.mkdtemp(prefix="scene_saver_bench_")
+
+    try:
+        project_root = os.path.join(root, "Project")
+        make_project(project_root, *sizes)
+        print("Project: {} episodes x {} sequences x {} shots x {} departments".format(*sizes))
+
+        legacy_dict = run("legacy", legacy_crawl, project_root)
+        indexed_dict = run("scandir", indexed_crawl, project_root)
+
+        if legacy_dict != indexed_dict:
+            print("WARNING: project dicts differ")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
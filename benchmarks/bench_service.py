@@ -0,0 +1,82 @@
+"""
+Compares a morning of artists opening the same project: every window crawling
+the share on its own against one index service crawling it and the windows
+fetching the result.
+
+Each window starts without a local index cache, as on a fresh workstation, so
+a direct open lists every folder the hierarchy rules allow. Served opens cost
+one listing of the project in total, the service's, plus a socket round trip.
+
+Usage:
+    python benchmarks/bench_service.py [clients] [episodes] [sequences] [shots] [departments]
+"""
+import os
+import sys
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_saver_core import ProjectIndex, ProjectIndexService, fetch_served_index
+from synthetic import make_project
+
+def open_direct(root):
+    index = ProjectIndex(root).scan()
+    return index.listed_count
+
+def open_served(address, root):
+    index = ProjectIndex(root)
+    index.merge(fetch_served_index(address, root)["folders"])
+    return 0
+
+def run(label, clients, open_project):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        listed = sum(executor.map(lambda _: open_project(), range(clients)))
+    seconds = time.perf_counter() - start
+    print(f"{label:<8} {seconds * 1000:9.1f} ms for {clients} windows, {listed:7d} folders listed on the share")
+    return seconds
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Compare windows crawling a project each against fetching it from an index service")
+    parser.add_argument("clients", type=int, nargs="?", default=20, help="Windows opening the project at once (default: 20)")
+    parser.add_argument("episodes", type=int, nargs="?", default=4, help="Episodes (default: 4)")
+    parser.add_argument("sequences", type=int, nargs="?", default=8, help="Sequences per episode (default: 8)")
+    parser.add_argument("shots", type=int, nargs="?", default=20, help="Shots per sequence (default: 20)")
+    parser.add_argument("departments", type=int, nargs="?", default=6, help="Departments per shot (default: 6)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    clients, episodes, sequences, shots, departments = args.clients, args.episodes, args.sequences, args.shots, args.departments
+    root = tempfile.mkdtemp(prefix="scene_saver_bench_")
+    os.environ["SCENE_SAVER_CACHE_DIR"] = os.path.join(root, "cache")
+
+    try:
+        project_root = os.path.join(root, "Show")
+        folders = make_project(project_root, episodes, sequences, shots, departments)
+        print(f"Project: {folders} folders, {clients} windows opening it at once")
+
+        direct = run("direct", clients, lambda: open_direct(project_root))
+
+        address = f"unix:{os.path.join(root, 'index.sock')}"
+        service = ProjectIndexService([project_root], interval=3600)
+        server = threading.Thread(target=service.serve, args=(address,), daemon=True)
+        server.start()
+        while project_root not in service.replies:  # The service's first crawl
+            time.sleep(0.01)
+
+        print(f"service  {service.indexes[project_root].listed_count:7d} folders listed on the share, once")
+        served = run("served", clients, lambda: open_served(address, project_root))
+        print(f"Windows open {direct / served:.1f}x faster, the share is listed once instead of {clients} times")
+        service.stop()
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark suite for the scan, naming and save paths of Scene Saver
+
+Generates a synthetic project, drives the real SceneSaver window through the
+stub maya/PySide2 modules in benchmarks/stubs and writes the timings as JSON.
+Compare against a baseline to catch regressions in crawl time or memory.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--size small|medium|large] [--output results.json]
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json [--tolerance 1.0]
+    python benchmarks/run_benchmarks.py --write-baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import contextlib
+import tempfile
+import statistics
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "stubs"))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from PySide2.QtCore import process_events
+from synthetic import make_project
+
+# Timings below this difference are scheduler noise, not regressions
+MIN_SECONDS_DELTA = 0.025
+
+# episodes, sequences, shots, departments, files per department, noise levels per department
+SIZES = {
+    "small": (2, 4, 10, 4, 3, 1),
+    "medium": (5, 10, 20, 6, 5, 1),
+    "large": (10, 20, 40, 8, 5, 2),
+}
+
+def measure(function, repeat=5):
+    """
+    Median wall time of a function over repeat runs, with the peak traced memory of the first run
+    """
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return {"seconds": statistics.median(timings), "min_seconds": min(timings), "peak_kb": peak // 1024, "runs": repeat}
+
+def open_window(project_root):
+    """
+    Build a SceneSaver on the stubs with the project browsed and fully scanned
+    """
+    import scene_saver
+
+    window = scene_saver.SceneSaver()
+    window.project_path = [project_root]
+    window.project_path_le.setText(project_root)
+    window.populate_tree()
+    process_events()
+    return window
+
+def expand_all(window):
+    """
+    Expand every folder of the preview, the worst case of the lazy tree
+    """
+    model = window.folder_model
+    pending = [model.index(0, 0)]
+    count = 0
+    while pending:
+        index = pending.pop()
+        if model.canFetchMore(index):
+            model.fetchMore(index)
+        count += 1
+        pending.extend(model.index(row, 0, index) for row in range(model.rowCount(index)))
+    return count
+
+def run_suite(project_root, repeat):
+    from scene_saver_core import ProjectIndex
+
+    results = {}
+    window = open_window(project_root)
+
+    results["scan"] = measure(lambda: ProjectIndex(project_root).scan(), repeat)
+    results["scan_cached"] = measure(lambda: ProjectIndex(project_root).scan(previous=window.project_index), repeat)
+    results["make_project_dict"] = measure(window.make_project_dict, repeat)
+
+    def populate_and_expand():
+        window.populate_tree()
+        process_events()
+        expand_all(window)
+    results["add_subfolders_expand_all"] = measure(populate_and_expand, repeat)
+
+    results["create_file_name_x1000"] = measure(lambda: [window.create_file_name() for _ in range(1000)], repeat)
+
+    window.auto_version_chkbox.setChecked(True)
+    process_events()
+    results["create_file_name_auto_version_x1000"] = measure(lambda: [window.create_file_name() for _ in range(1000)], repeat)
+    window.auto_version_chkbox.setChecked(False)
+    process_events()
+
+    # One user action must cost one recompute however many signals it fires
+    before = window.recompute_count
+    window.episode_cb.setCurrentIndex(window.episode_cb.count() - 1)
+    window.sequence_cb.setCurrentIndex(window.sequence_cb.count() - 1)
+    window.tags_cb.setCurrentIndex(1)
+    process_events()
+    results["recomputes_per_action"] = {"count": window.recompute_count - before}
+
+    # Typing a query one keystroke at a time, then picking the best match
+    query = "ep2 sq3 sh00"
+    def type_search():
+        window.shot_search_index = None  # First keystroke after a project dict change builds the index
+        for end in range(1, len(query) + 1):
+            window.find_shot_le.type_text(query[:end])
+    results["search_keystrokes_x12"] = measure(type_search, repeat)
+
+    before = window.recompute_count
+    window.find_shot_le.returnPressed.emit()
+    process_events()
+    results["recomputes_per_search_selection"] = {"count": window.recompute_count - before}
+
+    def save_and_backup():
+        window.bkp_prev_chkbox.setChecked(True)
+        window.save()  # The stub confirm dialog answers "Backup & Overwrite" once the file exists
+    results["save_with_backup"] = measure(save_and_backup, repeat)
+
+    # The history panel reads the department manifest those saves appended to
+    window.save_history.executor.submit(lambda: None).result()
+    def refill_history():
+        window.history_key = None
+        window.update_history()
+    results["history_refill"] = measure(refill_history, repeat)
+
+    results["folders"] = {"count": window.project_index.folder_count()}
+    window.close()
+
+    # Opening from the shelf: a fresh window against the hidden one shown again
+    def open_cold():
+        open_window(project_root).close()
+    results["open_window_cold"] = measure(open_cold, repeat)
+
+    def reopen_warm():
+        window.reopen()
+        process_events()
+        window.close()
+    results["reopen_window_warm"] = measure(reopen_warm, repeat)
+
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of the timing and memory metrics against a baseline, as printable lines
+
+    Timings are compared by their fastest run, which scheduler noise and other
+    processes only ever make slower, so the gate gives the same answer run to run.
+    """
+    regressions = []
+    for name, metrics in baseline.get("results", {}).items():
+        current = results.get(name, {})
+        for key in ("min_seconds", "peak_kb", "count"):
+            if key not in metrics or key not in current:
+                continue
+            if key == "count":
+                limit = metrics[key]
+            elif key == "min_seconds":
+                limit = max(metrics[key] * (1 + tolerance), metrics[key] + MIN_SECONDS_DELTA)
+            else:
+                limit = metrics[key] * (1 + tolerance)
+            if current[key] > limit:
+                regressions.append(f"{name}.{key}: {current[key]:.6g} > {metrics[key]:.6g} (limit {limit:.6g})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Scene Saver on a synthetic project")
+    parser.add_argument("--size", default="small", choices=sorted(SIZES), help="Synthetic project size")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Fail when a metric regresses past this baseline")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Allowed slowdown over the baseline (1.0 = twice as slow)")
+    parser.add_argument("--write-baseline", help="Write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    temp_root = tempfile.mkdtemp(prefix="scene_saver_bench_")
+    os.environ["SCENE_SAVER_CACHE_DIR"] = os.path.join(temp_root, "cache")
+    os.environ["SCENE_SAVER_SCRATCH_DIR"] = os.path.join(temp_root, "scratch")
+    os.environ["SCENE_SAVER_PERF_LOG"] = os.path.join(temp_root, "perf", "perf.jsonl")  # Keep synthetic events out of the real log
+
+    try:
+        project_root = os.path.join(temp_root, "Project")
+        size = SIZES[args.size]
+        make_project(project_root, *size)
+        # Keep stdout for the report, the window prints a line per save
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_suite(project_root, args.repeat)
+    finally:
+        shutil.rmtree(temp_root, ignore_errors=True)
+
+    report = {
+        "size": args.size,
+        "project": dict(zip(("episodes", "sequences", "shots", "departments", "files", "noise"), size)),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=4)
+    print(output)
+
+    for path in filter(None, (args.output, args.write_baseline)):
+        with open(path, "w") as file:
+            file.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("size") != args.size:
+            print(f"Baseline was recorded for size {baseline.get('size')}, not {args.size}", file=sys.stderr)
+            return 2
+
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
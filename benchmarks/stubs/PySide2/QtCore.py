@@ -0,0 +1,221 @@
+"""
+Stand-in for the parts of PySide2.QtCore the Scene Saver window uses
+
+Timers don't run on their own: process_events() fires the zero-interval timers
+that were started, the way one tick of the Qt event loop would. Thread pools
+run their jobs synchronously.
+"""
+import weakref
+
+class Qt(object):
+    UserRole = 256
+    DisplayRole = 0
+    ToolTipRole = 3
+    AlignCenter = 132
+
+class BoundSignal(object):
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def disconnect(self, slot=None):
+        self.slots = [] if slot is None else [each for each in self.slots if each != slot]
+
+    def emit(self, *args):
+        for slot in list(self.slots):
+            slot(*args)
+
+    def __getitem__(self, types):
+        return self  # Overload selection such as activated[str]
+
+class Signal(object):
+    """
+    Class level signal declaration, each instance gets its own BoundSignal
+    """
+    def __init__(self, *types):
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        signal = instance.__dict__.get(self.name)
+        if signal is None:
+            signal = instance.__dict__[self.name] = BoundSignal()
+        return signal
+
+class QObject(object):
+    def __init__(self, parent=None, *args, **kwargs):
+        self._blocked = False
+
+    def blockSignals(self, blocked):
+        previous = self._blocked
+        self._blocked = blocked
+        return previous
+
+    def signalsBlocked(self):
+        return self._blocked
+
+    def deleteLater(self):
+        pass
+
+_active_timers = []
+
+class QTimer(QObject):
+    timeout = Signal()
+
+    def __init__(self, parent=None):
+        super(QTimer, self).__init__(parent)
+        self._interval = 0
+        self._single_shot = False
+        self._active = False
+
+    @staticmethod
+    def singleShot(msec, callback):
+        pass  # Delayed callbacks (clock label refresh) never fire in the stubs
+
+    def setSingleShot(self, single_shot):
+        self._single_shot = single_shot
+
+    def setInterval(self, msec):
+        self._interval = msec
+
+    def interval(self):
+        return self._interval
+
+    def start(self, msec=None):
+        if msec is not None:
+            self._interval = msec
+        self._active = True
+        if self not in _active_timers:
+            _active_timers.append(self)
+
+    def stop(self):
+        self._active = False
+        if self in _active_timers:
+            _active_timers.remove(self)
+
+    def isActive(self):
+        return self._active
+
+def process_events(include_delayed=False):
+    """
+    Fire the started zero-interval timers (all timers with include_delayed), like one event loop tick
+    """
+    for timer in list(_active_timers):
+        if timer._interval <= 0 or include_delayed:
+            timer.stop()
+            timer.timeout.emit()
+
+class QRunnable(object):
+    def __init__(self):
+        pass
+
+    def setAutoDelete(self, auto_delete):
+        pass
+
+class QThreadPool(object):
+    _instance = None
+
+    @classmethod
+    def globalInstance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start(self, runnable):
+        runnable.run()
+
+class QFileSystemWatcher(QObject):
+    directoryChanged = Signal(str)
+    fileChanged = Signal(str)
+
+    def __init__(self, parent=None):
+        super(QFileSystemWatcher, self).__init__(parent)
+        self._directories = []
+
+    def addPaths(self, paths):
+        self._directories.extend(path for path in paths if path not in self._directories)
+        return []
+
+    def removePaths(self, paths):
+        self._directories = [path for path in self._directories if path not in paths]
+        return []
+
+    def directories(self):
+        return list(self._directories)
+
+class QRect(object):
+    def __init__(self, *args):
+        self.args = args
+
+class QModelIndex(object):
+    def __init__(self, row=-1, column=-1, pointer=None, model=None):
+        self._row = row
+        self._column = column
+        self._pointer = pointer
+        self._model = weakref.ref(model) if model is not None else None
+
+    def isValid(self):
+        return self._row >= 0
+
+    def row(self):
+        return self._row
+
+    def column(self):
+        return self._column
+
+    def internalPointer(self):
+        return self._pointer
+
+    def internalId(self):
+        return self._pointer
+
+    def model(self):
+        return self._model() if self._model else None
+
+class QAbstractItemModel(QObject):
+    def __init__(self, parent=None):
+        super(QAbstractItemModel, self).__init__(parent)
+
+    def createIndex(self, row, column, pointer=None):
+        return QModelIndex(row, column, pointer, self)  # An int pointer doubles as the internal id
+
+    def beginResetModel(self):
+        pass
+
+    def endResetModel(self):
+        pass
+
+    def beginInsertRows(self, parent, first, last):
+        pass
+
+    def endInsertRows(self):
+        pass
+
+    def beginRemoveRows(self, parent, first, last):
+        pass
+
+    def endRemoveRows(self):
+        pass
+
+    def hasIndex(self, row, column, parent=QModelIndex()):
+        return 0 <= row < self.rowCount(parent) and 0 <= column < self.columnCount(parent)
+
+class QStringListModel(QAbstractItemModel):
+    def __init__(self, *args):
+        super(QStringListModel, self).__init__()
+        self._strings = list(args[0]) if args and isinstance(args[0], list) else []  # (strings[, parent]) or (parent)
+
+    def setStringList(self, strings):
+        self._strings = list(strings)
+
+    def stringList(self):
+        return list(self._strings)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._strings)
@@ -0,0 +1,310 @@
+"""
+Stand-in for the parts of PySide2.QtWidgets the Scene Saver window uses
+
+Widgets keep just enough state (text, items, check state) for the window's
+logic to run, any other Qt call is accepted and ignored.
+"""
+from PySide2.QtCore import QObject, Signal
+
+class QWidget(QObject):
+    def __init__(self, *args, **kwargs):
+        super(QWidget, self).__init__()
+        self._visible = False
+        self._enabled = True
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None  # Layout, styling and geometry calls
+
+    def show(self):
+        self._visible = True
+
+    def hide(self):
+        self._visible = False
+
+    def isVisible(self):
+        return self._visible
+
+    def setEnabled(self, enabled):
+        self._enabled = enabled
+
+    def isEnabled(self):
+        return self._enabled
+
+    def close(self):
+        self.closeEvent(QCloseEvent())
+        self._visible = False
+        return True
+
+    def closeEvent(self, event):
+        pass
+
+class QCloseEvent(object):
+    def accept(self):
+        pass
+
+    def ignore(self):
+        pass
+
+class QMainWindow(QWidget):
+    pass
+
+class QDialog(QWidget):
+    pass
+
+class QLayout(QWidget):
+    pass
+
+QVBoxLayout = QHBoxLayout = QGridLayout = QFormLayout = QLayout
+
+class QLabel(QWidget):
+    def __init__(self, text="", *args, **kwargs):
+        super(QLabel, self).__init__()
+        self._text = text
+
+    def setText(self, text):
+        self._text = text or ""
+
+    def text(self):
+        return self._text
+
+class QAbstractButton(QWidget):
+    clicked = Signal()
+    toggled = Signal(bool)
+
+    def __init__(self, text="", *args, **kwargs):
+        super(QAbstractButton, self).__init__()
+        self._text = text
+        self._checked = False
+
+    def text(self):
+        return self._text
+
+    def click(self):
+        self.clicked.emit()
+
+    def setChecked(self, checked):
+        if checked != self._checked:
+            self._checked = checked
+            if not self.signalsBlocked():
+                self.toggled.emit(checked)
+
+    def isChecked(self):
+        return self._checked
+
+QPushButton = QCheckBox = QRadioButton = QAbstractButton
+
+class QLineEdit(QWidget):
+    textChanged = Signal(str)
+    textEdited = Signal(str)
+    returnPressed = Signal()
+
+    def __init__(self, text="", *args, **kwargs):
+        super(QLineEdit, self).__init__()
+        self._text = text
+
+    def setText(self, text):
+        self._text = text or ""
+        if not self.signalsBlocked():
+            self.textChanged.emit(text)
+
+    def text(self):
+        return self._text
+
+    def clear(self):
+        self.setText("")
+
+    def type_text(self, text):
+        """
+        Typing by the user, which unlike setText emits textEdited
+        """
+        self.setText(text)
+        self.textEdited.emit(text)
+
+class QCompleter(QObject):
+    UnfilteredPopupCompletion = 2
+    activated = Signal(str)
+
+    def __init__(self, model=None, parent=None):
+        super(QCompleter, self).__init__(parent)
+        self._model = model
+        self._popup = QWidget()
+
+    def setCompletionMode(self, mode):
+        pass
+
+    def setWidget(self, widget):
+        pass
+
+    def model(self):
+        return self._model
+
+    def popup(self):
+        return self._popup
+
+    def complete(self):
+        self._popup.show()
+
+class QComboBox(QWidget):
+    currentIndexChanged = Signal(int)
+    currentTextChanged = Signal(str)
+
+    def __init__(self, *args, **kwargs):
+        super(QComboBox, self).__init__()
+        self._items = []
+        self._index = -1
+
+    def _set_index(self, index):
+        if index != self._index:
+            self._index = index
+            if not self.signalsBlocked():
+                self.currentIndexChanged.emit(index)
+                self.currentTextChanged.emit(self.currentText())
+
+    def addItems(self, items):
+        self._items.extend(items)
+        if self._index < 0 and self._items:
+            self._set_index(0)
+
+    def addItem(self, item, *args):
+        self.addItems([item])
+
+    def clear(self):
+        self._items = []
+        self._set_index(-1)
+
+    def count(self):
+        return len(self._items)
+
+    def itemText(self, index):
+        return self._items[index]
+
+    def currentText(self):
+        return self._items[self._index] if 0 <= self._index < len(self._items) else ""
+
+    def currentIndex(self):
+        return self._index
+
+    def setCurrentIndex(self, index):
+        self._set_index(index)
+
+    def setCurrentText(self, text):
+        if text in self._items:
+            self._set_index(self._items.index(text))
+
+    def findText(self, text):
+        return self._items.index(text) if text in self._items else -1
+
+class QDoubleSpinBox(QWidget):
+    valueChanged = Signal(float)
+
+    def __init__(self, *args, **kwargs):
+        super(QDoubleSpinBox, self).__init__()
+        self._value = 0.0
+        self._decimals = 2
+        self._maximum = 99.99
+
+    def setDecimals(self, decimals):
+        self._decimals = decimals
+
+    def setMaximum(self, maximum):
+        self._maximum = maximum
+
+    def setValue(self, value):
+        value = round(min(max(value, 0.0), self._maximum), self._decimals)
+        if value != self._value:
+            self._value = value
+            if not self.signalsBlocked():
+                self.valueChanged.emit(value)
+
+    def value(self):
+        return self._value
+
+class QProgressBar(QWidget):
+    pass
+
+class QTreeWidgetItem(object):
+    def __init__(self, texts=None):
+        self._texts = list(texts or [""])
+        self._data = {}
+        self._children = []
+        self._expanded = False
+        self._tree = None
+
+    def text(self, column):
+        return self._texts[column]
+
+    def setData(self, column, role, value):
+        self._data[(column, role)] = value
+
+    def data(self, column, role):
+        return self._data.get((column, role))
+
+    def addChild(self, child):
+        child._tree = self._tree
+        self._children.append(child)
+
+    def insertChild(self, index, child):
+        child._tree = self._tree
+        self._children.insert(index, child)
+
+    def takeChild(self, index):
+        return self._children.pop(index)
+
+    def child(self, index):
+        return self._children[index]
+
+    def childCount(self):
+        return len(self._children)
+
+    def setExpanded(self, expanded):
+        if expanded and not self._expanded:
+            self._expanded = True
+            if self._tree is not None:
+                self._tree.itemExpanded.emit(self)
+        self._expanded = expanded
+
+    def isExpanded(self):
+        return self._expanded
+
+class QTreeView(QWidget):
+    expanded = Signal(object)
+
+    def expand(self, index):
+        self.expanded.emit(index)
+
+class QTreeWidget(QWidget):
+    itemExpanded = Signal(object)
+    itemDoubleClicked = Signal(object, int)
+
+    def __init__(self, *args, **kwargs):
+        super(QTreeWidget, self).__init__()
+        self._items = []
+        self._current = None
+
+    def clear(self):
+        self._items = []
+        self._current = None
+
+    def currentItem(self):
+        return self._current
+
+    def setCurrentItem(self, item):
+        self._current = item
+
+    def addTopLevelItem(self, item):
+        item._tree = self
+        self._items.append(item)
+
+    def topLevelItem(self, index):
+        return self._items[index]
+
+    def topLevelItemCount(self):
+        return len(self._items)
+
+def __getattr__(name):
+    # Any other widget class is a plain do-nothing widget
+    if name.startswith("Q"):
+        return type(name, (QWidget,), {})
+    raise AttributeError(name)
@@ -0,0 +1,4 @@
+class MQtUtil(object):
+    @staticmethod
+    def mainWindow():
+        return 0
@@ -0,0 +1,39 @@
+"""
+Stand-in for maya.cmds, recording calls and writing a dummy scene file on save
+"""
+
+calls = []
+scene_name = ""
+scene_size = 1024 * 1024  # Bytes written by file(save=True)
+confirm_response = "Backup & Overwrite"
+
+def file(*args, **kwargs):
+    global scene_name
+    calls.append(("file", args, kwargs))
+
+    if kwargs.get("rename"):
+        scene_name = kwargs["rename"]
+    elif kwargs.get("save"):
+        with open(scene_name, "wb") as scene:
+            scene.write(b"\0" * scene_size)
+    elif kwargs.get("query") and kwargs.get("sceneName"):
+        return scene_name
+    return None
+
+def confirmDialog(*args, **kwargs):
+    calls.append(("confirmDialog", args, kwargs))
+    return confirm_response
+
+def fileDialog2(*args, **kwargs):
+    return None
+
+def inViewMessage(*args, **kwargs):
+    calls.append(("inViewMessage", args, kwargs))
+
+def warning(message):
+    calls.append(("warning", (message,), {}))
+
+def __getattr__(name):
+    def command(*args, **kwargs):
+        calls.append((name, args, kwargs))
+    return command
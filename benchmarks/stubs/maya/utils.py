@@ -0,0 +1,5 @@
+def executeDeferred(function, *args, **kwargs):
+    function(*args, **kwargs)
+
+def executeInMainThreadWithResult(function, *args, **kwargs):
+    return function(*args, **kwargs)
@@ -0,0 +1,5 @@
+def wrapInstance(pointer, cls):
+    return None
+
+def isValid(obj):
+    return obj is not None
@@ -0,0 +1,61 @@
+"""
+Synthetic episodic project trees for the benchmarks
+"""
+import os
+import time
+
+DEPARTMENTS = ["Modeling", "Rigging", "Pre-Vis", "Layout", "Animation", "Lighting", "Match Move", "FX"]
+NOISE_FOLDERS = ["cache", "renders", "textures", "playblasts"]
+
+def backdate(root, seconds):
+    """
+    Move the modification time of every folder under root into the past
+    """
+    stamp = time.time() - seconds
+    for folder, _, _ in os.walk(root):
+        os.utime(folder, (stamp, stamp))
+
+def make_project(root, episodes, sequences, shots, departments, files=0, noise=0, age=60):
+    """
+    Create <root>/EPxxx/SQxxx/SHxxxx/<department> folders with scene files, returns the number of folders
+
+    files scene files are written per department, named like the Scene Saver default
+    "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}" format, and noise adds that
+    many levels of cache/render style folders under each department. Folders are
+    backdated by age seconds so the index treats them as settled rather than still
+    being written to.
+    """
+    project = os.path.basename(root)
+    folder_count = 1
+
+    for ep in range(1, episodes + 1):
+        for sq in range(1, sequences + 1):
+            for sh in range(1, shots + 1):
+                ep_name, sq_name, sh_name = f"EP{ep:03d}", f"SQ{sq:03d}", f"SH{sh:04d}"
+                shot_path = os.path.join(root, ep_name, sq_name, sh_name)
+                folder_count += 1 if sq == 1 and sh == 1 else 0
+                folder_count += 1 if sh == 1 else 0
+                folder_count += 1
+
+                for dept in DEPARTMENTS[:departments] + [f"dept_{n}" for n in range(len(DEPARTMENTS), departments)]:
+                    dept_path = os.path.join(shot_path, dept)
+                    os.makedirs(dept_path)
+                    folder_count += 1
+
+                    for version in range(1, files + 1):
+                        file_name = f"{project}_{ep_name}_{sq_name}_{sh_name}_{dept}_WIP_{version}0.ma"
+                        open(os.path.join(dept_path, file_name), "w").close()
+
+                    noise_path = dept_path
+                    for level in range(noise):
+                        for name in NOISE_FOLDERS:
+                            os.makedirs(os.path.join(noise_path, name))
+                            folder_count += 1
+                        noise_path = os.path.join(noise_path, NOISE_FOLDERS[level % len(NOISE_FOLDERS)])
+
+                open(os.path.join(shot_path, "notes.txt"), "w").close()
+
+    if age:
+        backdate(root, age)
+
+    return folder_count
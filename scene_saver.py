@@ -1,13 +1,24 @@
 import maya.cmds as cmds
 import maya.OpenMayaUI as omui
 import maya.utils as utils
-from shiboken2 import wrapInstance
+from shiboken2 import wrapInstance, isValid
 import os
-from PySide2.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QRadioButton, QCheckBox, QComboBox, QDoubleSpinBox, QLineEdit, QTreeWidget, QTreeWidgetItem
-from PySide2.QtCore import Qt, QRect, QTimer
+from PySide2.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QRadioButton, QCheckBox, QComboBox, QDoubleSpinBox, QLineEdit, QTreeView, QProgressBar, QCompleter, QTreeWidget, QTreeWidgetItem
+from PySide2.QtCore import (Qt, QRect, QTimer, QObject, QRunnable, QThreadPool, Signal, QFileSystemWatcher,
+                            QAbstractItemModel, QModelIndex, QStringListModel)
 from datetime import datetime as dt
-import json
+from functools import partial
 import shutil
+import threading
+import time
+from scene_saver_core import (ProjectIndex, ShotSearchIndex, SavePlanner, SavePlanError, TransferQueue, BackupManager, NameFormatError, MAX_VERSION,
+                               NameFormatConfig, PerfRecorder, HookPipeline, SaveHookError, Publisher, PublishError, SaveHistory, SaveLedger, SaveManifest, HISTORY_TIMESTAMP_FORMAT, compile_name_format, load_user_settings, maya_file_type,
+                               fetch_served_index, file_signature, index_service_address, save_maya_scene, scene_dependencies, save_user_setting, version_token)
+
+CASCADE_LEVELS = ("episodes", "sequences", "shots")  # Combo boxes refilled top-down by recompute
+WATCH_COALESCE_MS = 500  # Quiet period before queued folder changes are applied
+WATCH_MAX_DELAY_MS = 2000  # Longest a change waits while a bulk operation keeps the watcher busy
+HISTORY_COLUMNS = ("Version", "Tag", "Artist", "Saved", "Size", "File")
 
 def get_maya_main_window():
     """
@@ -16,9 +27,264 @@ def get_maya_main_window():
     maya_window = omui.MQtUtil.mainWindow()
     return wrapInstance(int(maya_window), QWidget)
 
+class FolderTreeModel(QAbstractItemModel):
+    """
+    Folder structure preview over the nodes of a ProjectIndex
+
+    Nothing is copied out of the index: the internal id of an item is its index
+    node and names and paths are looked up when the view asks for them. Like the
+    lazy tree it replaces, a folder's rows are only handed to the view once it is
+    expanded (fetchMore), and a folder expanded before the crawl reached it gets
+    its rows as soon as they are merged in.
+    """
+    def __init__(self, parent=None):
+        super(FolderTreeModel, self).__init__(parent)
+        self.project_index = None
+        self.fetched = set()  # Nodes whose rows the view has asked for
+        self.removing = False
+        self.inserting = False
+
+    def set_project_index(self, project_index):
+        self.beginResetModel()
+        self.project_index = project_index
+        self.fetched = set()
+        self.endResetModel()
+
+    def node_index(self, node):
+        """
+        Model index of an index node
+        """
+        return self.createIndex(self.project_index.row(node), 0, node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if self.project_index is None or column != 0:
+            return QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(0, 0, ProjectIndex.ROOT) if row == 0 else QModelIndex()
+
+        node = parent.internalId()
+        child = self.project_index.child(node, row) if node in self.fetched else None
+        return self.createIndex(row, 0, child) if child is not None else QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == ProjectIndex.ROOT:
+            return QModelIndex()
+
+        return self.node_index(self.project_index.parent(index.internalId()))
+
+    def rowCount(self, parent=QModelIndex()):
+        if self.project_index is None:
+            return 0
+        if not parent.isValid():
+            return 1
+        if parent.column() > 0 or parent.internalId() not in self.fetched:
+            return 0
+        return self.project_index.child_count(parent.internalId())
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return self.project_index is not None
+
+        # Folders not listed yet keep their expand arrow until the crawl reaches them, unless the rules prune them
+        node = parent.internalId()
+        if not self.project_index.is_listed(node):
+            return not self.project_index.is_pruned(node)
+        return self.project_index.child_count(node) > 0
+
+    def canFetchMore(self, parent):
+        return parent.isValid() and parent.internalId() not in self.fetched
+
+    def fetchMore(self, parent):
+        node = parent.internalId()
+        count = self.project_index.child_count(node)
+
+        if count:
+            self.beginInsertRows(parent, 0, count - 1)
+        self.fetched.add(node)
+        if count:
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalId()
+        if role == Qt.DisplayRole:
+            return self.project_index.name(node)
+        if role == Qt.ToolTipRole:
+            return self.project_index.full_path(self.project_index.path(node))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return "Folder Structure Preview"
+        return None
+
+    def merge_batch(self, batch):
+        """
+        Merge a crawl batch into the index, inserting the rows of folders the view already expanded
+        """
+        for rel_path, node, mtime, sub_folders in self.project_index.batch_nodes(batch):
+            announce = node in self.fetched and not self.project_index.is_listed(node) and sub_folders
+            if announce:
+                self.beginInsertRows(self.node_index(node), 0, len(sub_folders) - 1)
+            self.project_index.set_children(node, sub_folders, mtime)
+            if announce:
+                self.endInsertRows()
+
+    # Observer of ProjectIndex.refresh_folder, only folders the view has fetched announce their rows
+
+    def begin_remove(self, node, row):
+        self.removing = node in self.fetched
+        if self.removing:
+            removed_nodes = self.project_index.subtree_nodes(self.project_index.child(node, row))
+            self.fetched.difference_update(removed_nodes)  # Their nodes are reused for other folders
+            self.beginRemoveRows(self.node_index(node), row, row)
+
+    def end_remove(self):
+        if self.removing:
+            self.endRemoveRows()
+
+    def begin_insert(self, node, row):
+        self.inserting = node in self.fetched
+        if self.inserting:
+            self.beginInsertRows(self.node_index(node), row, row)
+
+    def end_insert(self):
+        if self.inserting:
+            self.endInsertRows()
+
+class ScanSignals(QObject):
+    """
+    Signals emitted by the project scan worker, delivered on the main thread
+    """
+    batch_scanned = Signal(object)  # {rel_path: (mtime, sub_folders)}
+    finished = Signal(bool)  # True when the crawl completed, False when it was cancelled
+
+class ProjectScanWorker(QRunnable):
+    """
+    Crawls a project root off the main thread and streams the listed folders back in batches
+
+    Unless a full rebuild is forced, the persisted index of the root is loaded first
+    so only folders whose mtime changed are listed again. The refreshed index is
+    written back once the crawl completes. The crawl is logged as a "scan" record
+    of the performance log.
+
+    When SCENE_SAVER_INDEX_SERVICE points at a running index service that serves
+    the root, its last crawl is used instead and the share isn't crawled at all.
+    """
+    def __init__(self, root_path, force_rebuild=False, perf=None, rules=None):
+        super(ProjectScanWorker, self).__init__()
+        self.signals = ScanSignals()
+        self.cancel_event = threading.Event()
+        self.root_path = root_path
+        self.force_rebuild = force_rebuild
+        self.index = ProjectIndex(root_path, rules)
+        self.perf = perf or PerfRecorder(enabled=False)
+
+    def run(self):
+        with self.perf.operation("scan") as perf_info:
+            perf_info.update(path=self.root_path, force_rebuild=self.force_rebuild)
+
+            served = self.fetch_served() if index_service_address() else None
+            perf_info["served"] = served is not None
+
+            with self.perf.span("load_index"):
+                previous = None
+                if self.force_rebuild:
+                    self.index.clear_cache()
+                elif served is None:
+                    previous = ProjectIndex.load(self.root_path, self.index.rules)
+
+            with self.perf.span("crawl"):
+                if served is not None:
+                    batches = self.served_batches(served)
+                else:
+                    batches = self.index.iter_scan(self.cancel_event, previous=previous)
+                for batch in batches:
+                    self.index.merge(batch)
+                    self.signals.batch_scanned.emit(batch)
+
+            completed = not self.cancel_event.is_set()
+            if completed:
+                try:
+                    with self.perf.span("save_index"):
+                        self.index.save()
+                except OSError as e:
+                    print(f"Could not save the project index cache: {e}")
+
+            perf_info.update(completed=completed, folders=self.index.folder_count(), listed=self.index.listed_count)
+
+        self.signals.finished.emit(completed)
+
+    def fetch_served(self):
+        """
+        Folders of the root from the index service, None when it can't be reached or doesn't serve the root
+        """
+        address = index_service_address()
+        try:
+            with self.perf.span("fetch_served_index"):
+                reply = fetch_served_index(address, self.root_path, rescan=self.force_rebuild)
+        except (OSError, ValueError) as e:
+            print(f"Index service {address} unavailable, scanning the project directly: {e}")
+            return None
+        return reply["folders"]
+
+    def served_batches(self, folders, batch_size=500):
+        """
+        Served folders, already breadth first, in batches the size a crawl yields
+        """
+        batch = {}
+        for rel_path, listing in folders.items():
+            if self.cancel_event.is_set():
+                return
+            batch[rel_path] = listing
+            if len(batch) >= batch_size:
+                yield batch
+                batch = {}
+        if batch:
+            yield batch
+
+    def cancel(self):
+        self.cancel_event.set()
+
 class SceneSaver(QMainWindow):
-    def __init__(self, parent = get_maya_main_window()):
-        super(SceneSaver, self).__init__(parent)
+    def __init__(self, parent=None):
+        # The Maya main window is looked up here rather than as a default argument, so importing the module stays cheap
+        super(SceneSaver, self).__init__(parent or get_maya_main_window())
+
+        self.project_index = None
+        self.scan_completed = False
+        self.project_dict = {}
+        self.project_name = ""
+        self.selected_ep = ""
+        self.selected_sq = ""
+        self.scan_worker = None
+        self.shot_search_index = None  # Built from the project dict on the first search after it changes
+        self.search_results = {}  # Label shown in the search popup -> (episode, sequence, shot)
+        self.wanted_selection = {}  # Cascade level -> name the next refill of that combo box selects
+
+        # Widget changes only mark the form dirty, a single recompute on the next event loop tick applies them
+        self.dirty_levels = set()
+        self.recompute_count = 0  # Number of recomputes, one per user action however many signals it fires
+        self.recompute_timer = QTimer(self)
+        self.recompute_timer.setSingleShot(True)
+        self.recompute_timer.setInterval(0)
+        self.recompute_timer.timeout.connect(self.recompute)
+
+        # Folder change notifications are collected here and applied together by the watch timer
+        self.pending_folder_changes = set()
+        self.first_pending_change = None
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.queue_folder_change)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(WATCH_COALESCE_MS)
+        self.watch_timer.timeout.connect(self.apply_folder_changes)
 
         # Set the window title
         self.setWindowTitle("Scene Saver")
@@ -31,41 +297,87 @@ class SceneSaver(QMainWindow):
         self.project_path_le = QLineEdit()
         project_path_browse_btn = QPushButton("Browse...")
         project_path_browse_btn.clicked.connect(self.browse_project_path)
+        project_rescan_btn = QPushButton("Rescan")
+        project_rescan_btn.setToolTip("Rebuild the project index from scratch instead of only re-listing changed folders")
+        project_rescan_btn.clicked.connect(self.rescan_project)
 
         episode_lbl = QLabel("Episode:")
         self.episode_cb = QComboBox()
+        self.episode_cb.currentIndexChanged.connect(partial(self.mark_dirty, "sequences"))
 
         sequence_lbl = QLabel("Sequence:")
         self.sequence_cb = QComboBox()
+        self.sequence_cb.currentIndexChanged.connect(partial(self.mark_dirty, "shots"))
 
         shot_lbl = QLabel("Shot:")
         self.shot_cb = QComboBox()
+        self.shot_cb.currentIndexChanged.connect(partial(self.mark_dirty, "name"))
+
+        find_shot_lbl = QLabel("Find Shot:")
+        self.find_shot_le = QLineEdit()
+        self.find_shot_le.setPlaceholderText("e.g. ep2 sq10 30")
+        self.find_shot_le.setToolTip("Search episodes, sequences and shots, picking a result selects all three")
+        self.find_shot_le.textEdited.connect(self.update_search_results)
+        self.find_shot_le.returnPressed.connect(self.select_first_search_result)
+        self.find_shot_model = QStringListModel(self)
+        self.find_shot_completer = QCompleter(self.find_shot_model, self)
+        self.find_shot_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)  # Results are already ranked
+        self.find_shot_completer.setWidget(self.find_shot_le)
+        self.find_shot_completer.activated[str].connect(self.select_search_result)
 
         department_lbl = QLabel("Department:")
         self.department_cb = QComboBox()
         self.department_cb.addItems(["Modeling", "Rigging", "Pre-Vis", "Layout", "Animation", "Lighting", "Match Move", "FX"])
         self.department_cb.setCurrentIndex(0)
-        self.department_cb.currentIndexChanged.connect(self.create_file_name)
+        self.department_cb.currentIndexChanged.connect(partial(self.mark_dirty, "name"))
 
         tags_lbl = QLabel("Tags:")
         self.tags_cb = QComboBox()
         self.tags_cb.addItems(["WIP", "RFR", "APP", "REV", "RFT", "RFRD", "RDC", "RFC", "RTP", "PUB", "FNL"])
-        self.tags_cb.currentIndexChanged.connect(self.create_file_name)
+        self.tags_cb.currentIndexChanged.connect(partial(self.mark_dirty, "name"))
 
         version_lbl = QLabel("Version:")
         self.version_dsb = QDoubleSpinBox()
-        self.version_dsb.valueChanged.connect(self.create_file_name)
+        self.version_dsb.setDecimals(1)  # The file name keeps a single decimal digit
+        self.version_dsb.setMaximum(MAX_VERSION)
+        self.version_dsb.valueChanged.connect(partial(self.mark_dirty, "name"))
 
         file_type_lbl = QLabel("File Type:")
         self.file_type_cb = QComboBox()
         self.file_type_cb.addItems(["*.ma", "*.mb"])
         self.file_type_cb.setCurrentIndex(0)
-        self.file_type_cb.currentIndexChanged.connect(self.create_file_name)
+        self.file_type_cb.currentIndexChanged.connect(partial(self.mark_dirty, "name"))
 
         self.bkp_prev_chkbox = QCheckBox("Backup Existing")
 
+        self.auto_version_chkbox = QCheckBox("Auto Version")
+        self.auto_version_chkbox.setToolTip("Use the next free version found in the department folder")
+        self.auto_version_chkbox.toggled.connect(self.toggle_auto_version)
+        self.save_planner = SavePlanner()
+        self.version_index = self.save_planner.version_index
+
+        self.scratch_save_chkbox = QCheckBox("Save via Local Scratch")
+        self.scratch_save_chkbox.setToolTip("Save to local disk first and copy to the project in the background")
+        self.transfer_queue = TransferQueue()
+        self.backup_manager = BackupManager.from_environment()
+
+        self.publish_chkbox = QCheckBox("Publish PUB/FNL")
+        self.publish_chkbox.setToolTip("Copy published saves and the files they use to the publish folder in the background, verified by checksum")
+        self.publisher = Publisher()  # Replaced by the project's own settings when it is opened
+
+        self.backup_store_chkbox = QCheckBox("Compressed Backups")
+        self.backup_store_chkbox.setToolTip("Keep backups compressed and deduplicated in the shot's backup store")
+
+        # Timings of scans, form updates and saves, aggregated per session and appended to the performance log
+        self.perf = PerfRecorder.from_environment()
+        self.profile_save_chkbox = QCheckBox("Profile Next Save")
+        self.profile_save_chkbox.setToolTip("Capture a cProfile of the next save next to the performance log")
+
         file_name_format_lbl = QLabel("File Name Format:")
+        self.name_format_config = NameFormatConfig()
+        self.name_formats = None
         self.file_name_format_cb = QComboBox()
+        self.file_name_format_cb.currentIndexChanged.connect(partial(self.mark_dirty, "name"))
 
         set_custom_name_format_btn = QPushButton("Set Custom")
         set_custom_name_format_btn.clicked.connect(self.set_custom_name_format)
@@ -77,15 +389,45 @@ class SceneSaver(QMainWindow):
         self.artist_name_le = QLineEdit()
         self.artist_name_le.setReadOnly(True)
 
+        # Versions of the selected department, read from its save manifest rather than by listing the folder
+        history_lbl = QLabel("Version History:")
+        self.save_history = SaveHistory()
+        self.hooks = HookPipeline(perf=self.perf)  # Replaced by the project's own pipeline when it is opened
+        self.history_manifest = None
+        self.history_key = None  # What the history list currently shows, so unchanged recomputes skip refilling it
+        self.history_filter_le = QLineEdit()
+        self.history_filter_le.setPlaceholderText("Filter by version, tag, artist, file or date")
+        self.history_filter_le.textChanged.connect(self.update_history)
+        self.history_backups_chkbox = QCheckBox("Show Backups")
+        self.history_backups_chkbox.toggled.connect(self.update_history)
+        self.history_tw = QTreeWidget()
+        self.history_tw.setColumnCount(len(HISTORY_COLUMNS))
+        self.history_tw.setHeaderLabels(list(HISTORY_COLUMNS))
+        self.history_tw.setRootIsDecorated(False)
+        self.history_tw.itemDoubleClicked.connect(self.open_history_version)
+        self.history_status_lbl = QLabel()
+        open_version_btn = QPushButton("Open Version")
+        open_version_btn.clicked.connect(self.open_history_version)
+        repair_history_btn = QPushButton("Repair History")
+        repair_history_btn.setToolTip("Rebuild the history of the department from the scenes and backups in its folder")
+        repair_history_btn.clicked.connect(self.repair_history)
+
         self.date_lbl = QLabel()
         self.date_lbl.setAlignment(Qt.AlignCenter)
         self.time_lbl = QLabel()
         self.time_lbl.setAlignment(Qt.AlignCenter)
 
         foleder_structure_preview_lbl = QLabel("Folder Structure Preview:")
-        self.folder_structure_preview_tw = QTreeWidget()
-        self.folder_structure_preview_tw.setHeaderLabels(["Folder Structure Preview"])
+        self.folder_model = FolderTreeModel(self)
+        self.folder_structure_preview_tv = QTreeView()
+        self.folder_structure_preview_tv.setModel(self.folder_model)
+        self.folder_structure_preview_tv.setUniformRowHeights(True)  # Lets the view skip measuring every row
+        self.folder_structure_preview_tv.expanded.connect(self.refresh_expanded_folder)
 
+        self.scan_status_lbl = QLabel()
+        self.scan_progress_bar = QProgressBar()
+        self.scan_progress_bar.setTextVisible(False)
+        self.scan_progress_bar.hide()
 
         save_btn = QPushButton("Save")
         save_btn.clicked.connect(self.save)
@@ -105,6 +447,7 @@ class SceneSaver(QMainWindow):
         gbox.addWidget(project_path_lbl, 1, 0)
         gbox.addWidget(self.project_path_le, 2, 0, 1, 3)
         gbox.addWidget(project_path_browse_btn, 2, 3)
+        gbox.addWidget(project_rescan_btn, 2, 4)
 
         gbox.addWidget(episode_lbl, 3, 0)
         gbox.addWidget(self.episode_cb, 4, 0)
@@ -118,6 +461,9 @@ class SceneSaver(QMainWindow):
         gbox.addWidget(department_lbl, 3, 3)
         gbox.addWidget(self.department_cb, 4, 3)
 
+        gbox.addWidget(find_shot_lbl, 3, 4)
+        gbox.addWidget(self.find_shot_le, 4, 4)
+
         gbox.addWidget(tags_lbl, 5, 0)
         gbox.addWidget(self.tags_cb, 6, 0)
 
@@ -127,12 +473,17 @@ class SceneSaver(QMainWindow):
         gbox.addWidget(file_type_lbl, 5, 2)
         gbox.addWidget(self.file_type_cb, 6, 2)
 
-        gbox.addWidget(self.bkp_prev_chkbox, 5, 3, 2, 1)
+        gbox.addWidget(self.bkp_prev_chkbox, 5, 3)
+        gbox.addWidget(self.backup_store_chkbox, 5, 4)
+        gbox.addWidget(self.auto_version_chkbox, 6, 3)
+        gbox.addWidget(self.scratch_save_chkbox, 6, 4)
 
         gbox.addWidget(file_name_format_lbl, 7, 0)
+        gbox.addWidget(self.publish_chkbox, 7, 4)
         gbox.addWidget(self.file_name_format_cb, 8, 0, 1, 3)
 
         gbox.addWidget(set_custom_name_format_btn, 8, 3)
+        gbox.addWidget(self.profile_save_chkbox, 8, 4)
 
         gbox.addWidget(file_name_lbl, 9, 0)
         gbox.addWidget(self.file_name_le, 10, 0, 1, 5)
@@ -144,9 +495,19 @@ class SceneSaver(QMainWindow):
 
         gbox.addWidget(self.time_lbl, 12, 3)
 
+        gbox.addWidget(history_lbl, 13, 0)
+        gbox.addWidget(self.history_filter_le, 13, 1, 1, 3)
+        gbox.addWidget(self.history_backups_chkbox, 13, 4)
+        gbox.addWidget(self.history_tw, 14, 0, 1, 5)
+        gbox.addWidget(self.history_status_lbl, 15, 0, 1, 3)
+        gbox.addWidget(open_version_btn, 15, 3)
+        gbox.addWidget(repair_history_btn, 15, 4)
+
         vbox = QVBoxLayout()
         vbox.addWidget(foleder_structure_preview_lbl)
-        vbox.addWidget(self.folder_structure_preview_tw)
+        vbox.addWidget(self.folder_structure_preview_tv)
+        vbox.addWidget(self.scan_status_lbl)
+        vbox.addWidget(self.scan_progress_bar)
         vbox.addLayout(hbox)
 
         hbox2 = QHBoxLayout()
@@ -161,197 +522,408 @@ class SceneSaver(QMainWindow):
         self.update_date_time()
         self.update_file_name_format_cb()
         self.update_artist()
-        self.create_file_name()
+        self.mark_dirty("name")
+
+        # Once the window is up, reopen the last project from its persisted index
+        QTimer.singleShot(0, self.restore_last_project)
 
     def browse_project_path(self):
         """
         Browse project path dialog
         """
-        self.episode_cb.clear()
+        project_path = cmds.fileDialog2(fileMode=3, dialogStyle=2, caption="Select Project Directory")
+        if project_path:
+            self.open_project(project_path[0])
+
+    def open_project(self, root_path):
+        """
+        Show a project root and remember it for the next Maya session
+        """
+        self.project_path = [root_path]
+        self.project_path_le.setText(root_path)
+        self.populate_tree() # Populate the folder structure preview tree
+
+        # The project can add its own name formats
+        self.name_format_config.project_root = root_path
+        self.save_history.ledger = SaveLedger(root_path)
+        self.hooks.shutdown(wait=False)  # Post-save stages already queued still run
+        self.hooks = HookPipeline.for_project(root_path, self.perf)
+        self.publisher.shutdown(wait=False)
+        self.publisher = Publisher.for_project(root_path)
+        self.update_file_name_format_cb()
 
-        self.project_path = cmds.fileDialog2(fileMode=3, dialogStyle=2, caption="Select Project Directory")
-        if self.project_path:
-            self.project_path_le.setText(self.project_path[0])
-            self.populate_tree() # Populate the folder structure preview tree
+        try:
+            save_user_setting("last_project", root_path)
+        except OSError as e:
+            print(f"Could not remember the project path: {e}")
 
-    def populate_tree(self):
+    def restore_last_project(self):
         """
-        Populate the folder structure preview tree
+        Reopen the project browsed last time, the crawl only re-lists folders that changed since
         """
-        self.folder_structure_preview_tw.clear()
-        root_item = QTreeWidgetItem([os.path.basename(self.project_path[0])])
-        self.folder_structure_preview_tw.addTopLevelItem(root_item)
-        self.add_subfolders(root_item, self.project_path[0])
-        self.make_project_dict()
+        last_project = load_user_settings().get("last_project")
+        if self.project_index is None and last_project and os.path.isdir(last_project):
+            self.open_project(last_project)
 
-    def add_subfolders(self, parent_item, parent_path):
+    def reopen(self):
         """
-        Add subfolders and files to the tree
+        Show the hidden window again, refreshing only what changed while it was closed
         """
-        for item in os.listdir(parent_path):
-            item_path = os.path.join(parent_path, item)
+        if self.project_index is not None and self.scan_worker is None:
+            if self.scan_completed:
+                self.refresh_stale_folders()
+            else:
+                self.populate_tree()  # The crawl was cut short when the window closed
 
-            if os.path.isdir(item_path):
-                trw_item = QTreeWidgetItem([item])
-                parent_item.addChild(trw_item)
-                self.add_subfolders(trw_item, item_path)
+        self.update_date_time()
+        self.update_file_name_format_cb()
+        self.mark_dirty("name")
 
-    def make_project_dict(self):
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def refresh_stale_folders(self):
         """
-        Create a dictionary of the project structure
+        Re-list the root, episode and sequence folders whose mtime moved and resume watching them
         """
+        watched = self.project_index.project_dict_folders()
+        for rel_path in self.project_index.stale_folders(watched):
+            self.pending_folder_changes.add(self.project_index.full_path(rel_path))
+
+        self.apply_folder_changes()
+
+    def rescan_project(self):
+        """
+        Rebuild the project index from scratch, ignoring the persisted one
+        """
+        if self.project_index is not None:
+            self.populate_tree(force_rebuild=True)
+
+    def populate_tree(self, force_rebuild=False):
+        """
+        Populate the folder structure preview tree
+        """
+        # Stop a crawl of a previously browsed root before starting a new one
+        self.cancel_scan()
+
+        # The tree and the project dict are both built from this index as the background crawl fills it
+        self.project_index = ProjectIndex(self.project_path[0])
+        self.scan_completed = False
         self.project_dict = {}
-        project = os.path.basename(self.project_path[0])
-        self.project_dict[project] = {}
+        self.save_planner.project_dict = self.project_dict
+        self.shot_search_index = None
+        self.stop_watching()
+        self.mark_dirty("episodes")
 
-        # Check all items in the project directory
-        for each in os.listdir(self.project_path[0]):
-            item_path = os.path.join(self.project_path[0], each)
+        self.folder_model.set_project_index(self.project_index)
+        self.folder_structure_preview_tv.expand(self.folder_model.index(0, 0))
 
-            if os.path.isdir(item_path):  # Only process directories
-                self.folder_to_dict(item_path, project)
+        self.start_scan(force_rebuild)
 
-        print("Final Project Dict:", self.project_dict)  # Debugging Output
-        self.update_ep_cb_list()
-        return self.project_dict  # Return the dictionary if needed
+    def start_scan(self, force_rebuild=False):
+        """
+        Crawl the project root on a worker thread, results are merged in batches on the main thread
+        """
+        worker = ProjectScanWorker(self.project_index.root_path, force_rebuild, self.perf, self.project_index.rules)
+        worker.signals.batch_scanned.connect(partial(self.merge_scan_batch, worker))
+        worker.signals.finished.connect(partial(self.finish_scan, worker))
+        self.scan_worker = worker
+
+        self.scan_progress_bar.setRange(0, 0)  # Busy indicator, the folder count is unknown up front
+        self.scan_progress_bar.show()
+        self.scan_status_lbl.setText("Scanning project...")
+
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_scan(self):
+        """
+        Cancel the running project crawl, if any
+        """
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.scan_worker = None
 
-    def folder_to_dict(self, item_path, project):
+        self.scan_progress_bar.hide()
+
+    def merge_scan_batch(self, worker, batch):
         """
-        Recursively populate project dictionary with episode, sequence, and shot structure
+        Merge a batch of scanned folders into the index, the tree and the combo boxes
         """
-        if not os.path.isdir(item_path):
-            return  # Skip non-directory items
+        if worker is not self.scan_worker:
+            return  # Late batch from a cancelled crawl
+
+        # Folders expanded before the crawl reached them get their rows here
+        self.folder_model.merge_batch(batch)
+        self.scan_status_lbl.setText(f"Scanning project... {self.project_index.folder_count()} folders")
 
-        ep_name = os.path.basename(item_path)
+        if any(ProjectIndex.affects_project_dict(rel_path) for rel_path in batch):
+            self.make_project_dict()
 
-        # Ensure the episode folder is added even if it has no sequences
-        if "ep" in ep_name.lower():
-            if ep_name not in self.project_dict[project]:
-                self.project_dict[project][ep_name] = {}
+    def finish_scan(self, worker, completed):
+        """
+        Called when the crawl is done or has been cancelled
+        """
+        if worker is not self.scan_worker:
+            return
 
-            for sq_item in os.listdir(item_path):
-                sq_item_path = os.path.join(item_path, sq_item)
+        self.scan_worker = None
+        self.scan_completed = completed
+        self.scan_progress_bar.hide()
+        self.scan_status_lbl.setText(f"{self.project_index.folder_count()} folders scanned, {worker.index.listed_count} re-listed")
 
-                if os.path.isdir(sq_item_path) and "sq" in sq_item.lower():
-                    if sq_item not in self.project_dict[project][ep_name]:
-                        self.project_dict[project][ep_name][sq_item] = {}
+        if completed:
+            self.sync_watched_folders()
 
-                    for sh_item in os.listdir(sq_item_path):
-                        sh_item_path = os.path.join(sq_item_path, sh_item)
+    def sync_watched_folders(self):
+        """
+        Watch the root, episode and sequence folders, whose listings hold the episodes, sequences and shots
 
-                        if os.path.isdir(sh_item_path) and "sh" in sh_item.lower():
-                            self.project_dict[project][ep_name][sq_item][sh_item] = sh_item_path
-        else:
-            # If it's not an episode, check if it contains episodes inside
-            for sub_item in os.listdir(item_path):
-                sub_item_path = os.path.join(item_path, sub_item)
+        Shot folders aren't watched, a show has thousands of them and each costs a
+        watch handle of a limited per-user budget. They are re-listed when changed
+        as their sequence is selected or expanded instead.
+        """
+        wanted = {self.project_index.full_path(rel_path) for rel_path in self.project_index.project_dict_folders()}
+        watched = set(self.fs_watcher.directories())
+
+        if watched - wanted:
+            self.fs_watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.fs_watcher.addPaths(list(wanted - watched))
+
+    def refresh_unwatched_folders(self, rel_paths):
+        """
+        Queue the unwatched folders among rel_paths whose mtime moved since they were listed, one stat each
+        """
+        if self.project_index is None or self.scan_worker is not None:
+            return  # The running crawl lists them
+
+        for rel_path in self.project_index.stale_folders(rel_paths):
+            self.queue_folder_change(self.project_index.full_path(rel_path))
+
+    def refresh_expanded_folder(self, index):
+        """
+        Check the shots of an expanded sequence, or an expanded folder below a shot, for changes
+        """
+        if self.project_index is None or not index.isValid():
+            return
+
+        node = index.internalId()
+        rel_path = self.project_index.path(node)
+        level = self.project_index.rules.level(rel_path)
+        if level == "sequence":
+            self.refresh_unwatched_folders([self.project_index.path(self.project_index.child(node, row))
+                                            for row in range(self.project_index.child_count(node))])
+        elif level not in ("root", "group", "episode"):
+            self.refresh_unwatched_folders([rel_path])
+
+    def stop_watching(self):
+        """
+        Stop watching the current project and drop queued changes
+        """
+        if self.fs_watcher.directories():
+            self.fs_watcher.removePaths(self.fs_watcher.directories())
+
+        self.pending_folder_changes.clear()
+        self.first_pending_change = None
+        self.watch_timer.stop()
+
+    def queue_folder_change(self, folder_path):
+        """
+        Queue a changed folder, a burst of changes is applied as a single refresh
+        """
+        now = time.monotonic()
+        if self.first_pending_change is None:
+            self.first_pending_change = now
+
+        self.pending_folder_changes.add(folder_path)
+
+        # Restart the quiet period, unless the oldest change has already waited long enough
+        if (now - self.first_pending_change) * 1000 < WATCH_MAX_DELAY_MS or not self.watch_timer.isActive():
+            self.watch_timer.start()
+
+    def apply_folder_changes(self):
+        """
+        Re-list the changed folders and update the index, the tree and the combo boxes once
+        """
+        if self.scan_worker is not None:
+            self.watch_timer.start()  # Let the running crawl finish first
+            return
+
+        changed_paths = self.pending_folder_changes
+        self.pending_folder_changes = set()
+        self.first_pending_change = None
 
-                if os.path.isdir(sub_item_path) and "ep" in sub_item.lower():
-                    self.folder_to_dict(sub_item_path, project)
+        project_dict_changed = False
+        for folder_path in sorted(changed_paths):
+            rel_path = self.project_index.rel_path(folder_path)
+            if rel_path is None or not self.project_index.is_scanned(rel_path):
+                continue
+
+            added, removed = self.project_index.refresh_folder(rel_path, observer=self.folder_model)
+            if added or removed:
+                project_dict_changed = project_dict_changed or ProjectIndex.affects_project_dict(rel_path)
+
+        if project_dict_changed:
+            self.make_project_dict()
+
+        self.sync_watched_folders()
+
+    def make_project_dict(self):
+        """
+        Create a dictionary of the project structure
+        """
+        self.project_dict = self.project_index.to_project_dict()
+        self.save_planner.project_dict = self.project_dict
+        self.shot_search_index = None
+        self.mark_dirty("episodes")
+        return self.project_dict  # Return the dictionary if needed
+
+    def mark_dirty(self, level, *args):
+        """
+        Mark part of the form as out of date and schedule a recompute
+
+        level is "episodes", "sequences" or "shots" when that combo box and the ones
+        below it must be refilled, or "name" when only the file name is affected.
+        Any number of calls before the next event loop tick share one recompute.
+        """
+        self.dirty_levels.add(level)
+        if not self.recompute_timer.isActive():
+            self.recompute_timer.start()
+
+    def recompute(self):
+        """
+        Refill the dirty combo boxes top-down, then render the file name exactly once
+        """
+        dirty_levels = self.dirty_levels
+        self.dirty_levels = set()
+        self.recompute_count += 1
+
+        refills = [self.update_ep_cb_list, self.update_sq_cb_list, self.update_sh_cb_list]
+        for position, level in enumerate(CASCADE_LEVELS):
+            if level in dirty_levels:
+                # Refilling a combo box invalidates every combo box below it
+                with self.perf.span("combos"):
+                    for refill in refills[position:]:
+                        refill()
+                break
+
+        self.wanted_selection = {}
+        self.create_file_name()
+        self.update_history()
 
     def update_ep_cb_list(self):
         """
-        Update the episode combo box list and connect signals
+        Update the episode combo box list, keeping the current selection when it still exists
         """
+        current_ep = self.wanted_selection.get("episodes") or self.episode_cb.currentText()
+        self.episode_cb.blockSignals(True)
         self.episode_cb.clear()
-        self.sq_dict = {}
-        self.sh_dict = {}
-        
+
         if self.project_dict:
             self.project_name = next(iter(self.project_dict))
             episodes = self.project_dict[self.project_name].keys()
 
             if episodes:
                 self.episode_cb.addItems(episodes)
-                self.episode_cb.currentIndexChanged.connect(self.update_sq_cb_list)
-                self.episode_cb.currentTextChanged.connect(self.create_file_name)
-                self.episode_cb.setCurrentIndex(0)
-                self.update_sq_cb_list()
+                self.episode_cb.setCurrentIndex(max(self.episode_cb.findText(current_ep), 0))
+
+        self.episode_cb.blockSignals(False)
 
     def update_sq_cb_list(self):
         """
         Update the sequence combo box list
         """
+        current_sq = self.wanted_selection.get("sequences") or self.sequence_cb.currentText()
+        self.sequence_cb.blockSignals(True)
         self.sequence_cb.clear()
-        
+
         self.selected_ep = self.episode_cb.currentText()
-        if self.selected_ep in self.project_dict[self.project_name]:
-            sequences = self.project_dict[self.project_name][self.selected_ep].keys()
+        sequences = self.project_dict.get(self.project_name, {}).get(self.selected_ep, {}).keys()
 
-            if sequences:
-                self.sequence_cb.addItems(sequences)
-                self.sequence_cb.currentIndexChanged.connect(self.update_sh_cb_list)
-                self.sequence_cb.currentTextChanged.connect(self.create_file_name)
-                self.sequence_cb.setCurrentIndex(0)
+        if sequences:
+            self.sequence_cb.addItems(sequences)
+            self.sequence_cb.setCurrentIndex(max(self.sequence_cb.findText(current_sq), 0))
 
-                self.update_sh_cb_list()
+        self.sequence_cb.blockSignals(False)
 
     def update_sh_cb_list(self):
         """
         Update the shot combo box list
         """
+        current_sh = self.wanted_selection.get("shots") or self.shot_cb.currentText()
+        self.shot_cb.blockSignals(True)
         self.shot_cb.clear()
 
         self.selected_sq = self.sequence_cb.currentText()
-        if self.selected_sq in self.project_dict[self.project_name][self.selected_ep]:
-            shots = self.project_dict[self.project_name][self.selected_ep][self.selected_sq].keys()
+        shot_paths = self.project_dict.get(self.project_name, {}).get(self.selected_ep, {}).get(self.selected_sq, {})
+        shots = shot_paths.keys()
+        if self.project_index is not None:
+            self.refresh_unwatched_folders(list(filter(None, map(self.project_index.rel_path, shot_paths.values()))))
+
+        if shots:
             self.shot_cb.addItems(shots)
+            self.shot_cb.setCurrentIndex(max(self.shot_cb.findText(current_sh), 0))
 
-        if self.shot_cb:
-            self.shot_cb.setCurrentIndex(0)
-            self.shot_cb.currentIndexChanged.connect(self.create_file_name)
+        self.shot_cb.blockSignals(False)
 
-    def update_file_name_format_cb(self):
+    def update_search_results(self, query):
         """
-        Update the file naming format combo box list and save to JSON as a dictionary
+        Rank the episodes, sequences and shots matching the search box and show them in its popup
         """
-        
-        default_formats = [
-            "{proj}_{dept}_{ver}.{ftype}",
-            "{proj}_{sh}_{ver}.{ftype}",
-            "{dept}_{tag}_{ver}.{ftype}",
-            "{sh}_{dept}_{tag}_{ver}.{ftype}",
-            "{proj}_{sh}_{dept}_bkp_{ver}.{ftype}",
-            "{proj}_{sh}_{dept}_{artist}_{ver}.{ftype}",
-            "{proj}_{sh}_{dept}_{date}_{ver}.{ftype}",
-            "{proj}_{sq}_{sh}_render_{ver}.{ftype}",
-            "{proj}_{sh}_final_render_{date}.{ftype}",
-            "{proj}_{sq}_{sh}_{dept}_bkp_{date}.{ftype}",
-            "{sq}_{sh}_{dept}_{artist}_{tag}_{ver}.{ftype}",
-            "{proj}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}",
-            "{proj}_{ep}_{sq}_{sh}_{dept}_{ver}.{ftype}",
-            "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}",
-            "{proj}_{sq}_{sh}_{dept}_{artist}_{date}_{time}.{ftype}",
-            "{proj}_{ep}_{sq}_{sh}_{tag}_{dept}_{artist}_{date}_{time}_{ver}.{ftype}"
-        ]
-        
-        file_path = os.path.join(os.path.expanduser("~"), "file_name_formats.json")
+        with self.perf.span("search"):
+            if self.shot_search_index is None:
+                self.shot_search_index = ShotSearchIndex(self.project_dict)
+            matches = self.shot_search_index.search(query)
 
-        # Load existing formats if the file exists
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r") as file:
-                    existing_data = json.load(file)
-            except json.JSONDecodeError:
-                existing_data = {"formats": []}
+        self.search_results = {" / ".join(filter(None, match)): match for match in matches}
+        self.find_shot_model.setStringList(list(self.search_results))
+
+        if self.search_results:
+            self.find_shot_completer.complete()
         else:
-            existing_data = {"formats": []}
+            self.find_shot_completer.popup().hide()
+
+    def select_search_result(self, label):
+        """
+        Select the episode, sequence and shot of a search result with a single recompute
+        """
+        match = self.search_results.get(label)
+        if match is None:
+            return
 
-        # Merge default formats with user-added formats, avoiding duplicates
-        merged_formats = list(set(default_formats + existing_data.get("formats", [])))
-        existing_data["formats"] = merged_formats
+        self.wanted_selection = dict(zip(CASCADE_LEVELS, match))
+        self.mark_dirty("episodes")
+        self.search_results = {}
+        self.find_shot_le.clear()
 
-        # Save the merged formats back to the JSON file as a dictionary
-        with open(file_path, "w") as file:
-            json.dump(existing_data, file, indent=4)
+    def select_first_search_result(self):
+        """
+        Enter in the search box picks the best result
+        """
+        if self.search_results:
+            self.select_search_result(next(iter(self.search_results)))
 
-        # Update the combo box
-        self.file_name_format_cb.clear()
-        self.file_name_format_cb.addItems(merged_formats)
+    def update_file_name_format_cb(self):
+        """
+        Update the file naming format combo box list from the merged format layers
 
-        if self.file_name_format_cb:
-            self.file_name_format_cb.setCurrentIndex(0)
-            self.file_name_format_cb.currentIndexChanged.connect(self.create_file_name)        
+        The layer files are only read again when they changed and the combo box is
+        only refilled when the list itself changed, nothing is ever written back.
+        """
+        name_formats = self.name_format_config.formats()
+        if name_formats == self.name_formats:
+            return
+        self.name_formats = name_formats
+
+        # Update the combo box, keeping the current format selected
+        current_format = self.file_name_format_cb.currentText()
+        self.file_name_format_cb.blockSignals(True)
+        self.file_name_format_cb.clear()
+        self.file_name_format_cb.addItems(name_formats)
+        self.file_name_format_cb.setCurrentIndex(max(self.file_name_format_cb.findText(current_format), 0))
+        self.file_name_format_cb.blockSignals(False)
+        self.mark_dirty("name")
 
     def set_custom_name_format(self):
         set_custom_name_format_window(self)
@@ -377,31 +949,184 @@ class SceneSaver(QMainWindow):
 
         QTimer.singleShot(1000, self.update_date_time)
 
-    def create_file_name(self):
+    def name_fields(self):
+        """
+        Collect the placeholder values from the widgets
+        """
+        return {
+            "proj": os.path.basename(self.project_path_le.text()).replace(" ", ""),
+            "ep": self.episode_cb.currentText(),
+            "sq": self.sequence_cb.currentText(),
+            "sh": self.shot_cb.currentText(),
+            "tag": self.tags_cb.currentText(),
+            "dept": self.department_cb.currentText(),
+            "artist": self.artist_name_le.text(),
+            "date": self.date_lbl.text().replace("/", ""),
+            "time": self.time_lbl.text().replace(":", ""),
+            "ver": version_token(self.version_dsb.value()),
+            "ftype": self.file_type_cb.currentText().split("*.")[1],
+        }
+
+    def create_file_name(self, refresh_version=False):
         """
         Creates the file name based on the values set on the widgets by the user
         """
-        self.file_name_le.clear()
+        with self.perf.span("file_name"):
+            self.file_name_le.clear()
+
+            fields = self.name_fields()
+            selected_name_format = self.file_name_format_cb.currentText()
+
+            try:
+                template = compile_name_format(selected_name_format)
+            except NameFormatError as e:
+                print(e)
+                return
+
+            if self.auto_version_chkbox.isChecked():
+                self.apply_auto_version(selected_name_format, fields, refresh_version)
+
+            # Replace the placeholders with the actual values
+            file_name = template.render(fields)
+
+            self.file_name_le.setText(file_name)
+
+    def apply_auto_version(self, name_format, fields, refresh=False):
+        """
+        Set the version to the next free one in the department folder, from the cached version index
+        """
+        try:
+            next_version = self.save_planner.resolve_version(fields, name_format, refresh)
+        except NameFormatError as e:
+            cmds.warning(f"No free version left: {e}")
+            return
+
+        if next_version is None:
+            return  # No shot selected or the format has no version placeholder
 
-        proj = os.path.basename(self.project_path_le.text()).replace(" ", "")
-        ep = self.episode_cb.currentText()
-        sq = self.sequence_cb.currentText()
-        sh = self.shot_cb.currentText()
-        tag = self.tags_cb.currentText() 
-        dept = self.department_cb.currentText()
-        artist = self.artist_name_le.text()
-        date = self.date_lbl.text().replace("/", "")
-        time = self.time_lbl.text().replace(":", "")
-        ver = str(self.version_dsb.value()).replace(".", "")
-        ftype = self.file_type_cb.currentText().split("*.")[1]
+        self.version_dsb.blockSignals(True)
+        self.version_dsb.setValue(next_version)
+        self.version_dsb.blockSignals(False)
 
-        selected_name_format = self.file_name_format_cb.currentText()
+    def toggle_auto_version(self, checked):
+        """
+        The version is read only while it is resolved automatically
+        """
+        self.version_dsb.setEnabled(not checked)
+        self.mark_dirty("name")
 
-        # Replace the placeholders with the actual values
-        file_name = selected_name_format.format(proj=proj, ep=ep, sq=sq, sh=sh, tag=tag, dept=dept,
-        artist=artist, date=date, time=time, ver=ver, ftype=ftype)
+    def update_history(self, *args):
+        """
+        List the versions in the save manifest of the selected department, newest first and filtered
 
-        self.file_name_le.setText(file_name)
+        Costs one stat of the manifest when nothing changed, the list is only
+        refilled when the department, the manifest or the filter did.
+        """
+        with self.perf.span("history"):
+            dept_folder = self.save_planner.dept_folder(self.name_fields()) if self.project_dict else None
+            self.history_manifest = self.save_history.manifest(dept_folder) if dept_folder else None
+            entries = self.history_manifest.entries() if self.history_manifest else []
+
+            manifest_key = self.history_manifest.cache[0] if self.history_manifest and self.history_manifest.cache else None
+            key = (dept_folder, manifest_key, self.history_filter_le.text(), self.history_backups_chkbox.isChecked())
+            if key == self.history_key:
+                return
+            self.history_key = key
+
+            self.history_tw.clear()
+            for entry in SaveManifest.filter_entries(entries, key[2], key[3]):
+                self.history_tw.addTopLevelItem(self.make_history_item(entry))
+
+        if not entries and dept_folder and os.path.isdir(dept_folder):
+            self.history_status_lbl.setText("No history recorded yet, Repair History builds it from the folder")
+        else:
+            self.history_status_lbl.setText(f"{len(entries)} records" if entries else "")
+
+    def make_history_item(self, entry):
+        """
+        A row of the history list, holding its manifest record
+        """
+        try:
+            saved = dt.strptime(entry.get("timestamp", ""), HISTORY_TIMESTAMP_FORMAT).strftime("%d/%m/%Y %H:%M:%S")
+        except ValueError:
+            saved = entry.get("timestamp", "")
+
+        size = entry.get("size")
+        version = entry.get("version") or ""
+        texts = [
+            version if entry.get("event") == "save" else f"{version} (backup)",
+            entry.get("tag") or "",
+            entry.get("artist") or "",
+            saved,
+            f"{size / 1024 / 1024:.1f} MB" if size is not None else "",
+            entry.get("file", ""),
+        ]
+
+        item = QTreeWidgetItem(texts)
+        item.setData(0, Qt.UserRole, entry)
+        return item
+
+    def open_history_version(self, item=None, column=None):
+        """
+        Open the scene, or plain backup, of a history record in Maya
+        """
+        item = item or self.history_tw.currentItem()
+        if item is None or self.history_manifest is None:
+            return
+
+        entry = item.data(0, Qt.UserRole)
+        backup = entry.get("backup")
+        if backup and backup.startswith("store:"):
+            print(f"{entry['file']} from {entry['timestamp']} is in the compressed backup store, restore it with BackupStore.restore first.")
+            return
+
+        file_path = os.path.join(self.history_manifest.dept_folder, backup or entry["file"])
+        if not os.path.isfile(file_path):
+            cmds.warning(f"{file_path} no longer exists, use Repair History to refresh the list.")
+            return
+
+        if cmds.file(query=True, modified=True):
+            response = cmds.confirmDialog(
+                title="Open Version",
+                message="The current scene has unsaved changes. Open this version anyway?",
+                button=["Open", "Cancel"],
+                defaultButton="Cancel",
+                cancelButton="Cancel",
+                dismissString="Cancel"
+            )
+            if response != "Open":
+                return
+
+        cmds.file(file_path, open=True, force=True)
+        print(f"Opened {file_path}")
+
+    def repair_history(self):
+        """
+        Rebuild the save manifest of the selected department from disk, in the background
+        """
+        if self.history_manifest is None:
+            print("Select a shot and a department to repair their history.")
+            return
+
+        if not os.path.isdir(self.history_manifest.dept_folder):
+            print(f"{self.history_manifest.dept_folder} doesn't exist yet, there is no history to repair.")
+            return
+
+        self.history_status_lbl.setText("Rebuilding the history from the folder...")
+        self.save_history.repair(self.history_manifest.dept_folder, self.file_name_format_cb.currentText(),
+                                 on_done=partial(utils.executeDeferred, self.finish_history_repair))
+
+    def finish_history_repair(self, dept_folder, count, error):
+        """
+        Called on the main thread once a history repair is done
+        """
+        if error is not None:
+            cmds.warning(f"Could not rebuild the history of {dept_folder}: {error}")
+        else:
+            print(f"History of {dept_folder} rebuilt with {count} records")
+
+        self.history_key = None
+        self.update_history()
 
     def create_dept_folder(self):
         """
@@ -409,20 +1134,16 @@ class SceneSaver(QMainWindow):
         
         """
         self.selected_sh = self.shot_cb.currentText()
-        dept = self.department_cb.currentText()
         if not self.project_dict:
-            print("Project structure is not initialized!")
-            return
+            raise SavePlanError("Project structure is not initialized!")
 
-        try:
-            shot_path = self.project_dict[self.project_name][self.selected_ep][self.selected_sq][self.selected_sh]
-            self.dept_folder = os.path.join(shot_path, dept)
+        self.dept_folder = self.save_planner.dept_folder(self.name_fields())
+        if not self.dept_folder:
+            raise SavePlanError("Invalid project structure selection!")
 
+        with self.perf.span("create_dept_folder"):
             os.makedirs(self.dept_folder, exist_ok = True)
 
-        except KeyError:
-            print("Invalid project structure selection!")
-            
     def save(self):
         """
         Save the file with user choice for backing up, versioning up manually, or canceling
@@ -434,11 +1155,32 @@ class SceneSaver(QMainWindow):
             print("File name is empty! Generate a file name before saving.")
             return
 
+        profile = self.profile_save_chkbox.isChecked()
+        with self.perf.operation("save", profile=profile) as perf_info:
+            perf_info["result"] = self.save_scene(given_name, perf_info)
+
+        if profile:
+            self.profile_save_chkbox.setChecked(False)  # Profiling is for a single save
+            if perf_info.get("profile"):
+                print(f"Save profile written to {perf_info['profile']}")
+
+    def save_scene(self, given_name, perf_info):
+        """
+        Resolve the destination, handle an existing file and save, returns "saved", "cancelled" or "failed"
+        """
         try:
             self.create_dept_folder()
+
+            if self.auto_version_chkbox.isChecked():
+                # Pick up versions saved since the name was rendered, so the save never clashes
+                self.create_file_name(refresh_version=True)
+                given_name = self.file_name_le.text()
+
             full_path = os.path.join(self.dept_folder, given_name)
+            perf_info.update(path=full_path, tag=self.tags_cb.currentText(), scratch=self.scratch_save_chkbox.isChecked())
 
             # Check if file exists
+            overwrite = False
             if os.path.exists(full_path):
                 response = cmds.confirmDialog(
                     title="File Exists",
@@ -450,68 +1192,207 @@ class SceneSaver(QMainWindow):
                 )
 
                 if response == "Backup & Overwrite":
-                    if self.bkp_prev_chkbox.isChecked():
-                        self.backup_previous(full_path)
-                    else:
-                        self.bkp_prev_chkbox.setChecked(True)
-                        self.backup_previous(full_path)
+                    overwrite = True
 
                 elif response == "Manually Version Up":
                     print("User chose to manually enter a new version. Update the version field and try saving again.")
-                    return  # Stop execution so the user can manually change the version
+                    return "cancelled"  # Stop execution so the user can manually change the version
 
                 else:  # User clicked "Cancel"
                     print("File save canceled by user.")
+                    return "cancelled"
+
+            file_type = maya_file_type(given_name)
+            fields = self.saved_fields(given_name)
+
+            # Clean-ups and checks registered for the department, a failing required stage stops the save here
+            hook_context = self.hooks.context(full_path, fields, file_type)
+            try:
+                perf_info["pre_save"] = self.hooks.run_pre(hook_context)
+            except SaveHookError as e:
+                cmds.warning(f"{e}, the scene was not saved")
+                return "failed"
+            self.report_hooks(hook_context, perf_info["pre_save"])
+
+            # A published tag also copies the files the scene uses, listed from Maya before the save
+            dependencies = None
+            if self.publish_chkbox.isChecked() and self.publisher.publishes(fields.get("tag")):
+                with self.perf.span("gather_dependencies"):
+                    dependencies = scene_dependencies()
+                perf_info["dependencies"] = len(dependencies)
+
+            if overwrite:
+                # A scratch save replaces the file with a rename, so the original can stay until then
+                keep_original = self.scratch_save_chkbox.isChecked()
+                if self.bkp_prev_chkbox.isChecked():
+                    self.backup_previous(full_path, keep_original)
+                else:
+                    self.bkp_prev_chkbox.setChecked(True)
+                    self.backup_previous(full_path, keep_original)
+
+            if self.scratch_save_chkbox.isChecked():
+                self.save_via_scratch(full_path, file_type, fields, hook_context, dependencies)
+            else:
+                # Rename and save the file in Maya
+                with self.perf.span("maya_save"):
+                    save_maya_scene(full_path, file_type)
+                print(f"File saved successfully: {full_path}")
+                self.finish_save(full_path, fields, None, hook_context, dependencies)
+
+            self.version_index.invalidate(self.dept_folder)
+            if self.auto_version_chkbox.isChecked():
+                self.create_file_name()  # Propose the next version right away
+
+            return "saved"
+
+        except SavePlanError as e:
+            print(f"Error: Could not determine the file path for saving. {e}")
+            return "failed"
+
+    def saved_fields(self, file_name):
+        """
+        Placeholder values of a file name about to be saved, the widgets filling in what the name doesn't hold
+        """
+        try:
+            parsed = compile_name_format(self.file_name_format_cb.currentText()).parse(file_name)
+        except NameFormatError:
+            parsed = None
+        return dict(self.name_fields(), **(parsed or {}))
+
+    def save_via_scratch(self, full_path, file_type, fields, hook_context=None, dependencies=None):
+        """
+        Save to local scratch and hand the copy to the network share over to the transfer queue
+        """
+        with self.perf.span("scratch_save"):
+            scratch_path = self.transfer_queue.save_to_scratch(partial(save_maya_scene, file_type=file_type), full_path)
+
+        # The scene stays open under its scratch path until the transfer is done, so a Ctrl+S in the
+        # meantime lands in scratch and is transferred too instead of being replaced by the older copy
+        finish = partial(self.finish_transfer, fields=fields, hook_context=hook_context, dependencies=dependencies)
+        self.submit_transfer(scratch_path, full_path, finish)
+        self.version_index.add_pending(os.path.dirname(full_path), os.path.basename(full_path))
+
+        print(f"File saved to local scratch, transferring in the background: {full_path}")
+
+    def submit_transfer(self, scratch_path, full_path, finish):
+        """
+        Queue the copy of a scratch save, finish is called on the main thread with the scratch file's state it copied
+        """
+        finish = partial(finish, scratch_path=scratch_path, scratch_signature=file_signature(scratch_path))
+        self.transfer_queue.submit(scratch_path, full_path, on_done=partial(utils.executeDeferred, finish), keep_scratch=True)
+
+    def finish_transfer(self, full_path, checksum, error, scratch_path=None, scratch_signature=None, fields=None,
+                        hook_context=None, dependencies=None):
+        """
+        Called on the main thread once a background transfer is done
+        """
+        if error is not None:
+            self.version_index.remove_pending(os.path.dirname(full_path), os.path.basename(full_path))
+            cmds.warning(f"Transfer to {full_path} failed, the scene is kept in {self.transfer_queue.scratch_folder}: {error}")
+            return
+
+        if scratch_path is not None:
+            scene_path = cmds.file(query=True, sceneName=True) or ""
+            if os.path.normcase(os.path.normpath(scene_path)) == os.path.normcase(os.path.normpath(scratch_path)):
+                if file_signature(scratch_path) != scratch_signature:
+                    # Saved again while transferring, that save goes to the share as well
+                    self.submit_transfer(scratch_path, full_path, partial(self.finish_transfer, fields=fields,
+                                                                          hook_context=hook_context, dependencies=dependencies))
                     return
+                cmds.file(rename=full_path)  # Further saves go straight to the share
+            shutil.rmtree(os.path.dirname(scratch_path), ignore_errors=True)
 
-            # Rename and save the file in Maya
-            cmds.file(rename=full_path)
-            cmds.file(save=True, type="mayaBinary" if given_name.endswith(".mb") else "mayaAscii")
+        self.version_index.remove_pending(os.path.dirname(full_path), os.path.basename(full_path))
 
-            print(f"File saved successfully: {full_path}")
+        print(f"File saved successfully: {full_path} (sha256 {checksum})")
+        self.finish_save(full_path, fields or {}, checksum, hook_context, dependencies)
+        cmds.inViewMessage(amg=f'Transferred {os.path.basename(full_path)}', pos='topCenter', fade=True)
 
-        except KeyError:
-            print("Error: Could not determine the file path for saving.")
+    def finish_save(self, full_path, fields, checksum=None, hook_context=None, dependencies=None):
+        """
+        Everything that follows a save once the file is in place: history, post-save hooks and publish
+        """
+        self.record_save(full_path, fields, checksum)
+        if hook_context is not None:
+            self.hooks.run_post(hook_context, on_done=partial(utils.executeDeferred, self.report_hooks))
+        if dependencies is not None:
+            self.publish(full_path, fields, dependencies)
 
-    def backup_previous(self, file_path):
+    def publish(self, full_path, fields, dependencies):
         """
-        Backup the previous file if it exists before overwriting
+        Copy a published scene and the files it uses to its publish folder in the background
         """
-        if os.path.exists(file_path):
-            backup_folder = os.path.join(os.path.dirname(file_path), "backup")
+        try:
+            self.publisher.publish(full_path, fields, dependencies, on_done=partial(utils.executeDeferred, self.finish_publish))
+        except PublishError as e:
+            cmds.warning(f"Could not publish {os.path.basename(full_path)}: {e}")
+            return
+        print(f"Publishing {os.path.basename(full_path)} and {len(dependencies)} dependencies in the background")
 
-            # Create a backup directory if it doesn't exist
-            os.makedirs(backup_folder, exist_ok=True)
+    def finish_publish(self, publish_folder, manifest, error):
+        """
+        Called on the main thread once a publish is done
+        """
+        summary = Publisher.describe(manifest)
+        if error is not None:
+            cmds.warning(f"Publish to {publish_folder} is incomplete, {summary}: {error}")
+            return
+
+        print(f"Published to {publish_folder}: {summary}")
+        cmds.inViewMessage(amg=f"Published {manifest['scene']}", pos="topCenter", fade=True)
+
+    def report_hooks(self, hook_context, results):
+        """
+        Print how long each save hook stage took, failing stages as warnings
+        """
+        if not results:
+            return
+        print(f"Save hooks for {os.path.basename(hook_context['path'])}: {HookPipeline.describe(results)}")
+        for result in results:
+            if result["error"] is not None:
+                cmds.warning(f"{result['phase']} stage {result['stage']} failed: {result['error']}")
 
-            # Get filename and add timestamp to avoid overwriting backups
-            base_name = os.path.basename(file_path)
-            timestamp = dt.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"bkp_{timestamp}_{base_name}"
+    def record_save(self, full_path, fields, checksum=None):
+        """
+        Add a save to the department history, the scene is hashed in the background and the list refreshed after
+        """
+        future = self.save_history.record_save(full_path, fields, checksum)
+        future.add_done_callback(lambda future: utils.executeDeferred(self.update_history))
+
+    def backup_previous(self, file_path, keep_original=False):
+        """
+        Backup the previous file if it exists before overwriting
 
-            # Move the existing file to the backup folder
-            backup_path = os.path.join(backup_folder, backup_name)
-            shutil.move(file_path, backup_path)
+        The file is renamed into the backup folder, or hard linked when keep_original
+        is set, and only copied when the backup folder is on another device. Old
+        backups are pruned, or folded into the compressed store, in the background.
+        """
+        if os.path.exists(file_path):
+            self.backup_manager.use_store = self.backup_store_chkbox.isChecked()
+            with self.perf.span("backup"):
+                backup_path, method = self.backup_manager.backup(file_path, keep_original)
+                self.save_history.record_backup(file_path, backup_path, self.backup_manager.use_store)
 
-            print(f"Previous file backed up: {backup_path}")
+            print(f"Previous file backed up ({method}): {backup_path}")
 
-    def close(self):
+    def closeEvent(self, event):
         """
-        Overriding the close method
+        Stop the background work of the window however it is closed, it is only hidden and open_scene_saver shows it again
         """
-        return super().close()
+        self.cancel_scan()
+        self.stop_watching()
+        self.perf.flush_session()
+        super().closeEvent(event)
 
 def open_scene_saver():
     """
-    Opens the scene saver window
+    Opens the scene saver window, reusing the hidden one with its scanned project when there is one
     """
     global scene_saver_window
 
-    if 'scene_saver_window' in globals() and scene_saver_window is not None:
-        try:
-            scene_saver_window.close()
-            scene_saver_window.deleteLater()
-        except:
-            pass
+    if globals().get("scene_saver_window") is not None and isValid(scene_saver_window):
+        scene_saver_window.reopen()
+        return
 
     scene_saver_window = SceneSaver()
     scene_saver_window.show()
@@ -520,14 +1401,14 @@ class CustomNameFormat(QMainWindow):
     """
     Custom Name Format Window
     """
-    def __init__(self, scene_saver_instance, parent=get_maya_main_window()):
-        super(CustomNameFormat, self).__init__(parent)
+    def __init__(self, scene_saver_instance, parent=None):
+        super(CustomNameFormat, self).__init__(parent or get_maya_main_window())
         
         self.scene_saver_instance = scene_saver_instance  # Store reference
         self.setWindowTitle("Add Custom Name Format")
         self.setMinimumWidth(500)
 
-        self.file_path = os.path.join(os.path.expanduser("~"), "file_name_formats.json")
+        self.name_format_config = scene_saver_instance.name_format_config if scene_saver_instance else NameFormatConfig()
 
         add_format_lbl = QLabel("Add Custom File Name Format:")
         self.add_format_le = QLineEdit()
@@ -550,41 +1431,35 @@ class CustomNameFormat(QMainWindow):
     
     def add_format_data(self):
         """
-        Add the custom format to the JSON file
+        Add the custom format to the user layer of the name format config
         """
         name_format = self.add_format_le.text().strip()
         if name_format:
-            data = self.load_existing_data()
-            if name_format not in data["formats"]:
-                data["formats"].append(name_format)
-                self.save_data(data)
-                cmds.inViewMessage(amg='Custom format saved successfully!', pos='topCenter', fade=True)
-
-                # Update the file name format combo box dynamically
-                if self.scene_saver_instance:
-                    self.scene_saver_instance.update_file_name_format_cb()
+            try:
+                compile_name_format(name_format)
+            except NameFormatError as e:
+                cmds.inViewMessage(amg=str(e), pos='topCenter', fade=True)
+                return
 
-                self.close()
-            else:
+            if name_format in self.name_format_config.formats():
                 cmds.inViewMessage(amg='Format already exists!', pos='topCenter', fade=True)
+                return
+
+            try:
+                self.name_format_config.add_user_format(name_format)
+            except OSError as e:
+                cmds.warning(f"Could not save the custom format: {e}")
+                return
+
+            cmds.inViewMessage(amg='Custom format saved successfully!', pos='topCenter', fade=True)
+
+            # Update the file name format combo box dynamically
+            if self.scene_saver_instance:
+                self.scene_saver_instance.update_file_name_format_cb()
+
+            self.close()
         else:
             cmds.inViewMessage(amg='Input is empty!', pos='topCenter', fade=True)
-    
-    def load_existing_data(self):
-        """
-        Load the existing data from the JSON file
-        """
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, 'r') as file:
-                    return json.load(file)
-            except json.JSONDecodeError:
-                return {"formats": []}
-        return {"formats": []}
-    
-    def save_data(self, data):
-        with open(self.file_path, 'w') as file:
-            json.dump(data, file, indent=4)
 
 def set_custom_name_format_window(self):
     """
@@ -0,0 +1,207 @@
+"""
+Headless Scene Saver for mayapy batch jobs
+
+Saves, versions and organizes scenes into the project structure without the
+Scene Saver window. Jobs are grouped by department folder and the groups are
+spread over a pool of mayapy processes, so versions inside one folder are still
+resolved one after the other.
+
+Usage:
+    mayapy scene_saver_batch.py --project <root> --jobs jobs.json [--workers 4]
+    mayapy scene_saver_batch.py --project <root> --scene a.ma --ep EP01 --sq SQ010 --sh SH0010 --dept Animation
+
+jobs.json is a list of objects with "scene", "ep", "sq", "sh" and optionally
+"dept", "tag", "version" and "ftype", which default to the command line values.
+With --dry-run the planned destinations are printed without Maya. Scenes saved
+with a published tag (PUB and FNL unless the project's publish.json says
+otherwise) are copied with their dependencies to the publish folder when
+--publish is given.
+"""
+import os
+import sys
+import json
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scene_saver_core import (SavePlanner, SavePlanError, BackupManager, NameFormatError, SaveHistory, SaveLedger,
+                              HookPipeline, SaveHookError, Publisher, PublishError, build_name_fields, compile_name_format,
+                              save_maya_scene, scene_dependencies)
+
+DEFAULT_NAME_FORMAT = "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}"
+
+# Set in every worker process by init_worker
+worker_planner = None
+worker_backup_manager = None
+worker_history = None
+worker_hooks = None
+worker_publisher = None
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Save scenes into the project structure without the Scene Saver window")
+    parser.add_argument("--project", required=True, help="Project root folder")
+    parser.add_argument("--jobs", help="JSON file listing the scenes to save")
+    parser.add_argument("--scene", help="Single scene to save, with --ep/--sq/--sh")
+    parser.add_argument("--ep", help="Episode of --scene")
+    parser.add_argument("--sq", help="Sequence of --scene")
+    parser.add_argument("--sh", help="Shot of --scene")
+    parser.add_argument("--dept", default="Animation", help="Department (default: Animation)")
+    parser.add_argument("--tag", default="WIP", help="Tag (default: WIP)")
+    parser.add_argument("--version", type=float, help="Fixed version, the next free version is used when omitted")
+    parser.add_argument("--ftype", default="ma", choices=["ma", "mb"], help="File type (default: ma)")
+    parser.add_argument("--format", default=DEFAULT_NAME_FORMAT, help=f"Name format (default: {DEFAULT_NAME_FORMAT})")
+    parser.add_argument("--artist", help="Artist name (default: the current user)")
+    parser.add_argument("--on-exists", default="version", choices=["version", "backup", "skip"],
+                        help="When the file exists: save as the next free version, back it up and overwrite, or skip")
+    parser.add_argument("--compressed-backups", action="store_true", help="Back up into the compressed per-shot store")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="mayapy processes")
+    parser.add_argument("--publish", action="store_true", help="Copy published tags and their dependencies to the publish folder")
+    parser.add_argument("--dry-run", action="store_true", help="Only print where each scene would be saved")
+    return parser.parse_args(argv)
+
+def load_jobs(args):
+    """
+    Jobs from --jobs or the single --scene, with defaults filled in from the command line
+    """
+    if args.jobs:
+        with open(args.jobs, "r") as file:
+            jobs = json.load(file)
+    elif args.scene:
+        jobs = [{"scene": args.scene, "ep": args.ep, "sq": args.sq, "sh": args.sh}]
+    else:
+        raise SystemExit("Either --jobs or --scene is required")
+
+    defaults = {"dept": args.dept, "tag": args.tag, "version": args.version, "ftype": args.ftype}
+    return [dict(defaults, **job) for job in jobs]
+
+def job_fields(job, project_name, artist):
+    return build_name_fields(project_name, job["ep"], job["sq"], job["sh"], job["dept"], job["tag"],
+                             job["version"] or 0.0, job["ftype"], artist)
+
+def plan_job(planner, job, options):
+    """
+    Plan a job, bumping the version past existing files when asked to
+    """
+    fields = job_fields(job, options["project_name"], options["artist"])
+    auto_version = job["version"] is None
+    plan = planner.plan(fields, options["name_format"], auto_version=auto_version, refresh=True)
+
+    if plan.exists() and options["on_exists"] == "version" and not auto_version:
+        plan = planner.plan(fields, options["name_format"], auto_version=True, refresh=True)
+
+    return plan
+
+def init_worker(project_dict, use_store, project_root):
+    """
+    Start Maya once per worker process
+    """
+    global worker_planner, worker_backup_manager, worker_history, worker_hooks, worker_publisher
+
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+
+    worker_planner = SavePlanner(project_dict)
+    worker_backup_manager = BackupManager.from_environment(use_store)
+    worker_history = SaveHistory(SaveLedger(project_root))
+    worker_hooks = HookPipeline.for_project(project_root)
+    worker_publisher = Publisher.for_project(project_root)
+
+def run_group(jobs, options):
+    """
+    Save the jobs of one department folder in order, returns (scene, destination or None, message) per job
+    """
+    import maya.cmds as cmds
+
+    results = []
+    for job in jobs:
+        try:
+            plan = plan_job(worker_planner, job, options)
+
+            if plan.exists() and options["on_exists"] == "skip":
+                results.append((job["scene"], None, f"skipped, {plan.full_path} exists"))
+                continue
+
+            cmds.file(job["scene"], open=True, force=True)
+            parsed = compile_name_format(options["name_format"]).parse(plan.file_name) or {}
+            fields = dict(job_fields(job, options["project_name"], options["artist"]), **parsed)
+            hook_context = worker_hooks.context(plan.full_path, fields, plan.file_type)
+            hook_results = worker_hooks.run_pre(hook_context)
+            publish = options["publish"] and worker_publisher.publishes(fields.get("tag"))
+            dependencies = scene_dependencies() if publish else None
+
+            if plan.exists():
+                backup_path, _ = worker_backup_manager.backup(plan.full_path, wait=True)
+                worker_history.record_backup(plan.full_path, backup_path, worker_backup_manager.use_store, wait=True)
+
+            os.makedirs(plan.dept_folder, exist_ok=True)
+            save_maya_scene(plan.full_path, plan.file_type)
+            worker_planner.version_index.invalidate(plan.dept_folder)
+            worker_history.record_save(plan.full_path, fields, wait=True)
+            hook_results += worker_hooks.run_post(hook_context, wait=True) or []
+
+            messages = ["saved"]
+            failed_stages = [result for result in hook_results if result["error"] is not None]
+            if failed_stages:
+                messages.append(HookPipeline.describe(failed_stages))
+            if publish:
+                try:
+                    manifest = worker_publisher.publish(plan.full_path, fields, dependencies, wait=True)
+                    messages.append(f"published {Publisher.describe(manifest)}")
+                except PublishError as e:
+                    messages.append(f"not published: {e}")
+            results.append((job["scene"], plan.full_path, ", ".join(messages)))
+        except SaveHookError as e:
+            results.append((job["scene"], None, f"not saved: {e}"))
+        except Exception as e:
+            results.append((job["scene"], None, f"failed: {e}"))
+
+    return results
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    jobs = load_jobs(args)
+    planner = SavePlanner.for_project(args.project)
+
+    options = {
+        "project_name": os.path.basename(os.path.normpath(args.project)),
+        "artist": args.artist,
+        "name_format": args.format,
+        "on_exists": args.on_exists,
+        "publish": args.publish,
+    }
+
+    # Group the jobs by department folder so versions in one folder are resolved in order
+    groups = OrderedDict()
+    failed = 0
+    for job in jobs:
+        try:
+            dept_folder = planner.dept_folder(job_fields(job, options["project_name"], options["artist"]))
+            if not dept_folder:
+                raise SavePlanError(f"Shot {job['ep']}/{job['sq']}/{job['sh']} is not part of the project")
+            if args.dry_run:
+                print(f"{job['scene']} -> {plan_job(planner, job, options).full_path}")
+                continue
+        except (KeyError, SavePlanError, NameFormatError) as e:
+            print(f"{job.get('scene')}: {e}")
+            failed += 1
+            continue
+
+        groups.setdefault(dept_folder, []).append(job)
+
+    if args.dry_run or not groups:
+        return 1 if failed else 0
+
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(groups)), initializer=init_worker,
+                             initargs=(planner.project_dict, args.compressed_backups, args.project)) as executor:
+        futures = [executor.submit(run_group, group, options) for group in groups.values()]
+
+        for future in as_completed(futures):
+            for scene, destination, message in future.result():
+                print(f"{scene} -> {destination}: {message}" if destination else f"{scene}: {message}")
+                failed += destination is None and not message.startswith("skipped")
+
+    print(f"{len(jobs) - failed} of {len(jobs)} scenes done")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3723 @@
+"""
+Scene Saver core: everything that doesn't need Qt or a Maya session
+
+Project crawling and indexing, name templates, version discovery, save planning,
+transfers and backups live here so they can run in mayapy batch jobs and plain
+Python. scene_saver.py is the window built on top of it and scene_saver_batch.py
+the command line entry point.
+"""
+import os
+import bisect
+import contextlib
+import cProfile
+import errno
+import fnmatch
+import functools
+import glob
+import hashlib
+import heapq
+import importlib
+import json
+import re
+import shutil
+import socket
+import socketserver
+import sqlite3
+import string
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def join_rel(rel_path, name):
+    """
+    Join a folder name onto a path relative to the project root ("" is the root itself)
+    """
+    return os.path.join(rel_path, name) if rel_path else name
+
+def list_subfolders(folder_path):
+    """
+    List the sub folders of a folder with a single os.scandir call
+
+    DirEntry.is_dir() answers from the directory listing itself, so no extra stat
+    is issued per entry (symlinks are the only entries that still get followed).
+    """
+    sub_folders = []
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        sub_folders.append(entry.name)
+                except OSError:
+                    pass
+    except OSError:
+        pass  # Unreadable or vanished folders are treated as empty
+
+    sub_folders.sort()
+    return sub_folders
+
+# A folder modified this close to its listing may change again within the same
+# mtime tick, so it is never trusted and always listed again
+RACY_MTIME_SECONDS = 2
+
+def folder_mtime(folder_path):
+    """
+    mtime of a folder in ns, None when it can't be read or is too recent to be trusted
+    """
+    try:
+        mtime = os.stat(folder_path).st_mtime_ns
+    except OSError:
+        return None
+
+    if time.time_ns() - mtime < RACY_MTIME_SECONDS * 10 ** 9:
+        return None
+
+    return mtime
+
+def index_cache_folder():
+    """
+    Folder holding the persisted project indexes, SCENE_SAVER_CACHE_DIR overrides the default
+    """
+    return os.environ.get("SCENE_SAVER_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".scene_saver", "index")
+
+def index_cache_path(root_path):
+    """
+    Path of the persisted index for a project root, one compact JSON file per root
+    """
+    key = hashlib.sha1(os.path.normcase(os.path.normpath(root_path)).encode("utf-8")).hexdigest()
+    return os.path.join(index_cache_folder(), key + ".json")
+
+def write_json_atomic(file_path, data, **dump_kwargs):
+    """
+    Write JSON to a temp file next to the target and rename it into place
+    """
+    folder = os.path.dirname(file_path)
+    os.makedirs(folder, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, **dump_kwargs)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def user_settings_path():
+    """
+    Per user settings of the Scene Saver window, such as the last browsed project
+    """
+    return os.path.join(os.path.expanduser("~"), ".scene_saver", "settings.json")
+
+def load_user_settings():
+    """
+    The user settings as a dict, empty when the file is missing or unreadable
+    """
+    try:
+        with open(user_settings_path(), "r") as file:
+            settings = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return settings if isinstance(settings, dict) else {}
+
+def save_user_setting(key, value):
+    """
+    Store one user setting, the file is only rewritten when the value changed
+    """
+    settings = load_user_settings()
+    if settings.get(key) != value:
+        settings[key] = value
+        write_json_atomic(user_settings_path(), settings, indent=4)
+
+# Default start of episode, sequence and shot folder names: a prefix followed by a number, "EP001", "Sequence_01", "sh010"
+DEFAULT_HIERARCHY_PATTERNS = {
+    "episode": r"ep(isode)?[ _-]?\d",
+    "sequence": r"(sq|seq|sequence)[ _-]?\d",
+    "shot": r"(sh|shot)[ _-]?\d",
+}
+DEFAULT_IGNORED_FOLDERS = (".*", "backup", "cache", "renders", "publish")  # Never listed, hidden folders include the Scene Saver ones
+
+def hierarchy_rules_path(root_path):
+    """
+    Hierarchy rules of a project, next to its name formats
+    """
+    return os.path.join(root_path, ".scene_saver", "hierarchy.json")
+
+class HierarchyRulesError(ValueError):
+    """
+    Raised when hierarchy rules are invalid
+    """
+
+class HierarchyRules(object):
+    """
+    How the folders of a project map to episodes, sequences and shots, and which of them a crawl lists
+
+    Episodes are sub folders of the root, or of a grouping folder directly under
+    it, sequences are sub folders of an episode and shots sub folders of a
+    sequence, each recognised by a case insensitive regex matched at the start of
+    the name. Nothing else can hold shots, so the crawl doesn't list it: below a
+    shot only department_depth levels are kept (1 shows the department folders
+    without listing them, None keeps everything), folders matching an ignore glob
+    are never listed and neither is any folder deeper than max_depth.
+
+    The level of a folder is "root", "group", "episode", "sequence", "shot", or
+    the number of levels it sits below its shot.
+    """
+    def __init__(self, episode=DEFAULT_HIERARCHY_PATTERNS["episode"], sequence=DEFAULT_HIERARCHY_PATTERNS["sequence"],
+                 shot=DEFAULT_HIERARCHY_PATTERNS["shot"], ignore=DEFAULT_IGNORED_FOLDERS, department_depth=1, max_depth=None):
+        try:
+            self.patterns = {level: re.compile(pattern, re.IGNORECASE)
+                             for level, pattern in (("episode", episode), ("sequence", sequence), ("shot", shot))}
+            self.ignore = tuple(ignore)
+            self.ignore_regex = re.compile("|".join(fnmatch.translate(glob) for glob in self.ignore), re.IGNORECASE) if self.ignore else None
+        except (re.error, TypeError) as e:
+            raise HierarchyRulesError(f"Invalid hierarchy rules: {e}")
+
+        for name, value in (("department_depth", department_depth), ("max_depth", max_depth)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                raise HierarchyRulesError(f"{name} must be a whole number of at least 1 or null, not {value!r}")
+
+        self.department_depth = department_depth
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rules from the {"episode": ..., "ignore": [...], "department_depth": ...} data of a rules file
+        """
+        if not isinstance(data, dict):
+            raise HierarchyRulesError("Hierarchy rules must be a JSON object")
+
+        unknown = set(data) - {"episode", "sequence", "shot", "ignore", "department_depth", "max_depth"}
+        if unknown:
+            raise HierarchyRulesError(f"Unknown hierarchy rules: {', '.join(sorted(unknown))}")
+        if isinstance(data.get("ignore"), str):
+            raise HierarchyRulesError("ignore must be a list of folder name globs")
+
+        return cls(**data)
+
+    @classmethod
+    def for_project(cls, root_path):
+        """
+        Rules of a project root, the defaults when it has no rules file or an invalid one
+        """
+        file_path = hierarchy_rules_path(root_path)
+        try:
+            with open(file_path, "r") as file:
+                return cls.from_dict(json.load(file))
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"Ignoring the hierarchy rules in {file_path}: {e}")
+            return cls()
+
+    def is_ignored(self, name):
+        return self.ignore_regex is not None and self.ignore_regex.match(name) is not None
+
+    def matches(self, level, name):
+        """
+        Whether a folder name is an "episode", "sequence" or "shot" name
+        """
+        return self.patterns[level].match(name) is not None and not self.is_ignored(name)
+
+    def child_level(self, level, name, depth):
+        """
+        Level of a sub folder of a folder at level, None when the crawl doesn't list it
+
+        depth is the depth of the sub folder below the project root.
+        """
+        if self.max_depth is not None and depth > self.max_depth or self.is_ignored(name):
+            return None
+
+        if level == "root" or level == "group":
+            if self.patterns["episode"].match(name):
+                return "episode"
+            return "group" if level == "root" else None
+        if level == "episode":
+            return "sequence" if self.patterns["sequence"].match(name) else None
+        if level == "sequence":
+            return "shot" if self.patterns["shot"].match(name) else None
+
+        below_shot = 1 if level == "shot" else level + 1
+        return below_shot if self.department_depth is None or below_shot < self.department_depth else None
+
+    def level(self, rel_path):
+        """
+        Level of a folder from its path relative to the root, None when the crawl doesn't list it
+        """
+        level = "root"
+        if rel_path:
+            for depth, name in enumerate(rel_path.split(os.sep), 1):
+                level = self.child_level(level, name, depth)
+                if level is None:
+                    return None
+        return level
+
+    def listed_count(self, level, sub_folders, depth):
+        """
+        Number of sub folders of a folder at level, itself at depth, that the crawl lists
+        """
+        return sum(1 for name in sub_folders if self.child_level(level, name, depth + 1) is not None)
+
+NO_MTIME = -1  # Stored mtime of a folder that must be listed again on the next crawl
+
+class ProjectIndex(object):
+    """
+    In-memory index of the folders under a project root
+
+    The project is crawled once and both the folder structure preview and the
+    episode/sequence/shot dictionary are derived from this index. Each folder's
+    mtime is kept next to its children so a later crawl only re-lists the folders
+    that changed, see load() and save() for the on-disk copy. The project's
+    HierarchyRules decide which folders get listed at all.
+
+    Folders are nodes of a compact store rather than entries keyed by their path:
+    parallel arrays hold the name, parent, row and mtime of every node, each
+    distinct folder name is stored once in a shared table and the children of a
+    listed folder are a sorted tuple of nodes. Relative paths are rebuilt from the
+    parent links when asked for, so a folder costs a few dozen bytes however deep
+    it is. Node 0 is the project root.
+    """
+    CACHE_FORMAT = 1
+    ROOT = 0
+    PROJECT_DICT_DEPTH = 3  # Deepest level below the root whose listing affects the project dict
+
+    def __init__(self, root_path, rules=None):
+        self.root_path = os.path.normpath(root_path)
+        self.project_name = os.path.basename(self.root_path)
+        self.rules = rules if rules is not None else HierarchyRules.for_project(self.root_path)
+        self.listed_count = 0  # Folders actually listed by the last crawl, the rest came from the cache
+        self.reset()
+
+    def reset(self):
+        """
+        Forget every folder, leaving only the root, not listed yet
+        """
+        self.names = []  # Name table, every distinct folder name once
+        self.name_ids = {}  # Folder name -> position in the name table
+        self.node_names = array("i", [-1])  # Node -> name id, the root has none
+        self.node_parents = array("i", [-1])  # Node -> parent node, -1 for the root and free nodes
+        self.node_rows = array("i", [0])  # Node -> position among its parent's children
+        self.node_mtimes = array("q", [NO_MTIME])  # Node -> mtime in ns when it was listed
+        self.node_children = [None]  # Node -> sorted tuple of child nodes, None until the folder is listed
+        self.free_nodes = []  # Nodes of forgotten folders, reused before the arrays grow
+        self.frontier = {}  # Relative path -> [node, level, children left] of folders whose children a crawl has yet to merge
+        self.listed_folders = 0
+
+    @classmethod
+    def load(cls, root_path, rules=None):
+        """
+        Load the persisted index of a project root, returns an empty index when there is no valid cache
+        """
+        index = cls(root_path, rules)
+
+        try:
+            with open(index_cache_path(root_path), "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return index
+
+        # Drop caches written by another format version or for another root (hash collision)
+        if data.get("format") != cls.CACHE_FORMAT or data.get("root") != index.root_path:
+            return index
+
+        folders = data.get("folders", {})
+        pending = [("", cls.ROOT)]
+        while pending:
+            rel_path, node = pending.pop()
+            if rel_path not in folders:
+                continue
+
+            mtime, sub_folders = folders[rel_path]
+            children = index.set_children(node, sub_folders, mtime)
+            pending.extend((join_rel(rel_path, name), child) for name, child in zip(sub_folders, children))
+
+        return index
+
+    def save(self):
+        """
+        Persist the index so the next crawl of this root can skip unchanged folders
+        """
+        data = {
+            "format": self.CACHE_FORMAT,
+            "root": self.root_path,
+            "folders": {rel_path: [self.mtime(node), self.node_subfolders(node)] for rel_path, node in self.iter_nodes()},
+        }
+        write_json_atomic(index_cache_path(self.root_path), data, separators=(",", ":"))
+
+    def clear_cache(self):
+        """
+        Delete the persisted index, forcing the next crawl to list every folder
+        """
+        try:
+            os.remove(index_cache_path(self.root_path))
+        except OSError:
+            pass
+
+    def scan(self, previous=None):
+        """
+        Crawl the whole project in one pass, reusing unchanged folders from a previous index
+        """
+        self.reset()
+        for batch in self.iter_scan(previous=previous):
+            self.merge(batch)
+
+        return self
+
+    def merge(self, batch):
+        """
+        Merge a {rel_path: (mtime, sub_folders)} batch from iter_scan into the index
+        """
+        for rel_path, node, mtime, sub_folders in self.batch_nodes(batch):
+            self.set_children(node, sub_folders, mtime)
+
+    def batch_nodes(self, batch):
+        """
+        Yield (rel_path, node, mtime, sub_folders) for the folders of a batch that are in the index
+
+        The caller stores each listing before asking for the next folder. A crawl
+        being breadth first, the children of a folder arrive in later batches, so
+        the folder's node and level are kept by path until the last child the
+        rules let the crawl list is merged, and each child is found with one search
+        among its siblings instead of a walk from the root. Only a folder whose
+        subtree was forgotten meanwhile is missing.
+        """
+        for rel_path, (mtime, sub_folders) in batch.items():
+            parent_path, name = os.path.split(rel_path)
+            parent = self.frontier.get(parent_path) if rel_path else None
+            node = self.find_child(parent[0], name) if parent is not None else None
+
+            if node is None:
+                node = self.node(rel_path)
+                if node is None:
+                    continue
+                level = self.rules.level(rel_path)
+            else:
+                level = self.rules.child_level(parent[1], name, rel_path.count(os.sep) + 1)
+                parent[2] -= 1
+                if not parent[2]:
+                    del self.frontier[parent_path]  # Last child of the parent
+
+            yield rel_path, node, mtime, sub_folders
+
+            if level is not None and sub_folders:
+                depth = rel_path.count(os.sep) + 1 if rel_path else 0
+                listed = self.rules.listed_count(level, sub_folders, depth)
+                if listed:
+                    self.frontier[rel_path] = [node, level, listed]
+
+    def iter_scan(self, cancel_event=None, batch_size=500, batch_interval=0.25, previous=None, start=""):
+        """
+        Crawl the project breadth first and yield {rel_path: (mtime, sub_folders)} batches as they are listed
+
+        Breadth first means episodes, sequences and shots come out before the deep
+        department folders. A batch is yielded every batch_size folders or every
+        batch_interval seconds, whichever comes first, and the crawl stops early
+        once cancel_event is set. start limits the crawl to the subtree of that folder.
+        Sub folders the hierarchy rules prune are reported in their parent's listing
+        but never listed themselves.
+
+        With a previous index, a folder whose mtime has not changed costs a single
+        stat and its cached children are reused instead of listing it again.
+        Folders that disappeared are simply never reached, so they drop out.
+        """
+        self.listed_count = 0
+        start_level = self.rules.level(start)
+        if start_level is None:
+            return
+
+        # Each pending folder carries its node in the previous index, if it had one, its level and its depth
+        pending = deque([(start, previous.node(start) if previous is not None else None, start_level,
+                          start.count(os.sep) + 1 if start else 0)])
+        batch = {}
+        last_yield = time.monotonic()
+
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+
+            rel_path, previous_node, level, depth = pending.popleft()
+            folder_path = self.full_path(rel_path)
+
+            mtime = folder_mtime(folder_path)
+            previous_listed = previous_node is not None and previous.is_listed(previous_node)
+
+            if mtime is not None and previous_listed and previous.mtime(previous_node) == mtime:
+                sub_folders = previous.node_subfolders(previous_node)
+                previous_children = previous.node_children[previous_node]
+            else:
+                sub_folders = list_subfolders(folder_path)
+                previous_children = [previous.find_child(previous_node, name) if previous_listed else None
+                                     for name in sub_folders]
+                self.listed_count += 1
+
+            batch[rel_path] = (mtime, sub_folders)
+            for name, child in zip(sub_folders, previous_children):
+                child_level = self.rules.child_level(level, name, depth + 1)
+                if child_level is not None:
+                    pending.append((join_rel(rel_path, name), child, child_level, depth + 1))
+
+            if len(batch) >= batch_size or time.monotonic() - last_yield >= batch_interval:
+                yield batch
+                batch = {}
+                last_yield = time.monotonic()
+
+        if batch:
+            yield batch
+
+    def refresh_folder(self, rel_path, observer=None):
+        """
+        Re-list a single folder after a change notification and return its (added, removed) sub folders
+
+        Only the sub folders that are new get crawled, the subtrees of removed ones
+        are dropped from the index. An observer, such as the preview's item model,
+        gets begin_remove(node, row)/end_remove() and begin_insert(node, row)/end_insert()
+        around every removed and added sub folder.
+        """
+        node = self.node(rel_path)
+        if node is None or not self.is_listed(node):
+            return [], []
+
+        folder_path = self.full_path(rel_path)
+        sub_folders = list_subfolders(folder_path)
+        previous_sub_folders = self.node_subfolders(node)
+
+        current = set(sub_folders)
+        previous = set(previous_sub_folders)
+        added = [name for name in sub_folders if name not in previous]
+        removed = [name for name in previous_sub_folders if name not in current]
+
+        for name in reversed(removed):
+            row = self.node_rows[self.find_child(node, name)]
+            if observer is not None:
+                observer.begin_remove(node, row)
+            self.remove_child(node, row)
+            if observer is not None:
+                observer.end_remove()
+
+        for name in added:
+            row = sub_folders.index(name)
+            if observer is not None:
+                observer.begin_insert(node, row)
+            self.insert_child(node, row, name)
+            if observer is not None:
+                observer.end_insert()
+
+            for batch in self.iter_scan(start=join_rel(rel_path, name)):
+                self.merge(batch)
+
+        mtime = folder_mtime(folder_path)
+        self.node_mtimes[node] = NO_MTIME if mtime is None else mtime
+
+        return added, removed
+
+    def forget(self, rel_path):
+        """
+        Drop a folder and everything below it from the index
+        """
+        node = self.node(rel_path)
+        if node == self.ROOT:
+            self.reset()
+        elif node is not None:
+            self.remove_child(self.node_parents[node], self.node_rows[node])
+
+    def new_node(self, parent, name, row):
+        """
+        Add a node for a folder that isn't listed yet
+        """
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+
+        if self.free_nodes:
+            node = self.free_nodes.pop()
+            self.node_names[node] = name_id
+            self.node_parents[node] = parent
+            self.node_rows[node] = row
+            self.node_mtimes[node] = NO_MTIME
+            self.node_children[node] = None
+        else:
+            node = len(self.node_children)
+            self.node_names.append(name_id)
+            self.node_parents.append(parent)
+            self.node_rows.append(row)
+            self.node_mtimes.append(NO_MTIME)
+            self.node_children.append(None)
+
+        return node
+
+    def set_children(self, node, sub_folders, mtime=None):
+        """
+        Store the listing of a folder, keeping the nodes of sub folders it already had, returns the child nodes
+        """
+        previous = self.node_children[node]
+        existing = {} if previous is None else {self.names[self.node_names[child]]: child for child in previous}
+
+        children = []
+        for row, name in enumerate(sub_folders):
+            child = existing.pop(name, None)
+            if child is None:
+                child = self.new_node(node, name, row)
+            else:
+                self.node_rows[child] = row
+            children.append(child)
+
+        for child in existing.values():
+            self.free_subtree(child)
+
+        if previous is None:
+            self.listed_folders += 1
+
+        self.node_children[node] = children = tuple(children)
+        self.node_mtimes[node] = NO_MTIME if mtime is None else mtime
+        return children
+
+    def insert_child(self, node, row, name):
+        """
+        Add a sub folder, not listed yet, at row of a listed folder
+        """
+        children = self.node_children[node]
+        child = self.new_node(node, name, row)
+        self.node_children[node] = children[:row] + (child,) + children[row:]
+
+        for next_row in range(row + 1, len(children) + 1):
+            self.node_rows[self.node_children[node][next_row]] = next_row
+
+    def remove_child(self, node, row):
+        """
+        Drop the sub folder at row of a listed folder together with its subtree
+        """
+        children = self.node_children[node]
+        self.free_subtree(children[row])
+        self.node_children[node] = children = children[:row] + children[row + 1:]
+
+        for next_row in range(row, len(children)):
+            self.node_rows[children[next_row]] = next_row
+
+    def free_subtree(self, node):
+        """
+        Release a node and every node below it for reuse
+        """
+        self.frontier.clear()  # May point at released nodes, batch_nodes falls back to walking the tree
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            children = self.node_children[node]
+            if children is not None:
+                self.listed_folders -= 1
+                pending.extend(children)
+
+            self.node_children[node] = None
+            self.node_parents[node] = -1
+            self.free_nodes.append(node)
+
+    def subtree_nodes(self, node):
+        """
+        A node and every node below it
+        """
+        nodes = []
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            nodes.append(node)
+            pending.extend(self.node_children[node] or ())
+        return nodes
+
+    def node(self, rel_path):
+        """
+        Node of a folder from its path relative to the root, None when it isn't in the index
+        """
+        node = self.ROOT
+        if rel_path:
+            for name in rel_path.split(os.sep):
+                node = self.find_child(node, name)
+                if node is None:
+                    return None
+        return node
+
+    def find_child(self, node, name):
+        """
+        Child node of a folder by name, a binary search of its sorted children
+        """
+        children = self.node_children[node]
+        if not children:
+            return None
+
+        low, high = 0, len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if self.names[self.node_names[children[middle]]] < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(children) and self.names[self.node_names[children[low]]] == name:
+            return children[low]
+        return None
+
+    def path(self, node):
+        """
+        Path of a node relative to the root, rebuilt from its parents
+        """
+        names = []
+        while node > self.ROOT:
+            names.append(self.names[self.node_names[node]])
+            node = self.node_parents[node]
+        return os.sep.join(reversed(names))
+
+    def name(self, node):
+        return self.names[self.node_names[node]] if node != self.ROOT else self.project_name
+
+    def parent(self, node):
+        return self.node_parents[node]
+
+    def row(self, node):
+        return self.node_rows[node]
+
+    def child(self, node, row):
+        children = self.node_children[node]
+        return children[row] if children and 0 <= row < len(children) else None
+
+    def child_count(self, node):
+        children = self.node_children[node]
+        return len(children) if children else 0
+
+    def is_listed(self, node):
+        return self.node_children[node] is not None
+
+    def is_pruned(self, node):
+        """
+        Whether the hierarchy rules keep the crawl from listing this folder
+        """
+        return node != self.ROOT and self.rules.level(self.path(node)) is None
+
+    def mtime(self, node):
+        mtime = self.node_mtimes[node]
+        return None if mtime == NO_MTIME else mtime
+
+    def node_subfolders(self, node):
+        """
+        Sub folder names of a node
+        """
+        return [self.names[self.node_names[child]] for child in self.node_children[node] or ()]
+
+    def iter_nodes(self, max_depth=None):
+        """
+        Yield (rel_path, node) of the listed folders breadth first, down to max_depth levels below the root
+        """
+        pending = deque([("", self.ROOT, 0)])
+        while pending:
+            rel_path, node, depth = pending.popleft()
+            children = self.node_children[node]
+            if children is None:
+                continue
+
+            yield rel_path, node
+            if max_depth is None or depth < max_depth:
+                pending.extend((join_rel(rel_path, self.names[self.node_names[child]]), child, depth + 1)
+                               for child in children)
+
+    def iter_folders(self, max_depth=None):
+        """
+        Yield the relative paths of the listed folders breadth first, down to max_depth levels below the root
+        """
+        for rel_path, _ in self.iter_nodes(max_depth):
+            yield rel_path
+
+    def project_dict_folders(self):
+        """
+        Relative paths of the root, grouping, episode and sequence folders, whose listings hold the project dict
+        """
+        return [rel_path for rel_path in self.iter_folders(self.PROJECT_DICT_DEPTH)
+                if self.rules.level(rel_path) in ("root", "group", "episode", "sequence")]
+
+    def rel_path(self, folder_path):
+        """
+        Path of a folder relative to the project root, None when it is outside the project
+        """
+        try:
+            rel_path = os.path.relpath(os.path.normpath(folder_path), self.root_path)
+        except ValueError:
+            return None  # Different drive on Windows
+
+        if rel_path == os.curdir:
+            return ""
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        return rel_path
+
+    def is_scanned(self, rel_path):
+        """
+        Whether the folder has been listed yet
+        """
+        node = self.node(rel_path)
+        return node is not None and self.is_listed(node)
+
+    def stale_folders(self, rel_paths=None):
+        """
+        Listed folders whose mtime moved since they were listed, at the cost of one stat each
+        """
+        stale = []
+        for rel_path in (self.iter_folders() if rel_paths is None else rel_paths):
+            node = self.node(rel_path)
+            if node is None:
+                continue
+
+            mtime = self.mtime(node)
+            if mtime is None or folder_mtime(self.full_path(rel_path)) != mtime:
+                stale.append(rel_path)
+
+        return stale
+
+    @staticmethod
+    def affects_project_dict(rel_path):
+        """
+        Whether the listing of this folder can change the project dict
+
+        Only the root, optional grouping folders, episodes and sequences (depth 0 to
+        PROJECT_DICT_DEPTH) are looked at when building the dictionary, shot contents never are.
+        """
+        return not rel_path or rel_path.count(os.sep) < ProjectIndex.PROJECT_DICT_DEPTH
+
+    def full_path(self, rel_path):
+        """
+        Absolute path of an indexed folder
+        """
+        return os.path.join(self.root_path, rel_path) if rel_path else self.root_path
+
+    def subfolders(self, rel_path=""):
+        """
+        Sub folder names of an indexed folder
+        """
+        node = self.node(rel_path)
+        return self.node_subfolders(node) if node is not None else []
+
+    def folder_count(self):
+        return self.listed_folders
+
+    def to_project_dict(self):
+        """
+        Build the {project: {episode: {sequence: {shot: shot_path}}}} dictionary from the index
+        """
+        episodes = {}
+
+        for name in self.subfolders():
+            if self.rules.matches("episode", name):
+                self._add_episode(episodes, name)
+            elif not self.rules.is_ignored(name):
+                # If it's not an episode, check if it contains episodes inside
+                for sub_name in self.subfolders(name):
+                    if self.rules.matches("episode", sub_name):
+                        self._add_episode(episodes, join_rel(name, sub_name))
+
+        return {self.project_name: episodes}
+
+    def _add_episode(self, episodes, ep_rel_path):
+        """
+        Add an episode with its sequences and shots, keeping episodes that have no sequences
+        """
+        sequences = episodes.setdefault(os.path.basename(ep_rel_path), {})
+
+        for sq_name in self.subfolders(ep_rel_path):
+            if not self.rules.matches("sequence", sq_name):
+                continue
+
+            sq_rel_path = join_rel(ep_rel_path, sq_name)
+            shots = sequences.setdefault(sq_name, {})
+
+            for sh_name in self.subfolders(sq_rel_path):
+                if self.rules.matches("shot", sh_name):
+                    shots[sh_name] = self.full_path(join_rel(sq_rel_path, sh_name))
+
+INDEX_SERVICE_CONNECT_TIMEOUT = 0.5  # Seconds before an unreachable index service is given up and the project crawled directly
+INDEX_SERVICE_REPLY_TIMEOUT = 300  # Seconds a client waits for a served index, the service's first crawl of a big project included
+INDEX_SERVICE_INTERVAL = 30  # Seconds between the service's crawls of the projects it serves
+INDEX_SERVICE_MAX_REQUEST = 64 * 1024
+INDEX_SERVICE_BACKLOG = 128  # Connections waiting to be accepted, every window of a studio opens at about the same time
+
+def index_service_address():
+    """
+    Address of the project index service set in SCENE_SAVER_INDEX_SERVICE, None when there is none
+    """
+    return os.environ.get("SCENE_SAVER_INDEX_SERVICE") or None
+
+def parse_service_address(address):
+    """
+    (socket family, address) of "unix:/path/to/socket" or "[host]:port", raises ValueError when it is neither
+    """
+    if address.startswith("unix:"):
+        if getattr(socket, "AF_UNIX", None) is None:
+            raise ValueError("Unix sockets aren't available on this platform, use host:port")
+        return socket.AF_UNIX, address[len("unix:"):]
+
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Invalid index service address {address!r}, expected unix:<path> or <host>:<port>")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+def fetch_served_index(address, root_path, rescan=False, connect_timeout=INDEX_SERVICE_CONNECT_TIMEOUT,
+                       reply_timeout=INDEX_SERVICE_REPLY_TIMEOUT):
+    """
+    Reply of the index service for a project root, the listed folders under "folders" breadth first
+
+    The folders map relative paths to [mtime, sub_folders], like a batch of
+    ProjectIndex.iter_scan. rescan asks the service to crawl the project again
+    from scratch first. Raises OSError when the service can't be reached and
+    ValueError when it doesn't serve this root.
+    """
+    family, target = parse_service_address(address)
+    request = {"op": "index", "root": os.path.normpath(root_path), "rescan": bool(rescan)}
+
+    with contextlib.closing(socket.socket(family, socket.SOCK_STREAM)) as connection:
+        connection.settimeout(connect_timeout)
+        connection.connect(target)
+        connection.settimeout(reply_timeout)
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as reply_file:
+            reply = json.loads(reply_file.readline() or b"{}")
+
+    if not reply.get("ok"):
+        raise ValueError(reply.get("error") or "the index service sent no index")
+    return reply
+
+class IndexServiceHandler(socketserver.StreamRequestHandler):
+    """
+    One JSON request line in, one JSON reply line out
+    """
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline(INDEX_SERVICE_MAX_REQUEST))
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            reply = self.server.service.reply(request)
+        except ValueError as e:
+            reply = (json.dumps({"ok": False, "error": f"Invalid request: {e}"}) + "\n").encode("utf-8")
+        except Exception as e:  # A crawl failing on the share still gets the client a reply to fall back on
+            reply = (json.dumps({"ok": False, "error": f"Could not index the project: {e}"}) + "\n").encode("utf-8")
+        self.wfile.write(reply)
+
+class ProjectIndexService(object):
+    """
+    Crawls a few project roots and serves their index to the Scene Saver windows over a socket
+
+    Instead of every artist's Maya crawling the same share, one process keeps the
+    ProjectIndex of each root it serves and re-crawls it every interval seconds,
+    which costs one stat per unchanged folder. Windows get the folders of the
+    last crawl in a single reply and only fall back to crawling when the service
+    can't be reached or doesn't serve their root.
+
+    A reply is serialized once per crawl and shared by every client asking for it.
+    The hierarchy rules are read again on each crawl.
+    """
+    def __init__(self, roots, interval=INDEX_SERVICE_INTERVAL):
+        self.roots = [os.path.normpath(root) for root in roots]
+        self.interval = interval
+        self.locks = {root: threading.Lock() for root in self.roots}  # One crawl of a root at a time
+        self.indexes = {}  # Root -> ProjectIndex of the last crawl
+        self.replies = {}  # Root -> (generation, folders, reply bytes)
+        self.stop_event = threading.Event()
+
+    def refresh(self, root, rescan=False):
+        """
+        Crawl a root again, only re-listing folders whose mtime changed unless rescan, and rebuild its reply
+        """
+        with self.locks[root]:
+            self._refresh(root, rescan)
+
+    def _refresh(self, root, rescan=False):
+        index = ProjectIndex(root)
+        previous = None if rescan else self.indexes.get(root) or ProjectIndex.load(root, index.rules)
+        start = time.perf_counter()
+        index.scan(previous=previous)
+        seconds = time.perf_counter() - start
+
+        folders = {rel_path: [index.mtime(node), index.node_subfolders(node)] for rel_path, node in index.iter_nodes()}
+        generation, previous_folders, _ = self.replies.get(root, (0, None, None))
+        changed = folders != previous_folders
+        if changed:
+            generation += 1
+            try:
+                index.save()  # Lets a restarted service skip unchanged folders
+            except OSError as e:
+                print(f"Could not save the project index cache of {root}: {e}")
+
+        reply = {"ok": True, "root": root, "generation": generation,
+                 "scanned_at": datetime.now().isoformat(timespec="seconds"), "folders": folders}
+        self.indexes[root] = index
+        self.replies[root] = (generation, folders, (json.dumps(reply, separators=(",", ":")) + "\n").encode("utf-8"))
+
+        if changed:
+            print(f"{root}: {index.folder_count()} folders, {index.listed_count} listed in {seconds:.2f} s (generation {generation})")
+
+    def reply(self, request):
+        """
+        Reply bytes for a request, crawling the root first when the service hasn't yet
+
+        Raises ValueError when the request has no root path.
+        """
+        if not isinstance(request.get("root"), str):
+            raise ValueError("expected the project root as a string")
+        root = os.path.normpath(request["root"])
+        if request.get("op") != "index":
+            return (json.dumps({"ok": False, "error": f"Unknown request {request.get('op')!r}"}) + "\n").encode("utf-8")
+        if root not in self.locks:
+            return (json.dumps({"ok": False, "error": f"{root} is not served"}) + "\n").encode("utf-8")
+
+        with self.locks[root]:
+            if request.get("rescan") or root not in self.replies:
+                self._refresh(root, rescan=bool(request.get("rescan")))
+            return self.replies[root][2]
+
+    def watch(self):
+        """
+        Re-crawl every root each interval until stop() is called
+        """
+        while not self.stop_event.is_set():
+            for root in self.roots:
+                try:
+                    self.refresh(root)
+                except Exception as e:  # A share going away must not end the service
+                    print(f"Could not crawl {root}: {e}")
+            self.stop_event.wait(self.interval)
+
+    def serve(self, address):
+        """
+        Serve the roots on a "unix:<path>" or "<host>:<port>" address until interrupted
+        """
+        family, target = parse_service_address(address)
+        if family == socket.AF_INET:
+            server_class = socketserver.ThreadingTCPServer
+        else:
+            server_class = socketserver.ThreadingUnixStreamServer
+            if os.path.exists(target):
+                try:
+                    fetch_served_index(address, "", connect_timeout=1, reply_timeout=1)
+                except ValueError:
+                    raise OSError(errno.EADDRINUSE, f"An index service is already running on {target}")
+                except OSError:
+                    os.remove(target)  # Left by a service that didn't shut down
+
+        server = server_class(target, IndexServiceHandler, bind_and_activate=False)
+        server.allow_reuse_address = True
+        server.request_queue_size = INDEX_SERVICE_BACKLOG
+        server.daemon_threads = True
+        server.service = self
+        try:
+            server.server_bind()
+            server.server_activate()
+        except OSError:
+            server.server_close()
+            raise
+
+        watcher = threading.Thread(target=self.watch, name="scene_saver_index_watch", daemon=True)
+        watcher.start()
+        try:
+            server.serve_forever()
+        finally:
+            self.stop()
+            server.server_close()
+            if family != socket.AF_INET and os.path.exists(target):
+                os.remove(target)
+
+    def stop(self):
+        self.stop_event.set()
+
+SEARCH_RESULT_LIMIT = 20  # Ranked shots returned for a query
+SEARCH_MIN_SIMILARITY = 0.4  # Trigram similarity below which a misspelt word matches no folder name
+SEARCH_WORD_RE = re.compile(r"[^\W_]+")  # Query words, separated by spaces, slashes, dashes or underscores
+NUMBER_RE = re.compile(r"\d+")
+
+def trigrams(text):
+    """
+    Three letter slices of a word padded with a space on each side, so short words have some
+    """
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ShotSearchIndex(object):
+    """
+    Ranked search over the episode/sequence/shot paths of a project dict
+
+    Every word of a query is scored against the distinct folder names only:
+    exactly or by prefix through a trie, also without leading zeros ("ep2" and
+    "2" find EP002), and failing that by trigram similarity so typos still match. A shot
+    is a result when every word matches one of its names, ranked by the sum of
+    the word scores, so a keystroke costs a walk of the matched names' postings
+    rather than a pass over every shot.
+    """
+    def __init__(self, project_dict):
+        self.entries = []  # (episode, sequence, shot), sequence and shot are "" for empty episodes and sequences
+        self.postings = {}  # Lower case folder name -> ids of the entries it is part of
+        self.trie = {}  # Nested {character: node} dicts, the None key of a node holds the names its key stands for
+        self.trigrams = {}  # Trigram -> search keys containing it
+        self.trigram_counts = {}  # Search key -> (lower case folder name, number of trigrams)
+
+        for episodes in project_dict.values():
+            for ep, sequences in episodes.items():
+                if not sequences:
+                    self._add_entry(ep, "", "")
+                for sq, shots in sequences.items():
+                    if not shots:
+                        self._add_entry(ep, sq, "")
+                    for sh in shots:
+                        self._add_entry(ep, sq, sh)
+
+        for name in self.postings:
+            for key in self.search_keys(name):
+                self._insert(key, name)
+                if not key.isdigit():  # Bare numbers are too short to be told apart by trigrams
+                    key_trigrams = trigrams(key)
+                    self.trigram_counts[key] = (name, len(key_trigrams))
+                    for gram in key_trigrams:
+                        self.trigrams.setdefault(gram, set()).add(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add_entry(self, *names):
+        entry = len(self.entries)
+        self.entries.append(names)
+        for name in names:
+            if name:
+                self.postings.setdefault(name.lower(), []).append(entry)
+
+    @staticmethod
+    def search_keys(name):
+        """
+        The lower case name and its numbers, each with and without leading zeros ("sh0030", "sh30", "0030", "30")
+        """
+        keys = {name, NUMBER_RE.sub(lambda match: match.group().lstrip("0") or "0", name)}
+        for number in NUMBER_RE.findall(name):
+            keys.add(number)
+            keys.add(number.lstrip("0") or "0")
+        return keys
+
+    def _insert(self, key, name):
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(name)
+
+    def match_names(self, word):
+        """
+        {lower case folder name: score} for one query word
+
+        An exact key scores 1, a prefix between 0.5 and 0.9 depending on how much
+        of the key it covers, a misspelling at most 0.4.
+        """
+        node = self.trie
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return self.similar_names(word)
+
+        scores = {}
+        pending = [(node, len(word))]
+        while pending:
+            node, depth = pending.pop()
+            for char, child in node.items():
+                if char is not None:
+                    pending.append((child, depth + 1))
+                    continue
+
+                score = 1.0 if depth == len(word) else 0.5 + 0.4 * len(word) / depth
+                for name in child:
+                    if scores.get(name, 0) < score:
+                        scores[name] = score
+
+        return scores
+
+    def similar_names(self, word):
+        """
+        Folder names sharing enough trigrams with a word that isn't a prefix of any of them
+        """
+        word_trigrams = trigrams(word)
+        shared = {}
+        for gram in word_trigrams:
+            for key in self.trigrams.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        scores = {}
+        for key, count in shared.items():
+            name, key_trigram_count = self.trigram_counts[key]
+            similarity = 2.0 * count / (len(word_trigrams) + key_trigram_count)
+            if similarity >= SEARCH_MIN_SIMILARITY and scores.get(name, 0) < 0.4 * similarity:
+                scores[name] = 0.4 * similarity
+        return scores
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """
+        Best (episode, sequence, shot) matches of a query, in project order among equal scores
+        """
+        scores = None
+
+        for word in SEARCH_WORD_RE.findall(query.lower()):
+            word_scores = {}
+            for name, score in self.match_names(word).items():
+                for entry in self.postings[name]:
+                    if word_scores.get(entry, 0) < score:
+                        word_scores[entry] = score
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {entry: score + word_scores[entry] for entry, score in scores.items() if entry in word_scores}
+            if not scores:
+                return []
+
+        if scores is None:
+            return []
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.entries[entry] for entry, _ in best]
+
+# Placeholders a name format can use, in the order they are documented
+PLACEHOLDERS = ("proj", "ep", "sq", "sh", "dept", "tag", "ver", "artist", "date", "time", "ftype")
+
+# Regex used for each placeholder when parsing existing file names, anything else matches lazily
+FIELD_PATTERNS = {
+    "ver": r"\d+",
+    "date": r"\d{8}",
+    "time": r"\d{6}",
+    "ftype": r"ma|mb",
+}
+
+# Fields that change between two saves of the same scene, everything else identifies the scene
+VOLATILE_FIELDS = ("ver", "date", "time")
+
+class NameFormatError(ValueError):
+    """
+    Raised when a name format can't be compiled
+    """
+
+class NameTemplate(object):
+    """
+    A name format compiled once, rendering file names and parsing them back into fields
+
+    Use compile_name_format() rather than building templates directly so each
+    format string is only compiled once.
+    """
+    def __init__(self, name_format):
+        self.name_format = name_format
+        self.parts = []  # (literal, field) pairs, field is None after the last placeholder
+        fields = []
+        pattern = []
+
+        try:
+            parsed = list(string.Formatter().parse(name_format))
+        except ValueError as e:
+            raise NameFormatError(f"Invalid name format {name_format!r}: {e}")
+
+        for literal, field, spec, conversion in parsed:
+            pattern.append(re.escape(literal))
+            self.parts.append((literal, field))
+            if field is None:
+                continue
+
+            if field not in PLACEHOLDERS:
+                raise NameFormatError(f"Unknown placeholder {{{field}}} in name format {name_format!r}")
+            if spec or conversion:
+                raise NameFormatError(f"Placeholder {{{field}}} in name format {name_format!r} can't have a format spec")
+
+            if field in fields:
+                pattern.append(f"(?P={field})")
+            else:
+                fields.append(field)
+                pattern.append(f"(?P<{field}>{FIELD_PATTERNS.get(field, '.+?')})")
+
+        self.fields = tuple(fields)
+        self.regex = re.compile("".join(pattern) + r"\Z")
+
+    def __repr__(self):
+        return f"NameTemplate({self.name_format!r})"
+
+    def has_field(self, field):
+        return field in self.fields
+
+    def render(self, values):
+        """
+        Render a file name from a {placeholder: value} dict
+        """
+        return "".join(literal + values[field] if field is not None else literal for literal, field in self.parts)
+
+    def parse(self, file_name):
+        """
+        Parse a file name rendered by this template back into its fields, None when it doesn't match
+        """
+        match = self.regex.match(file_name)
+        return match.groupdict() if match else None
+
+@functools.lru_cache(maxsize=None)
+def compile_name_format(name_format):
+    """
+    Compile a name format such as "{sh}_{dept}_{ver}.{ftype}", cached per format string
+    """
+    return NameTemplate(name_format)
+
+MAX_VERSION = 9999.9  # Highest version offered by the window, tokens of up to five digits
+
+def version_token(value):
+    """
+    Render a version the way the file name does, 1.0 -> "10"
+
+    Raises NameFormatError for a version that version_from_token wouldn't read
+    back, one with more than one decimal digit, negative or above MAX_VERSION.
+    """
+    tenths = round(value * 10)
+    if not 0 <= value <= MAX_VERSION or abs(value * 10 - tenths) > 1e-6:
+        raise NameFormatError(f"Version {value} can't be saved, versions go from 0.0 to {MAX_VERSION} with one decimal digit")
+    return f"{tenths / 10.0:.1f}".replace(".", "")
+
+def version_from_token(token):
+    """
+    Turn a version token back into a number, assuming a single decimal digit ("10" -> 1.0, "25" -> 2.5)
+    """
+    return int(token) / 10.0
+
+# Formats offered in every project, the site, project and user layers add to them
+DEFAULT_NAME_FORMATS = (
+    "{proj}_{dept}_{ver}.{ftype}",
+    "{proj}_{sh}_{ver}.{ftype}",
+    "{dept}_{tag}_{ver}.{ftype}",
+    "{sh}_{dept}_{tag}_{ver}.{ftype}",
+    "{proj}_{sh}_{dept}_bkp_{ver}.{ftype}",
+    "{proj}_{sh}_{dept}_{artist}_{ver}.{ftype}",
+    "{proj}_{sh}_{dept}_{date}_{ver}.{ftype}",
+    "{proj}_{sq}_{sh}_render_{ver}.{ftype}",
+    "{proj}_{sh}_final_render_{date}.{ftype}",
+    "{proj}_{sq}_{sh}_{dept}_bkp_{date}.{ftype}",
+    "{sq}_{sh}_{dept}_{artist}_{tag}_{ver}.{ftype}",
+    "{proj}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}",
+    "{proj}_{ep}_{sq}_{sh}_{dept}_{ver}.{ftype}",
+    "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}",
+    "{proj}_{sq}_{sh}_{dept}_{artist}_{date}_{time}.{ftype}",
+    "{proj}_{ep}_{sq}_{sh}_{tag}_{dept}_{artist}_{date}_{time}_{ver}.{ftype}",
+)
+
+LOCK_POLL_SECONDS = 0.05
+
+def user_formats_path():
+    """
+    Name formats added by the user, the file the Scene Saver window has always used
+    """
+    return os.path.join(os.path.expanduser("~"), "file_name_formats.json")
+
+def project_formats_path(root_path):
+    """
+    Name formats shared by everyone working on a project
+    """
+    return os.path.join(root_path, ".scene_saver", "name_formats.json")
+
+def site_formats_path():
+    """
+    Studio wide name formats, from the file set in SCENE_SAVER_SITE_FORMATS
+    """
+    return os.environ.get("SCENE_SAVER_SITE_FORMATS") or None
+
+@contextlib.contextmanager
+def locked_file(file_path, timeout=10):
+    """
+    Hold an exclusive lock on file_path + ".lock" for a read-modify-write shared between Maya sessions
+
+    Raises TimeoutError when another session holds the lock for longer than timeout seconds.
+    """
+    os.makedirs(os.path.dirname(file_path) or os.curdir, exist_ok=True)
+    lock_file = open(file_path + ".lock", "a+")
+    deadline = time.monotonic() + timeout
+
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{file_path} is locked by another session")
+                time.sleep(LOCK_POLL_SECONDS)
+
+        yield
+    finally:
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass  # Never locked
+        lock_file.close()
+
+def read_formats_file(file_path):
+    """
+    The {"formats": [...]} data of a format file, raises OSError or ValueError when it can't be read
+    """
+    with open(file_path, "r") as file:
+        data = json.load(file)
+
+    if not isinstance(data, dict) or not isinstance(data.get("formats", []), list):
+        raise ValueError(f"{file_path} is not a name format file")
+
+    data.setdefault("formats", [])
+    return data
+
+class NameFormatConfig(object):
+    """
+    Name formats merged from the built-in defaults and the site, project and user layers
+
+    The layers are merged in that order, each keeping the order of its file and
+    duplicates keeping their first position, so the list never reshuffles. A layer
+    file is read again only when its mtime or size changed, which costs one stat
+    per layer. Only add_user_format writes, under a lock and through an atomic
+    rename, so concurrent Maya sessions can't lose each other's formats.
+    """
+    def __init__(self, project_root=None):
+        self.project_root = project_root
+        self.layers = {}  # File path -> ((mtime in ns, size), formats)
+
+    def layer_paths(self):
+        """
+        (level, file path) of the layers that apply, lowest precedence first
+        """
+        layers = [("site", site_formats_path())]
+        if self.project_root:
+            layers.append(("project", project_formats_path(self.project_root)))
+        layers.append(("user", user_formats_path()))
+        return [(level, path) for level, path in layers if path]
+
+    def layer_formats(self, file_path):
+        """
+        Formats of one layer file, from the cache unless the file changed
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self.layers.pop(file_path, None)
+            return []
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.layers.get(file_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            formats = [name_format for name_format in read_formats_file(file_path)["formats"] if isinstance(name_format, str)]
+        except (OSError, ValueError) as e:
+            print(f"Ignoring the name formats in {file_path}: {e}")
+            formats = []
+
+        self.layers[file_path] = (key, formats)
+        return formats
+
+    def formats(self):
+        """
+        Every available name format in a stable order
+        """
+        merged = dict.fromkeys(DEFAULT_NAME_FORMATS)
+        for _, file_path in self.layer_paths():
+            merged.update(dict.fromkeys(self.layer_formats(file_path)))
+        return list(merged)
+
+    def add_user_format(self, name_format):
+        """
+        Add a format to the user layer, returns False when the file already has it
+        """
+        file_path = user_formats_path()
+
+        with locked_file(file_path):
+            # Read the file itself rather than the cache, another session may have just written it
+            try:
+                data = read_formats_file(file_path)
+            except FileNotFoundError:
+                data = {"formats": []}
+            except ValueError:
+                data = {"formats": []}  # Replace a corrupted file rather than failing forever
+
+            if name_format in data["formats"]:
+                return False
+
+            data["formats"].append(name_format)
+            write_json_atomic(file_path, data, indent=4)
+
+        return True
+
+def list_files(folder_path):
+    """
+    List the file names of a folder with a single os.scandir call
+    """
+    file_names = []
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        file_names.append(entry.name)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+    return file_names
+
+class VersionIndex(object):
+    """
+    In-memory cache of the versions saved in each department folder
+
+    A folder is only listed again when its mtime changes, so proposing the next
+    version normally costs one stat on the network share.
+    """
+    def __init__(self):
+        self.folders = {}  # Folder path -> (mtime in ns, file names)
+        self.parsed = {}  # (folder path, name format) -> (mtime in ns, [parsed fields])
+        self.pending = {}  # Folder path -> names of files still being transferred into it
+
+    def invalidate(self, folder_path):
+        """
+        Forget a folder, e.g. right after saving into it
+        """
+        self.folders.pop(folder_path, None)
+        for key in [key for key in self.parsed if key[0] == folder_path]:
+            del self.parsed[key]
+
+    def add_pending(self, folder_path, file_name):
+        """
+        Count a file that is on its way to the folder as already saved
+        """
+        self.pending.setdefault(folder_path, set()).add(file_name)
+        self.invalidate(folder_path)
+
+    def remove_pending(self, folder_path, file_name):
+        self.pending.get(folder_path, set()).discard(file_name)
+        self.invalidate(folder_path)
+
+    def file_names(self, folder_path):
+        """
+        File names of a folder, listed again only when its mtime changed
+        """
+        mtime = folder_mtime(folder_path)
+        cached = self.folders.get(folder_path)
+
+        if mtime is None or cached is None or cached[0] != mtime:
+            file_names = list_files(folder_path)
+            file_names.extend(self.pending.get(folder_path, ()))
+            cached = (mtime, file_names)
+            self.folders[folder_path] = cached
+
+        return cached[1]
+
+    def parsed_names(self, folder_path, name_format):
+        """
+        Fields of every file in the folder that matches the name format
+        """
+        file_names = self.file_names(folder_path)
+        mtime = self.folders[folder_path][0]
+        key = (folder_path, name_format)
+        cached = self.parsed.get(key)
+
+        if mtime is None or cached is None or cached[0] != mtime:
+            template = compile_name_format(name_format)
+            parsed = (template.parse(file_name) for file_name in file_names)
+            cached = (mtime, [fields for fields in parsed if fields is not None])
+            self.parsed[key] = cached
+
+        return cached[1]
+
+    def versions(self, folder_path, name_format, fields):
+        """
+        Versions already saved for the scene identified by fields (everything but version, date and time)
+        """
+        identity = {key: value for key, value in fields.items() if key not in VOLATILE_FIELDS}
+        versions = []
+
+        for parsed in self.parsed_names(folder_path, name_format):
+            if "ver" not in parsed:
+                continue
+            if all(parsed[key] == identity[key] for key in parsed if key in identity):
+                versions.append(version_from_token(parsed["ver"]))
+
+        return versions
+
+    def next_version(self, folder_path, name_format, fields):
+        """
+        Next free whole version for the scene, None when the name format has no {ver} placeholder
+        """
+        if not compile_name_format(name_format).has_field("ver"):
+            return None
+
+        versions = self.versions(folder_path, name_format, fields)
+        return float(int(max(versions)) + 1) if versions else 1.0
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes read and written per chunk when streaming a scene
+TRANSFER_ATTEMPTS = 5  # Copies of a scratch file that Maya keeps saving over before the transfer gives up
+
+class TransferError(IOError):
+    """
+    Raised when a transferred file doesn't match its source
+    """
+
+def iter_chunks(file, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Yield memoryviews of successive chunks of an open binary file, all read into one reused buffer
+
+    The buffer is no bigger than the file, so hashing many small files doesn't
+    allocate a full chunk each, and a chunk is only valid until the next one.
+    """
+    size = os.fstat(file.fileno()).st_size
+    view = memoryview(bytearray(max(1, min(chunk_size, size))))
+    while True:
+        count = file.readinto(view)
+        if not count:
+            return
+        yield view[:count]
+
+def file_checksum(file_path, chunk_size=COPY_CHUNK_SIZE):
+    """
+    sha256 of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb", buffering=0) as file:
+        for chunk in iter_chunks(file, chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def copy_with_checksum(src_path, dst_path, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Stream a file chunk by chunk, hashing the data on the way, and return its sha256
+    """
+    digest = hashlib.sha256()
+    with open(src_path, "rb", buffering=0) as src, open(dst_path, "wb") as dst:
+        for chunk in iter_chunks(src, chunk_size):
+            digest.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+def file_signature(file_path):
+    """
+    (mtime in ns, size) of a file, None when it is missing, to tell whether it was written since
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def transfer_file(src_path, dst_path, chunk_size=COPY_CHUNK_SIZE, verify=True):
+    """
+    Copy a file to its destination through a temp name and rename it into place
+
+    The temp file lives next to the destination so the final rename is atomic and
+    a partially written file never shows up under the real name. With verify,
+    the written copy is read back and compared to the checksum of the source.
+    Returns the sha256 of the file.
+    """
+    folder = os.path.dirname(dst_path)
+    os.makedirs(folder, exist_ok=True)
+    temp_path = os.path.join(folder, f".{os.path.basename(dst_path)}.{uuid.uuid4().hex[:8]}.part")
+
+    try:
+        checksum = copy_with_checksum(src_path, temp_path, chunk_size)
+        if verify and file_checksum(temp_path, chunk_size) != checksum:
+            raise TransferError(f"Checksum mismatch while copying {src_path} to {dst_path}")
+        os.replace(temp_path, dst_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return checksum
+
+def default_scratch_folder():
+    """
+    Local folder scenes are saved to before being transferred, SCENE_SAVER_SCRATCH_DIR overrides the default
+    """
+    return os.environ.get("SCENE_SAVER_SCRATCH_DIR") or os.path.join(tempfile.gettempdir(), "scene_saver_scratch")
+
+class TransferQueue(object):
+    """
+    Saves scenes to fast local scratch and transfers them to their destination in the background
+
+    Transfers run one at a time in submission order, so two saves to the same
+    name land in the order they were made. The save itself is injected as a
+    save_scene(path) callable, which is cmds.file inside Maya and anything that
+    writes a file outside of it.
+    """
+    def __init__(self, scratch_folder=None):
+        self.scratch_folder = scratch_folder or default_scratch_folder()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_transfer")
+
+    def save(self, save_scene, dst_path, on_done=None):
+        """
+        Save to scratch with save_scene(path), then queue the transfer to dst_path and return its future
+        """
+        scratch_path = self.save_to_scratch(save_scene, dst_path)
+        return self.submit(scratch_path, dst_path, on_done)
+
+    def save_to_scratch(self, save_scene, dst_path):
+        """
+        Save into a fresh scratch folder under the destination's file name and return the scratch path
+        """
+        os.makedirs(self.scratch_folder, exist_ok=True)
+        scratch_path = os.path.join(tempfile.mkdtemp(dir=self.scratch_folder), os.path.basename(dst_path))
+        save_scene(scratch_path)
+        return scratch_path
+
+    def submit(self, scratch_path, dst_path, on_done=None, keep_scratch=False):
+        """
+        Queue the transfer of a scratch file, on_done(dst_path, checksum, error) is called from the transfer thread
+
+        With keep_scratch the scratch folder is left for the caller to remove,
+        for a scene that is still open under its scratch path.
+        """
+        return self.executor.submit(self._transfer, scratch_path, dst_path, on_done, keep_scratch)
+
+    def _transfer(self, scratch_path, dst_path, on_done, keep_scratch=False):
+        checksum = None
+        error = None
+
+        try:
+            # The scene may be saved over its scratch file during the copy, copy it again until it holds still
+            for _ in range(TRANSFER_ATTEMPTS):
+                signature = file_signature(scratch_path)
+                checksum = transfer_file(scratch_path, dst_path)
+                if file_signature(scratch_path) == signature:
+                    break
+            else:
+                raise TransferError(f"{scratch_path} kept changing while it was transferred")
+        except Exception as e:
+            error = e  # The scratch copy is kept so the scene can be recovered
+        else:
+            if not keep_scratch:
+                shutil.rmtree(os.path.dirname(scratch_path), ignore_errors=True)
+
+        if on_done is not None:
+            on_done(dst_path, checksum, error)
+
+        if error is not None:
+            raise error
+        return checksum
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+BACKUP_FOLDER_NAME = "backup"
+BACKUP_PREFIX = "bkp_"
+BACKUP_NAME_RE = re.compile(r"bkp_(\d{8}_\d{6})(?:-(\d+))?_")  # bkp_<timestamp>[-<count>]_<name>
+
+def backup_retention():
+    """
+    Retention policy of backup folders as (keep, max_bytes), None meaning unlimited
+
+    SCENE_SAVER_BACKUP_KEEP is the number of most recent backups kept per shot,
+    across the backup folders of all its departments, and SCENE_SAVER_BACKUP_MAX_MB
+    caps their total size.
+    """
+    keep = os.environ.get("SCENE_SAVER_BACKUP_KEEP")
+    max_mb = os.environ.get("SCENE_SAVER_BACKUP_MAX_MB")
+
+    try:
+        keep = int(keep) if keep else None
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else None
+    except ValueError:
+        print("Ignoring invalid SCENE_SAVER_BACKUP_KEEP / SCENE_SAVER_BACKUP_MAX_MB values")
+        return None, None
+
+    return keep, max_bytes
+
+def backup_path_for(file_path, timestamp=None):
+    """
+    Path in the backup folder for a file, bkp_<timestamp>_<name>, never reusing an existing name
+    """
+    backup_folder = os.path.join(os.path.dirname(file_path), BACKUP_FOLDER_NAME)
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.basename(file_path)
+
+    backup_path = os.path.join(backup_folder, f"{BACKUP_PREFIX}{timestamp}_{base_name}")
+    count = 1
+    while os.path.exists(backup_path):
+        count += 1
+        backup_path = os.path.join(backup_folder, f"{BACKUP_PREFIX}{timestamp}-{count}_{base_name}")
+
+    return backup_path
+
+def backup_sort_key(backup_name):
+    """
+    Chronological sort key of a backup name, names that don't parse sort as the oldest
+    """
+    match = BACKUP_NAME_RE.match(backup_name)
+    if not match:
+        return ("", 0, backup_name)
+    return (match.group(1), int(match.group(2) or 1), backup_name)
+
+def same_device(path_a, path_b):
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+def backup_file(file_path, keep_original=False):
+    """
+    Back a file up into the backup folder next to it and return (backup_path, method)
+
+    On the same device the file is renamed (or hard linked when keep_original is
+    set), which is O(1) whatever the size of the scene. Across devices it falls
+    back to a streamed copy. keep_original must only be used when the original is
+    about to be replaced by a rename, as a hard link shares its data with the
+    original and an in-place write would change the backup too.
+    """
+    backup_path = backup_path_for(file_path)
+    backup_folder = os.path.dirname(backup_path)
+    os.makedirs(backup_folder, exist_ok=True)
+
+    if same_device(file_path, backup_folder):
+        try:
+            if keep_original:
+                os.link(file_path, backup_path)
+                return backup_path, "hardlink"
+
+            os.rename(file_path, backup_path)
+            return backup_path, "rename"
+        except OSError as e:
+            # Bind mounts and some network filesystems refuse renames/links despite a shared st_dev
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+                raise
+
+    transfer_file(file_path, backup_path, verify=False)
+    if not keep_original:
+        os.remove(file_path)
+    return backup_path, "copy"
+
+def shot_backup_folders(shot_path):
+    """
+    Backup folders of every department of a shot (<shot>/<dept>/backup)
+    """
+    folders = []
+    try:
+        with os.scandir(shot_path) as entries:
+            for entry in entries:
+                backup_folder = os.path.join(entry.path, BACKUP_FOLDER_NAME)
+                if entry.is_dir() and os.path.isdir(backup_folder):
+                    folders.append(backup_folder)
+    except OSError:
+        pass
+    return folders
+
+def prune_backups(shot_path, keep=None, max_bytes=None):
+    """
+    Delete the oldest backups of a shot beyond the retention policy and return the deleted paths
+
+    The policy applies to the backups of all the shot's departments together.
+    Backups are ordered by the timestamp in their name. The most recent backup is
+    always kept, even when it alone is larger than max_bytes.
+    """
+    if keep is None and max_bytes is None:
+        return []
+
+    backups = []
+    for backup_folder in shot_backup_folders(shot_path):
+        try:
+            with os.scandir(backup_folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith(BACKUP_PREFIX) and entry.is_file():
+                        size = entry.stat().st_size if max_bytes is not None else 0
+                        backups.append((entry.name, entry.path, size))
+        except OSError:
+            continue
+
+    backups.sort(key=lambda backup: backup_sort_key(backup[0]), reverse=True)  # Newest first
+    kept_bytes = 0
+    deleted = []
+
+    for position, (_name, path, size) in enumerate(backups):
+        over_count = keep is not None and position >= max(keep, 1)
+        over_size = max_bytes is not None and position > 0 and kept_bytes + size > max_bytes
+
+        if over_count or over_size:
+            try:
+                os.remove(path)
+                deleted.append(path)
+            except OSError:
+                pass
+        else:
+            kept_bytes += size
+
+    return deleted
+
+class BackupPruner(object):
+    """
+    Enforces the backup retention policy on a background thread
+
+    Scheduling a shot that is already waiting to be pruned is a no-op, so a
+    burst of saves into one shot costs a single listing of its backup folders.
+    """
+    def __init__(self, keep=None, max_bytes=None):
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_pruner")
+
+    @classmethod
+    def from_environment(cls):
+        return cls(*backup_retention())
+
+    def schedule(self, shot_path):
+        """
+        Queue a shot's backups for pruning, returns the future or None when nothing needs doing
+        """
+        if self.keep is None and self.max_bytes is None:
+            return None
+
+        with self.lock:
+            if shot_path in self.pending:
+                return None
+            self.pending.add(shot_path)
+
+        return self.executor.submit(self._prune, shot_path)
+
+    def _prune(self, shot_path):
+        with self.lock:
+            self.pending.discard(shot_path)
+
+        deleted = prune_backups(shot_path, self.keep, self.max_bytes)
+        if deleted:
+            print(f"Pruned {len(deleted)} old backup(s) in {shot_path}")
+        return deleted
+
+BACKUP_STORE_FOLDER_NAME = ".scene_saver_backups"
+
+class BackupStore(object):
+    """
+    Content-addressed, compressed backup store of a shot
+
+    Each unique file content is stored once as a gzip blob named after its sha256,
+    and an append-only manifest maps every backup (timestamp, source file) to its
+    blob. Backing up a scene that hasn't changed only adds a manifest line.
+
+        <shot>/.scene_saver_backups/manifest.jsonl
+        <shot>/.scene_saver_backups/objects/<sha256[:2]>/<sha256>.gz
+    """
+    def __init__(self, shot_path):
+        self.store_path = os.path.join(shot_path, BACKUP_STORE_FOLDER_NAME)
+        self.objects_path = os.path.join(self.store_path, "objects")
+        self.manifest_path = os.path.join(self.store_path, "manifest.jsonl")
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, file_path):
+        """
+        Store of the shot a department file belongs to (<shot>/<dept>/<file>)
+        """
+        return cls(os.path.dirname(os.path.dirname(os.path.abspath(file_path))))
+
+    def blob_path(self, checksum):
+        return os.path.join(self.objects_path, checksum[:2], checksum + ".gz")
+
+    def add(self, file_path, source_name=None, timestamp=None, chunk_size=COPY_CHUNK_SIZE):
+        """
+        Back a file up into the store and return its manifest entry
+
+        The file is hashed and compressed in one streaming pass into a temp blob,
+        which is dropped when a blob with the same content already exists. The
+        blob check and the manifest line are written under the store lock, so a
+        prune from another session can't collect the blob in between.
+        """
+        os.makedirs(self.objects_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".gz", dir=self.objects_path)
+
+        digest = hashlib.sha256()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip container
+        size = 0
+
+        try:
+            with open(file_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                for chunk in iter(functools.partial(src.read, chunk_size), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    dst.write(compressor.compress(chunk))
+                dst.write(compressor.flush())
+
+            checksum = digest.hexdigest()
+            blob_path = self.blob_path(checksum)
+            stored_size = os.path.getsize(temp_path)
+
+            with self.lock, locked_file(self.manifest_path):
+                if os.path.exists(blob_path):
+                    os.remove(temp_path)  # Same content is already stored
+                    stored_size = os.path.getsize(blob_path)
+                else:
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.replace(temp_path, blob_path)
+
+                entry = {
+                    "timestamp": timestamp or datetime.now().strftime("%Y%m%d_%H%M%S"),
+                    "source": source_name or os.path.basename(file_path),
+                    "sha256": checksum,
+                    "size": size,
+                    "stored_size": stored_size,
+                }
+
+                with open(self.manifest_path, "a") as manifest:
+                    manifest.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return entry
+
+    def entries(self, source_name=None):
+        """
+        Manifest entries, oldest first, optionally only those of one source file
+        """
+        entries = []
+        try:
+            with open(self.manifest_path, "r") as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn line from an interrupted write
+                    if source_name is None or entry.get("source") == source_name:
+                        entries.append(entry)
+        except OSError:
+            pass
+
+        return entries
+
+    def find(self, source_name, timestamp=None):
+        """
+        Latest backup of a source file, or the one taken at timestamp
+        """
+        for entry in reversed(self.entries(source_name)):
+            if timestamp is None or entry["timestamp"] == timestamp:
+                return entry
+        return None
+
+    def restore(self, entry, dst_path, chunk_size=COPY_CHUNK_SIZE):
+        """
+        Decompress a backup to dst_path, verifying its checksum, and rename it into place
+        """
+        folder = os.path.dirname(os.path.abspath(dst_path))
+        os.makedirs(folder, exist_ok=True)
+        temp_path = os.path.join(folder, f".{os.path.basename(dst_path)}.{uuid.uuid4().hex[:8]}.part")
+
+        digest = hashlib.sha256()
+        decompressor = zlib.decompressobj(31)
+
+        try:
+            with open(self.blob_path(entry["sha256"]), "rb") as src, open(temp_path, "wb") as dst:
+                for chunk in iter(functools.partial(src.read, chunk_size), b""):
+                    data = decompressor.decompress(chunk)
+                    digest.update(data)
+                    dst.write(data)
+                data = decompressor.flush()
+                digest.update(data)
+                dst.write(data)
+
+            if digest.hexdigest() != entry["sha256"]:
+                raise TransferError(f"Backup blob {entry['sha256']} is corrupted")
+            os.replace(temp_path, dst_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return dst_path
+
+    def prune(self, keep):
+        """
+        Keep the keep most recent backups of each source file and delete blobs nobody references any more
+
+        The whole read, rewrite and collection holds the store lock shared with
+        other sessions, so no backup added meanwhile is dropped or loses its blob.
+        """
+        if not os.path.exists(self.manifest_path):
+            return []
+
+        with self.lock, locked_file(self.manifest_path):
+            entries = self.entries()
+            kept = []
+            seen = {}
+
+            for entry in reversed(entries):
+                count = seen.get(entry["source"], 0)
+                if count < max(keep, 1):
+                    kept.append(entry)
+                seen[entry["source"]] = count + 1
+
+            if len(kept) == len(entries):
+                return []
+
+            kept.reverse()
+            fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".jsonl", dir=self.store_path)
+            with os.fdopen(fd, "w") as manifest:
+                manifest.writelines(json.dumps(entry, separators=(",", ":")) + "\n" for entry in kept)
+            os.replace(temp_path, self.manifest_path)
+
+            referenced = {entry["sha256"] for entry in kept}
+            deleted = []
+            for checksum in {entry["sha256"] for entry in entries} - referenced:
+                try:
+                    os.remove(self.blob_path(checksum))
+                    deleted.append(checksum)
+                except OSError:
+                    pass
+
+        return deleted
+
+class BackupManager(object):
+    """
+    Backs files up before they are overwritten, as plain backups or into the compressed store of their shot
+
+    The plain backup is always an O(1) rename or hard link when possible. Storing
+    into the compressed store and pruning old backups happen on a worker thread.
+    """
+    def __init__(self, use_store=False, keep=None, max_bytes=None):
+        self.use_store = use_store
+        self.pruner = BackupPruner(keep, max_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_backup_store")
+
+    @classmethod
+    def from_environment(cls, use_store=False):
+        return cls(use_store, *backup_retention())
+
+    def backup(self, file_path, keep_original=False, wait=False):
+        """
+        Back a file up and return (backup_path, method), wait blocks until the background part is done
+        """
+        backup_path, method = backup_file(file_path, keep_original)
+
+        if self.use_store:
+            # The plain backup is removed once it is in the store
+            future = self.executor.submit(self.store_backup, backup_path, file_path)
+        else:
+            future = self.pruner.schedule(os.path.dirname(os.path.dirname(os.path.abspath(file_path))))  # <shot>/<dept>/<file>
+
+        if wait and future is not None:
+            future.result()
+
+        return backup_path, method
+
+    def store_backup(self, backup_path, file_path):
+        """
+        Move a plain backup into the compressed, deduplicated backup store of its shot
+        """
+        store = BackupStore.for_file(file_path)
+        source_name = os.path.join(os.path.basename(os.path.dirname(file_path)), os.path.basename(file_path))
+
+        try:
+            entry = store.add(backup_path, source_name)
+            os.remove(backup_path)
+        except OSError as e:
+            print(f"Could not add {backup_path} to the backup store, keeping the plain backup: {e}")
+            return None
+
+        if self.pruner.keep is not None:
+            store.prune(self.pruner.keep)
+
+        print(f"Backup stored as {entry['sha256'][:12]} ({entry['stored_size']} of {entry['size']} bytes): {source_name}")
+        return entry
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        self.pruner.executor.shutdown(wait=wait)
+
+SAVE_MANIFEST_NAME = ".scene_saver_history.jsonl"
+SAVE_MANIFEST_LOCK_TIMEOUT = 300  # Seconds an append waits for a repair, which hashes the whole folder
+HISTORY_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"  # Same stamps as the backups
+SCENE_EXTENSIONS = (".ma", ".mb")
+
+class SaveManifest(object):
+    """
+    Append-only history of the scenes saved into a department folder
+
+        <shot>/<dept>/.scene_saver_history.jsonl
+
+    Every save adds a line with the file's version, tag, artist, timestamp, size,
+    format and sha256, and every backup of a previous save a line pointing at the
+    backup, so the versions of a department are listed by reading one small file
+    instead of statting each scene on the share. repair() rebuilds it from the
+    folder when it is missing or out of date.
+    """
+    def __init__(self, dept_folder):
+        self.dept_folder = dept_folder
+        self.manifest_path = os.path.join(dept_folder, SAVE_MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.cache = None  # ((mtime in ns, size), entries) of the last read
+
+    @staticmethod
+    def make_entry(event, file_name, fields, size, checksum=None, timestamp=None, **extra):
+        """
+        A manifest record, event is "save" or "backup", fields the placeholder values of the scene
+        """
+        entry = {
+            "event": event,
+            "file": file_name,
+            "version": fields.get("ver"),
+            "tag": fields.get("tag"),
+            "artist": fields.get("artist"),
+            "timestamp": timestamp or datetime.now().strftime(HISTORY_TIMESTAMP_FORMAT),
+            "size": size,
+            "format": fields.get("ftype") or os.path.splitext(file_name)[1].lstrip("."),
+            "sha256": checksum,
+        }
+        entry.update(extra)
+        return entry
+
+    def exists(self):
+        return os.path.isfile(self.manifest_path)
+
+    def append(self, entry):
+        # Waits out a repair in another session, which hashes every scene of the folder
+        with self.lock, locked_file(self.manifest_path, SAVE_MANIFEST_LOCK_TIMEOUT), open(self.manifest_path, "a") as manifest:
+            manifest.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def entries(self):
+        """
+        Every record, oldest first, parsed again only when the manifest changed
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            self.cache = None
+            return []
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self.cache is not None and self.cache[0] == key:
+            return self.cache[1]
+
+        entries = []
+        try:
+            with open(self.manifest_path, "r") as manifest:
+                for line in manifest:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # Torn line from an interrupted write
+        except OSError:
+            pass
+
+        self.cache = (key, entries)
+        return entries
+
+    def last_save(self, file_name):
+        """
+        Latest save record of a file, None when the manifest has none
+        """
+        for entry in reversed(self.entries()):
+            if entry.get("event") == "save" and entry.get("file") == file_name:
+                return entry
+        return None
+
+    @staticmethod
+    def filter_entries(entries, text="", include_backups=False):
+        """
+        Records newest first whose version, tag, artist, file or timestamp contain every word of text
+        """
+        words = text.lower().split()
+        matches = []
+
+        for entry in reversed(entries):
+            if entry.get("event") != "save" and not include_backups:
+                continue
+            haystack = " ".join(str(entry.get(key) or "") for key in ("version", "tag", "artist", "file", "timestamp")).lower()
+            if all(word in haystack for word in words):
+                matches.append(entry)
+
+        return matches
+
+    def repair(self, name_format):
+        """
+        Rebuild the manifest from the scenes and backups found on disk, returns the number of records
+
+        Scenes are parsed with name_format for their version, tag and artist and
+        hashed, plain backups come from the backup folder and compressed ones from
+        the shot's backup store. The new manifest replaces the old one atomically.
+        The folder is read and the manifest replaced under the lock appends take,
+        so a save recorded by another session meanwhile is not dropped.
+        """
+        with self.lock, locked_file(self.manifest_path, SAVE_MANIFEST_LOCK_TIMEOUT):
+            return self._repair(name_format)
+
+    def _repair(self, name_format):
+        template = compile_name_format(name_format)
+        entries = []
+
+        def add(event, file_name, path, timestamp=None, **extra):
+            try:
+                size = os.path.getsize(path)
+                checksum = file_checksum(path)
+            except OSError:
+                return
+            if timestamp is None:
+                timestamp = datetime.fromtimestamp(os.path.getmtime(path)).strftime(HISTORY_TIMESTAMP_FORMAT)
+            entries.append(self.make_entry(event, file_name, template.parse(file_name) or {}, size, checksum, timestamp, **extra))
+
+        for file_name in list_files(self.dept_folder):
+            if file_name.endswith(SCENE_EXTENSIONS):
+                add("save", file_name, os.path.join(self.dept_folder, file_name))
+
+        backup_folder = os.path.join(self.dept_folder, BACKUP_FOLDER_NAME)
+        for backup_name in list_files(backup_folder):
+            match = BACKUP_NAME_RE.match(backup_name)
+            if match:
+                add("backup", backup_name[match.end():], os.path.join(backup_folder, backup_name), match.group(1),
+                    backup=os.path.join(BACKUP_FOLDER_NAME, backup_name))
+
+        store = BackupStore.for_file(os.path.join(self.dept_folder, SAVE_MANIFEST_NAME))
+        dept_prefix = os.path.basename(self.dept_folder) + os.sep
+        for stored in store.entries():
+            if stored["source"].startswith(dept_prefix):
+                file_name = stored["source"][len(dept_prefix):]
+                entries.append(self.make_entry("backup", file_name, template.parse(file_name) or {}, stored["size"],
+                                               stored["sha256"], stored["timestamp"], backup=f"store:{stored['sha256']}"))
+
+        entries.sort(key=lambda entry: entry["timestamp"])
+
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".jsonl", dir=self.dept_folder)
+        try:
+            with os.fdopen(fd, "w") as manifest:
+                manifest.writelines(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+            os.replace(temp_path, self.manifest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self.cache = None
+        return len(entries)
+
+LEDGER_SCHEMA_VERSION = 1
+LEDGER_BUSY_TIMEOUT = 30  # Seconds a save waits for another session's write to the ledger
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs")  # Where WAL's shared memory index isn't shared between machines
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    ep TEXT,
+    sq TEXT,
+    sh TEXT,
+    dept TEXT,
+    tag TEXT,
+    version REAL,
+    artist TEXT,
+    timestamp TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    format TEXT,
+    sha256 TEXT,
+    UNIQUE (path, timestamp)
+);
+CREATE INDEX IF NOT EXISTS saves_by_location ON saves (ep, sq, sh, dept, tag, version);
+CREATE INDEX IF NOT EXISTS saves_by_artist ON saves (artist, timestamp);
+CREATE INDEX IF NOT EXISTS saves_by_time ON saves (timestamp);
+CREATE TRIGGER IF NOT EXISTS saves_no_update BEFORE UPDATE ON saves
+    BEGIN SELECT RAISE(ABORT, 'the save ledger is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS saves_no_delete BEFORE DELETE ON saves
+    BEGIN SELECT RAISE(ABORT, 'the save ledger is append-only'); END;
+"""
+LEDGER_COLUMNS = ("ep", "sq", "sh", "dept", "tag", "version", "artist", "timestamp", "path", "size", "format", "sha256")
+
+def ledger_path(root_path):
+    """
+    Save ledger of a project, next to its name formats and hierarchy rules
+    """
+    return os.path.join(root_path, ".scene_saver", "ledger.sqlite")
+
+class SaveLedger(object):
+    """
+    Append-only SQLite table of every save made into a project
+
+        <project root>/.scene_saver/ledger.sqlite
+
+    Each save added to a department manifest is also added here with its episode,
+    sequence, shot and department, so "latest PUB of a shot's Animation" is one
+    indexed lookup instead of a listing of department folders. Write-ahead logging
+    keeps readers from blocking the artists saving, except on network filesystems
+    where WAL can't be shared between machines and the rollback journal is used.
+    Concurrent writers wait for each other through SQLite's busy timeout.
+
+    Connections are opened per thread, sqlite3 connections can't be shared.
+    """
+    def __init__(self, root_path):
+        self.root_path = os.path.normpath(root_path)
+        self.ledger_path = ledger_path(self.root_path)
+        self.local = threading.local()
+
+    def exists(self):
+        return os.path.isfile(self.ledger_path)
+
+    def connect(self):
+        """
+        This thread's connection, creating the ledger on first use
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            return connection
+
+        os.makedirs(os.path.dirname(self.ledger_path), exist_ok=True)
+        connection = sqlite3.connect(self.ledger_path, timeout=LEDGER_BUSY_TIMEOUT)
+        connection.row_factory = sqlite3.Row
+
+        network = filesystem_type(mount_point(self.ledger_path)) in NETWORK_FILESYSTEMS
+        try:
+            connection.execute("PRAGMA journal_mode=DELETE" if network else "PRAGMA journal_mode=WAL")
+            if not network:
+                connection.execute("PRAGMA synchronous=NORMAL")  # Durable enough with WAL, a save doesn't wait for two fsyncs
+        except sqlite3.OperationalError:
+            pass  # Another session holds the database, it keeps the mode it has
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] < LEDGER_SCHEMA_VERSION:
+            connection.executescript(LEDGER_SCHEMA)
+            connection.execute(f"PRAGMA user_version={LEDGER_SCHEMA_VERSION}")
+            connection.commit()
+
+        self.local.connection = connection
+        return connection
+
+    def close(self):
+        """
+        Close this thread's connection
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def make_row(self, file_path, entry, location):
+        """
+        Column values of a save, entry being its manifest record and location its "ep", "sq", "sh" and "dept"
+        """
+        try:
+            rel_path = os.path.relpath(file_path, self.root_path).replace(os.sep, "/")  # The same on every platform
+        except ValueError:  # Another Windows drive
+            rel_path = file_path
+
+        version = entry.get("version")
+        if isinstance(version, str):
+            version = version_from_token(version) if version.isdigit() else None
+
+        return (location.get("ep"), location.get("sq"), location.get("sh"), location.get("dept"), entry.get("tag"),
+                version, entry.get("artist"), entry["timestamp"], rel_path, entry.get("size"), entry.get("format"),
+                entry.get("sha256"))
+
+    def record(self, file_path, entry, location):
+        """
+        Add a save, returns False when the same file and timestamp were already recorded
+        """
+        return self.record_many([(file_path, entry, location)]) == 1
+
+    def record_many(self, saves):
+        """
+        Add (file_path, entry, location) saves in one transaction, returns the number added
+        """
+        rows = [self.make_row(*save) for save in saves]
+        connection = self.connect()
+        with connection:
+            cursor = connection.executemany(
+                f"INSERT OR IGNORE INTO saves ({', '.join(LEDGER_COLUMNS)}) VALUES ({', '.join('?' * len(LEDGER_COLUMNS))})", rows)
+        return cursor.rowcount
+
+    def import_history(self, project_index):
+        """
+        Add the saves of every department manifest of the project, returns the number not recorded before
+
+        Fills the ledger of a project saved into before it existed, running it again only adds what's missing.
+        """
+        added = 0
+        for fields, dept_folder in department_folders(project_index):
+            saves = [(os.path.join(dept_folder, entry["file"]), entry, fields)
+                     for entry in SaveManifest(dept_folder).entries()
+                     if entry.get("event") == "save" and entry.get("file") and entry.get("timestamp")]
+            if saves:
+                added += self.record_many(saves)
+        return added
+
+    def to_dict(self, row):
+        save = dict(row)
+        save["path"] = os.path.join(self.root_path, *save["path"].split("/"))
+        return save
+
+    def query(self, sql, parameters=()):
+        """
+        Rows of a query as dicts with absolute paths, no rows when the project has no ledger yet
+        """
+        if not self.exists():
+            return []
+        return [self.to_dict(row) for row in self.connect().execute(sql, parameters)]
+
+    def latest(self, ep, sq, sh, dept, tags=None):
+        """
+        Save of the highest version of a shot's department, the newest one when a version was overwritten
+
+        tags limits it to those tags, e.g. ("PUB", "FNL"). None when nothing matches.
+        """
+        sql = "SELECT * FROM saves WHERE ep = ? AND sq = ? AND sh = ? AND dept = ?"
+        parameters = [ep, sq, sh, dept]
+        if tags:
+            sql += f" AND tag IN ({', '.join('?' * len(tags))})"
+            parameters.extend(tags)
+
+        rows = self.query(sql + " ORDER BY version DESC, id DESC LIMIT 1", parameters)
+        return rows[0] if rows else None
+
+    def activity(self, artist=None, since=None, limit=100):
+        """
+        Saves newest first, of one artist and since a datetime when given
+        """
+        conditions, parameters = [], []
+        if artist is not None:
+            conditions.append("artist = ?")
+            parameters.append(artist)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(since.strftime(HISTORY_TIMESTAMP_FORMAT))
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.query(f"SELECT * FROM saves{where} ORDER BY timestamp DESC, id DESC LIMIT ?", parameters + [limit])
+
+    def artists(self, since=None):
+        """
+        [{"artist", "saves", "last_save"}] of everyone who saved since a datetime, most saves first
+        """
+        if not self.exists():
+            return []
+        sql = "SELECT artist, COUNT(*) AS saves, MAX(timestamp) AS last_save FROM saves"
+        parameters = []
+        if since is not None:
+            sql += " WHERE timestamp >= ?"
+            parameters.append(since.strftime(HISTORY_TIMESTAMP_FORMAT))
+        rows = self.connect().execute(sql + " GROUP BY artist ORDER BY saves DESC, artist", parameters)
+        return [dict(row) for row in rows]
+
+class SaveHistory(object):
+    """
+    Appends save and backup records to the department manifests on a worker thread
+
+    Hashing a scene on the share takes as long as reading it, so saves are
+    recorded in the background, in order, and the window never waits for it.
+    Saves are also added to the project's SaveLedger when one is set.
+    """
+    def __init__(self, ledger=None):
+        self.manifests = {}  # Department folder -> SaveManifest, keeping their read caches
+        self.ledger = ledger
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_history")
+
+    def manifest(self, dept_folder):
+        manifest = self.manifests.get(dept_folder)
+        if manifest is None:
+            manifest = self.manifests[dept_folder] = SaveManifest(dept_folder)
+        return manifest
+
+    def record_save(self, file_path, fields, checksum=None, wait=False):
+        """
+        Record a saved scene, hashing it first when its checksum isn't known yet
+        """
+        timestamp = datetime.now().strftime(HISTORY_TIMESTAMP_FORMAT)
+        future = self.executor.submit(self._record_save, file_path, dict(fields), checksum, timestamp)
+        return future.result() if wait else future
+
+    def _record_save(self, file_path, fields, checksum, timestamp):
+        try:
+            size = os.path.getsize(file_path)
+            checksum = checksum or file_checksum(file_path)
+            entry = SaveManifest.make_entry("save", os.path.basename(file_path), fields, size, checksum, timestamp)
+            self.manifest(os.path.dirname(file_path)).append(entry)
+        except OSError as e:
+            print(f"Could not record the save of {file_path} in the history: {e}")
+            return None
+
+        ledger = self.ledger
+        if ledger is not None:
+            try:
+                ledger.record(file_path, entry, fields)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not record the save of {file_path} in the project ledger: {e}")
+        return entry
+
+    def record_backup(self, file_path, backup_path, stored=False, wait=False):
+        """
+        Record the backup of a previously saved scene, reusing the details of its save record
+
+        stored is set when the plain backup is on its way into the shot's compressed store.
+        """
+        timestamp = datetime.now().strftime(HISTORY_TIMESTAMP_FORMAT)
+        try:
+            size = os.path.getsize(backup_path)  # Before the store moves it away
+        except OSError:
+            size = None
+
+        future = self.executor.submit(self._record_backup, file_path, backup_path, stored, size, timestamp)
+        return future.result() if wait else future
+
+    def _record_backup(self, file_path, backup_path, stored, size, timestamp):
+        dept_folder, file_name = os.path.split(file_path)
+        manifest = self.manifest(dept_folder)
+        saved = manifest.last_save(file_name) or {}
+        fields = {"ver": saved.get("version"), "tag": saved.get("tag"), "artist": saved.get("artist"), "ftype": saved.get("format")}
+
+        checksum = saved.get("sha256")
+        size = size if size is not None else saved.get("size")  # The store already took the plain backup
+        backup = f"store:{checksum}" if stored and checksum else os.path.relpath(backup_path, dept_folder)
+        entry = SaveManifest.make_entry("backup", file_name, fields, size, checksum, timestamp, backup=backup)
+        try:
+            manifest.append(entry)
+        except OSError as e:
+            print(f"Could not record the backup of {file_name} in the history: {e}")
+            return None
+        return entry
+
+    def repair(self, dept_folder, name_format, on_done=None):
+        """
+        Queue a rebuild of a department's manifest, on_done(dept_folder, count, error) is called from the worker thread
+        """
+        return self.executor.submit(self._repair, dept_folder, name_format, on_done)
+
+    def _repair(self, dept_folder, name_format, on_done):
+        count, error = None, None
+        try:
+            count = self.manifest(dept_folder).repair(name_format)
+        except (OSError, NameFormatError) as e:
+            error = e
+
+        if on_done is not None:
+            on_done(dept_folder, count, error)
+        return count
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+DATE_FORMAT = "%d%m%Y"
+TIME_FORMAT = "%H%M%S"
+
+def current_artist():
+    return os.environ.get("USER") or os.environ.get("USERNAME") or ""
+
+def maya_file_type(file_name):
+    """
+    cmds.file type of a scene file name
+    """
+    return "mayaBinary" if file_name.endswith(".mb") else "mayaAscii"
+
+def save_maya_scene(file_path, file_type):
+    """
+    Rename the current scene and save it in Maya
+    """
+    import maya.cmds as cmds  # Imported here so the core stays importable outside Maya
+
+    cmds.file(rename=file_path)
+    cmds.file(save=True, type=file_type)
+
+def build_name_fields(proj, ep, sq, sh, dept, tag, version, ftype, artist=None, now=None):
+    """
+    Placeholder values of a scene, rendered the same way the Scene Saver window does
+    """
+    now = now or datetime.now()
+    return {
+        "proj": proj.replace(" ", ""),
+        "ep": ep,
+        "sq": sq,
+        "sh": sh,
+        "tag": tag,
+        "dept": dept,
+        "artist": current_artist() if artist is None else artist,
+        "date": now.strftime(DATE_FORMAT),
+        "time": now.strftime(TIME_FORMAT),
+        "ver": version_token(version),
+        "ftype": ftype,
+    }
+
+class SavePlanError(ValueError):
+    """
+    Raised when a save destination can't be resolved
+    """
+
+class SavePlan(object):
+    """
+    Where and under which name a scene gets saved
+    """
+    def __init__(self, dept_folder, file_name, version=None):
+        self.dept_folder = dept_folder
+        self.file_name = file_name
+        self.full_path = os.path.join(dept_folder, file_name)
+        self.file_type = maya_file_type(file_name)
+        self.version = version
+
+    def __repr__(self):
+        return f"SavePlan({self.full_path!r})"
+
+    def exists(self):
+        return os.path.exists(self.full_path)
+
+class SavePlanner(object):
+    """
+    Resolves save destinations from the project dict, independent of any UI
+
+    The Scene Saver window and the batch entry point both plan their saves here.
+    """
+    def __init__(self, project_dict=None, version_index=None):
+        self.project_dict = project_dict or {}
+        self.version_index = version_index or VersionIndex()
+
+    @classmethod
+    def for_project(cls, root_path):
+        """
+        Planner for a project root, crawled through the persisted project index
+        """
+        index = ProjectIndex(root_path).scan(previous=ProjectIndex.load(root_path))
+        try:
+            index.save()
+        except OSError:
+            pass
+        return cls(index.to_project_dict())
+
+    def shot_path(self, ep, sq, sh):
+        """
+        Folder of a shot, None when it is not part of the project
+        """
+        if not self.project_dict:
+            return None
+
+        episodes = next(iter(self.project_dict.values()))
+        return episodes.get(ep, {}).get(sq, {}).get(sh)
+
+    def dept_folder(self, fields):
+        """
+        Department folder for the ep/sq/sh/dept fields, None when the shot is not part of the project
+        """
+        shot_path = self.shot_path(fields["ep"], fields["sq"], fields["sh"])
+        return os.path.join(shot_path, fields["dept"]) if shot_path else None
+
+    def resolve_version(self, fields, name_format, refresh=False):
+        """
+        Set fields["ver"] to the next free version in the department folder and return it
+
+        Returns None, leaving fields untouched, when the shot can't be resolved or
+        the name format has no version placeholder. refresh drops the cached
+        listing first, e.g. right before writing.
+        """
+        dept_folder = self.dept_folder(fields)
+        if not dept_folder:
+            return None
+
+        if refresh:
+            self.version_index.invalidate(dept_folder)
+
+        version = self.version_index.next_version(dept_folder, name_format, fields)
+        if version is not None:
+            fields["ver"] = version_token(version)
+        return version
+
+    def plan(self, fields, name_format, auto_version=False, refresh=False):
+        """
+        Plan the save of a scene from its placeholder values
+        """
+        dept_folder = self.dept_folder(fields)
+        if not dept_folder:
+            raise SavePlanError(f"Shot {fields['ep']}/{fields['sq']}/{fields['sh']} is not part of the project")
+
+        template = compile_name_format(name_format)
+        fields = dict(fields)
+        version = self.resolve_version(fields, name_format, refresh) if auto_version else None
+
+        return SavePlan(dept_folder, template.render(fields), version)
+
+HOOK_PHASES = ("pre_save", "post_save")
+
+def hooks_config_path(root_path):
+    """
+    Save hooks of a project, next to its name formats and hierarchy rules
+    """
+    return os.path.join(root_path, ".scene_saver", "hooks.json")
+
+class SaveHookError(RuntimeError):
+    """
+    Raised when a required pre-save stage fails, the scene is not saved
+    """
+
+def delete_unknown_nodes(context):
+    """
+    Delete unknown nodes and forget unknown plugin requirements, left by plugins that aren't loaded
+    """
+    import maya.cmds as cmds  # Imported here so the core stays importable outside Maya
+
+    nodes = cmds.ls(type=("unknown", "unknownDag", "unknownTransform")) or []
+    nodes = [node for node in nodes if not cmds.referenceQuery(node, isNodeReferenced=True)]
+    if nodes:
+        cmds.lockNode(nodes, lock=False)
+        cmds.delete(nodes)
+
+    plugins = cmds.unknownPlugin(query=True, list=True) or []
+    for plugin in plugins:
+        cmds.unknownPlugin(plugin, remove=True)
+    return f"{len(nodes)} nodes, {len(plugins)} plugins"
+
+def delete_unused_nodes(context):
+    """
+    Delete shading nodes nothing uses, as Hypershade's "Delete Unused Nodes" does
+    """
+    import maya.cmds as cmds
+    import maya.mel as mel
+
+    before = len(cmds.ls())
+    mel.eval("MLdeleteUnused")
+    return f"{before - len(cmds.ls())} nodes"
+
+def delete_empty_groups(context):
+    """
+    Delete transforms without children or shapes, parents emptied on the way included
+    """
+    import maya.cmds as cmds
+
+    deleted = 0
+    while True:
+        empty = [node for node in cmds.ls(type="transform", long=True) or []
+                 if cmds.nodeType(node) == "transform" and not cmds.listRelatives(node, children=True)
+                 and not cmds.referenceQuery(node, isNodeReferenced=True) and not cmds.lockNode(node, query=True)[0]]
+        if not empty:
+            return f"{deleted} groups"
+        cmds.delete(empty)
+        deleted += len(empty)
+
+BUILTIN_HOOKS = {
+    "delete_unknown_nodes": delete_unknown_nodes,
+    "delete_unused_nodes": delete_unused_nodes,
+    "delete_empty_groups": delete_empty_groups,
+}
+
+class HookStage(object):
+    """
+    One stage of a hook pipeline: a function called with the save context
+
+    function is a callable, a BUILTIN_HOOKS name or a "module.function" path
+    imported on the first run, so a broken studio module only fails its stage.
+    The function's return value, if any, is reported as the stage's detail.
+    """
+    def __init__(self, name, function=None, optional=True):
+        self.name = name
+        self.function = function or name
+        self.optional = optional
+
+    def __repr__(self):
+        return f"HookStage({self.name!r}, optional={self.optional})"
+
+    @classmethod
+    def from_config(cls, value):
+        """
+        A stage from a hooks.json entry, a name or {"stage": name, "optional": bool}
+        """
+        if isinstance(value, str):
+            return cls(value)
+        if isinstance(value, dict) and isinstance(value.get("stage"), str):
+            return cls(value["stage"], optional=bool(value.get("optional", True)))
+        raise ValueError(f"Invalid hook stage {value!r}")
+
+    def resolve(self):
+        if callable(self.function):
+            return self.function
+        if self.function in BUILTIN_HOOKS:
+            self.function = BUILTIN_HOOKS[self.function]
+        else:
+            module_name, _, function_name = self.function.rpartition(".")
+            if not module_name:
+                raise ValueError(f"Unknown hook {self.function!r}, expected a built-in hook or module.function")
+            self.function = getattr(importlib.import_module(module_name), function_name)
+        return self.function
+
+class HookPipeline(object):
+    """
+    Ordered pre-save and post-save stages registered per department
+
+    Pre-save stages run on the calling thread, Maya's main thread, right before
+    the scene is written: scene clean-ups that make the file smaller, checks.
+    Post-save stages run in order on a worker thread once the file is in place,
+    so uploads or notifications never hold the artist up; they must not call
+    Maya, or must go through maya.utils.executeDeferred.
+
+    Every stage is timed into the PerfRecorder and reported as a result dict
+    {"stage", "phase", "ms", "detail", "error"}. A failing optional stage is
+    reported and the pipeline goes on, a failing required pre-save stage raises
+    SaveHookError and the save is abandoned.
+
+    Stages for a department replace the project wide ones of the same phase.
+    """
+    def __init__(self, root_path=None, perf=None):
+        self.root_path = root_path
+        self.perf = perf or PerfRecorder(enabled=False)
+        self.stages = {}  # (phase, department or None) -> [HookStage]
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_hooks")
+
+    @classmethod
+    def from_dict(cls, data, root_path=None, perf=None):
+        """
+        Pipeline from hooks.json data:
+
+            {"pre_save": [...], "post_save": [...], "departments": {"Lighting": {"pre_save": [...]}}}
+        """
+        pipeline = cls(root_path, perf)
+        departments = data.get("departments") or {}
+        if not isinstance(departments, dict):
+            raise ValueError("departments must map department names to their stages")
+
+        for department, phases in [(None, data)] + sorted(departments.items()):
+            for phase in HOOK_PHASES:
+                for value in phases.get(phase) or ():
+                    pipeline.register(phase, HookStage.from_config(value), department)
+        return pipeline
+
+    @classmethod
+    def for_project(cls, root_path, perf=None):
+        """
+        Pipeline of a project's hooks.json, an empty one when it has none or it can't be read
+        """
+        config_path = hooks_config_path(root_path)
+        if os.path.isfile(config_path):
+            try:
+                with open(config_path, "r") as file:
+                    return cls.from_dict(json.load(file), root_path, perf)
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Ignoring the save hooks in {config_path}: {e}")
+        return cls(root_path, perf)
+
+    def register(self, phase, stage, department=None):
+        """
+        Append a stage to a phase, for one department or the whole project
+        """
+        if phase not in HOOK_PHASES:
+            raise ValueError(f"Unknown hook phase {phase!r}, expected one of {', '.join(HOOK_PHASES)}")
+        self.stages.setdefault((phase, department), []).append(stage)
+
+    def stages_for(self, phase, department):
+        stages = self.stages.get((phase, department))
+        return self.stages.get((phase, None), []) if stages is None else stages
+
+    def context(self, file_path, fields, file_type):
+        """
+        What the stages are called with: the scene's path, placeholder values, Maya file type and project root
+        """
+        return {"path": file_path, "fields": dict(fields), "file_type": file_type, "project_root": self.root_path}
+
+    def run_stage(self, phase, stage, context):
+        result = {"stage": stage.name, "phase": phase, "ms": None, "detail": None, "error": None}
+        start = time.perf_counter()
+        try:
+            detail = stage.resolve()(context)
+            result["detail"] = None if detail is None else str(detail)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+
+        result["ms"] = round(seconds * 1000, 3)
+        self.perf.record(f"{phase}:{stage.name}", seconds)
+        return result
+
+    def run_pre(self, context):
+        """
+        Run the pre-save stages of the scene's department in order, returns their results
+        """
+        results = []
+        for stage in self.stages_for("pre_save", context["fields"].get("dept")):
+            result = self.run_stage("pre_save", stage, context)
+            results.append(result)
+            if result["error"] is not None and not stage.optional:
+                raise SaveHookError(f"Required pre-save stage {stage.name} failed: {result['error']}")
+        return results
+
+    def run_post(self, context, on_done=None, wait=False):
+        """
+        Queue the post-save stages, on_done(context, results) is called from the worker thread
+
+        Returns the future, or None when the department has no post-save stages.
+        """
+        stages = self.stages_for("post_save", context["fields"].get("dept"))
+        if not stages:
+            return None
+        future = self.executor.submit(self._run_post, stages, context, on_done)
+        return future.result() if wait else future
+
+    def _run_post(self, stages, context, on_done):
+        # The scene is already saved, a failing stage is reported and the next one still runs
+        results = [self.run_stage("post_save", stage, context) for stage in stages]
+
+        self.perf.write({"event": "post_save", "session": self.perf.session_id, "path": context["path"],
+                         "time": datetime.now().isoformat(timespec="seconds"), "stages": results})
+        if on_done is not None:
+            on_done(context, results)
+        return results
+
+    @staticmethod
+    def describe(results):
+        """
+        One line summary of stage results, "delete_unknown_nodes 12.1 ms (3 nodes), notify failed: ..."
+        """
+        parts = []
+        for result in results:
+            if result["error"] is not None:
+                parts.append(f"{result['stage']} failed: {result['error']}")
+            else:
+                parts.append(f"{result['stage']} {result['ms']:.1f} ms" + (f" ({result['detail']})" if result["detail"] else ""))
+        return ", ".join(parts)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+PUBLISH_TAGS = ("PUB", "FNL")
+DEFAULT_PUBLISH_FOLDER = "publish/{ep}/{sq}/{sh}/{dept}/{tag}_{ver}"  # Relative to the project root
+PUBLISH_WORKERS = 8  # Files copied and hashed at once, hashlib releases the GIL
+PUBLISH_MANIFEST_NAME = "publish_manifest.json"
+PUBLISH_MANIFEST_FORMAT = 1
+FILE_TOKEN_RE = re.compile(r"<udim>|<uvtile>|<u>|<v>|<f\d*>|#+", re.IGNORECASE)  # Tiles and frames in texture and cache paths
+
+def publish_config_path(root_path):
+    """
+    Publish settings of a project, next to its name formats and hierarchy rules
+    """
+    return os.path.join(root_path, ".scene_saver", "publish.json")
+
+def expand_file_tokens(file_path):
+    """
+    Files matching a path with UDIM, tile or frame tokens, the path itself when it has none or nothing matches
+    """
+    if not FILE_TOKEN_RE.search(file_path):
+        return [file_path]
+    parts = FILE_TOKEN_RE.split(file_path)
+    return sorted(glob.glob("*".join(glob.escape(part) for part in parts))) or [file_path]
+
+def scene_dependencies():
+    """
+    Files the open scene uses (references, textures, caches), from Maya's file list, without the scene itself
+
+    Must run on Maya's main thread.
+    """
+    import maya.cmds as cmds  # Imported here so the core stays importable outside Maya
+
+    scene = os.path.normcase(os.path.normpath(cmds.file(query=True, sceneName=True) or "."))
+    dependencies = set()
+    for listed_path in cmds.file(query=True, list=True, withoutCopyNumber=True) or []:
+        for file_path in expand_file_tokens(listed_path):
+            file_path = os.path.normpath(file_path)
+            if os.path.normcase(file_path) != scene:
+                dependencies.add(file_path)
+    return sorted(dependencies)
+
+class PublishError(IOError):
+    """
+    Raised when a publish folder can't be resolved, or files of a publish could not be copied
+    """
+
+class Publisher(object):
+    """
+    Copies a published scene and the files it uses into its publish folder, in the background
+
+        <publish folder>/<scene file>
+        <publish folder>/deps/<path relative to the project root>
+        <publish folder>/deps/external/<absolute path>        files outside the project
+        <publish folder>/publish_manifest.json
+
+    Files are copied by a pool of threads, hashed while they stream and read back
+    to verify the copy before being renamed into place. A file already in the
+    publish folder with the same sha256 is left alone: its checksum comes from the
+    previous manifest when neither copy changed size or mtime since, otherwise
+    both are hashed. The manifest lists every file with its source, size, sha256
+    and status ("copied", "unchanged", "missing" or "failed").
+
+    Publishes run one after the other on a worker thread, the caller only
+    gathers the dependencies. The copied scene keeps pointing at the original
+    dependency paths.
+    """
+    def __init__(self, root_path=None, folder_format=DEFAULT_PUBLISH_FOLDER, tags=PUBLISH_TAGS, workers=PUBLISH_WORKERS):
+        self.root_path = os.path.normpath(root_path) if root_path else None
+        self.folder_format = folder_format
+        self.tags = tuple(tags)
+        self.workers = max(1, int(workers))
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_publish")
+
+    @classmethod
+    def for_project(cls, root_path):
+        """
+        Publisher of a project's publish.json ({"folder", "tags", "workers"}, all optional), defaults otherwise
+        """
+        config_path = publish_config_path(root_path)
+        if os.path.isfile(config_path):
+            try:
+                with open(config_path, "r") as file:
+                    data = json.load(file)
+                return cls(root_path, data.get("folder", DEFAULT_PUBLISH_FOLDER), data.get("tags", PUBLISH_TAGS),
+                           data.get("workers", PUBLISH_WORKERS))
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                print(f"Ignoring the publish settings in {config_path}: {e}")
+        return cls(root_path)
+
+    def publishes(self, tag):
+        return tag in self.tags
+
+    def publish_folder(self, fields):
+        """
+        Publish folder of a scene, the folder format rendered with its placeholder values
+        """
+        try:
+            folder = self.folder_format.format(**fields)
+        except (KeyError, IndexError, ValueError) as e:
+            raise PublishError(f"Invalid publish folder {self.folder_format!r}: {e}")
+        if self.root_path is None and not os.path.isabs(folder):
+            raise PublishError("No project is open to publish into")
+        return os.path.normpath(os.path.join(self.root_path or "", folder))
+
+    def dependency_path(self, file_path):
+        """
+        Path of a dependency inside the publish folder
+        """
+        rel_path = None
+        if self.root_path:
+            try:
+                rel_path = os.path.relpath(file_path, self.root_path)
+            except ValueError:  # Another Windows drive
+                pass
+        if rel_path is None or rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            drive, tail = os.path.splitdrive(file_path)
+            rel_path = os.path.join("external", drive.strip("\\/").replace(":", ""), tail.lstrip("\\/"))
+        return os.path.join("deps", rel_path)
+
+    def publish(self, scene_path, fields, dependencies, on_done=None, wait=False):
+        """
+        Queue the publish of a saved scene, on_done(publish_folder, manifest, error) is called from the worker thread
+
+        Raises PublishError right away when the publish folder can't be resolved.
+        """
+        publish_folder = self.publish_folder(fields)
+        items = [(scene_path, os.path.basename(scene_path))]
+        items.extend((file_path, self.dependency_path(file_path)) for file_path in dependencies)
+
+        future = self.executor.submit(self._publish, publish_folder, scene_path, dict(fields), items, on_done)
+        return future.result() if wait else future
+
+    def _publish(self, publish_folder, scene_path, fields, items, on_done):
+        manifest_path = os.path.join(publish_folder, PUBLISH_MANIFEST_NAME)
+        previous = self.read_manifest(manifest_path)
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scene_saver_publish_copy") as pool:
+            files = list(pool.map(lambda item: self.publish_file(item[0], publish_folder, item[1], previous), items))
+
+        manifest = {
+            "format": PUBLISH_MANIFEST_FORMAT,
+            "scene": os.path.basename(scene_path),
+            "source": scene_path,
+            "fields": fields,
+            "artist": fields.get("artist") or current_artist(),
+            "published_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - start, 3),
+            "files": files,
+        }
+
+        error = None
+        failed = [record for record in files if record["status"] in ("missing", "failed")]
+        try:
+            write_json_atomic(manifest_path, manifest, indent=4)
+        except OSError as e:
+            error = e
+        if error is None and failed:
+            error = PublishError(f"{len(failed)} of {len(files)} files could not be published, see {manifest_path}")
+
+        if on_done is not None:
+            on_done(publish_folder, manifest, error)
+        return manifest
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        {path: file record} of a publish folder's manifest, empty when there is none or it can't be read
+        """
+        try:
+            with open(manifest_path, "r") as file:
+                return {record["path"]: record for record in json.load(file).get("files", []) if record.get("sha256")}
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            return {}
+
+    def publish_file(self, src_path, publish_folder, rel_path, previous):
+        """
+        Copy one file into the publish folder unless an identical copy is there, returns its manifest record
+        """
+        record = {"source": src_path, "path": rel_path.replace(os.sep, "/"), "size": None, "sha256": None, "status": None}
+        dst_path = os.path.join(publish_folder, rel_path)
+
+        try:
+            src_stat = os.stat(src_path)
+        except OSError:
+            record["status"] = "missing"
+            return record
+
+        try:
+            checksum = self.unchanged_checksum(src_path, src_stat, dst_path, previous.get(record["path"]))
+            record["status"] = "copied" if checksum is None else "unchanged"
+            if checksum is None:
+                checksum = transfer_file(src_path, dst_path)
+            dst_stat = os.stat(dst_path)
+        except OSError as e:
+            record.update(status="failed", error=str(e))
+            return record
+
+        record.update(size=dst_stat.st_size, sha256=checksum, mtime_ns=dst_stat.st_mtime_ns,
+                      source_size=src_stat.st_size, source_mtime_ns=src_stat.st_mtime_ns)
+        return record
+
+    @staticmethod
+    def unchanged_checksum(src_path, src_stat, dst_path, previous):
+        """
+        sha256 of the source when the publish folder already holds an identical copy, None when it must be copied
+        """
+        try:
+            dst_stat = os.stat(dst_path)
+        except OSError:
+            return None
+        if dst_stat.st_size != src_stat.st_size:
+            return None
+
+        # Neither copy touched since the last publish verified them, no need to read either
+        if (previous is not None and previous.get("size") == dst_stat.st_size and previous.get("mtime_ns") == dst_stat.st_mtime_ns
+                and previous.get("source_size") == src_stat.st_size and previous.get("source_mtime_ns") == src_stat.st_mtime_ns):
+            return previous["sha256"]
+
+        checksum = file_checksum(src_path)
+        if previous is not None and previous.get("size") == dst_stat.st_size and previous.get("mtime_ns") == dst_stat.st_mtime_ns:
+            dst_checksum = previous["sha256"]
+        else:
+            dst_checksum = file_checksum(dst_path)
+        return checksum if checksum == dst_checksum else None
+
+    @staticmethod
+    def describe(manifest):
+        """
+        One line summary of a publish, "12 copied, 30 unchanged, 1 missing (4.2 s)"
+        """
+        counts = {}
+        for record in manifest["files"]:
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        statuses = ", ".join(f"{counts[status]} {status}" for status in ("copied", "unchanged", "missing", "failed") if status in counts)
+        return f"{statuses} ({manifest['seconds']:.1f} s)"
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+class MigrationStep(object):
+    """
+    One file of a name format migration
+
+    status is "rename", "collision" (never executed), "mismatch" (the old name
+    disagrees with the folder the file is in) or "missing" (the new format needs
+    a value the old name and its location don't provide).
+    """
+    def __init__(self, src_path, dst_path, status="rename", reason=""):
+        self.src_path = src_path
+        self.dst_path = dst_path
+        self.status = status
+        self.reason = reason
+
+    def __repr__(self):
+        return f"MigrationStep({self.src_path!r}, {self.dst_path!r}, {self.status!r})"
+
+# Placeholders a parsed name must agree on with the folder the file lives in
+LOCATION_FIELDS = ("ep", "sq", "sh", "dept")
+
+def department_folders(project_index):
+    """
+    Yield (fields, dept_folder) for every department folder of every shot in the index
+    """
+    project_name, episodes = next(iter(project_index.to_project_dict().items()))
+
+    for ep, sequences in episodes.items():
+        for sq, shots in sequences.items():
+            for sh, shot_path in shots.items():
+                for dept in project_index.subfolders(project_index.rel_path(shot_path)):
+                    if dept in (BACKUP_FOLDER_NAME, BACKUP_STORE_FOLDER_NAME) or project_index.rules.is_ignored(dept):
+                        continue
+                    fields = {"proj": project_name.replace(" ", ""), "ep": ep, "sq": sq, "sh": sh, "dept": dept}
+                    yield fields, os.path.join(shot_path, dept)
+
+def plan_migration(project_index, old_format, new_format, overrides=None, workers=8):
+    """
+    Plan renaming every file named with old_format to new_format
+
+    Values come from the project location (proj/ep/sq/sh/dept), then from the
+    parsed old name, then from overrides. Department folders are listed in
+    parallel. Files the old format doesn't match are left out of the plan.
+    """
+    old_template = compile_name_format(old_format)
+    new_template = compile_name_format(new_format)
+    folders = list(department_folders(project_index))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        listings = executor.map(list_files, [dept_folder for _fields, dept_folder in folders])
+
+    steps = []
+    for (location, dept_folder), file_names in zip(folders, listings):
+        for file_name in sorted(file_names):
+            parsed = old_template.parse(file_name)
+            if parsed is None:
+                continue
+
+            src_path = os.path.join(dept_folder, file_name)
+
+            # An ambiguous format can parse a name into the wrong fields, never rename on a guess
+            wrong = [field for field in LOCATION_FIELDS if field in parsed and parsed[field] != location[field]]
+            if wrong:
+                steps.append(MigrationStep(src_path, None, "mismatch", "name disagrees with its folder on " + ", ".join(wrong)))
+                continue
+
+            values = dict(location, **parsed)
+            values.update(overrides or {})
+
+            missing = [field for field in new_template.fields if field not in values]
+            if missing:
+                steps.append(MigrationStep(src_path, None, "missing", "no value for " + ", ".join(missing)))
+                continue
+
+            new_name = new_template.render(values)
+            if new_name != file_name:
+                steps.append(MigrationStep(src_path, os.path.join(dept_folder, new_name)))
+
+    mark_collisions(steps)
+    return steps
+
+def mark_collisions(steps):
+    """
+    Flag renames whose destination already exists or is shared by several files
+
+    A destination that exists is a collision even when that file is itself being
+    renamed, as parallel renames can't guarantee it moves out of the way first.
+    """
+    targets = {}
+    for step in steps:
+        if step.status == "rename":
+            targets.setdefault(os.path.normcase(step.dst_path), []).append(step)
+
+    for shared in targets.values():
+        for step in shared:
+            if len(shared) > 1:
+                step.status = "collision"
+                step.reason = f"{len(shared)} files would be renamed to {os.path.basename(step.dst_path)}"
+            elif os.path.exists(step.dst_path):
+                step.status = "collision"
+                step.reason = f"{os.path.basename(step.dst_path)} already exists"
+
+class MigrationJournal(object):
+    """
+    Append-only journal of a migration: the planned renames, then each rename as it is done
+
+    A run that gets interrupted leaves a journal without its "finished" line, and
+    resuming replays the planned renames that aren't marked done instead of
+    planning again from a half renamed project.
+    """
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.lock = threading.Lock()
+
+    def _append(self, records):
+        with self.lock, open(self.journal_path, "a") as journal:
+            journal.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+            journal.flush()
+
+    def start(self, steps, old_format, new_format):
+        """
+        Start a new journal with the renames of a plan
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, "w"):
+            pass
+
+        records = [{"old_format": old_format, "new_format": new_format}]
+        records.extend({"step": [step.src_path, step.dst_path]} for step in steps if step.status == "rename")
+        self._append(records)
+
+    def record(self, step):
+        self._append([{"done": step.src_path}])
+
+    def finish(self):
+        self._append([{"finished": True}])
+
+    def pending(self, old_format, new_format):
+        """
+        Planned renames not done yet by an unfinished migration between the same formats, None when there is none
+        """
+        header = None
+        steps = []
+        done = set()
+        finished = False
+
+        try:
+            with open(self.journal_path, "r") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line of an interrupted run
+
+                    if "old_format" in record:
+                        header = record
+                    elif "step" in record:
+                        steps.append(MigrationStep(*record["step"]))
+                    elif "done" in record:
+                        done.add(record["done"])
+                    elif record.get("finished"):
+                        finished = True
+        except OSError:
+            return None
+
+        if finished or header != {"old_format": old_format, "new_format": new_format}:
+            return None
+
+        return [step for step in steps if step.src_path not in done]
+
+def rename_no_replace(src_path, dst_path):
+    """
+    Rename a file or folder, raising FileExistsError rather than replacing an existing destination
+
+    A file is hard linked under its new name, which fails atomically when the
+    name is taken, then unlinked under the old one. Folders, and filesystems
+    without hard links, fall back to a rename checked just before.
+    """
+    if not os.path.isdir(src_path):
+        try:
+            os.link(src_path, dst_path)
+        except FileExistsError:
+            raise
+        except OSError:
+            pass  # No hard links here
+        else:
+            try:
+                os.unlink(src_path)
+            except OSError:
+                os.unlink(dst_path)
+                raise
+            return
+
+    if os.path.lexists(dst_path):
+        raise FileExistsError(f"{dst_path} already exists")
+    try:
+        os.rename(src_path, dst_path)
+    except (IsADirectoryError, NotADirectoryError):
+        raise FileExistsError(f"{dst_path} already exists")
+
+def execute_migration(steps, journal, workers=8, resuming=False):
+    """
+    Run the renames of a plan in parallel, one task per folder, and return (done, skipped, failed)
+
+    Collisions and other blocked steps are skipped. A rename never overwrites: a
+    destination that appeared since planning fails the step. When resuming, a
+    step whose file is already under its new name was renamed by the interrupted
+    run before it could be journaled, and counts as done.
+    """
+    folders = {}
+    skipped = []
+    for step in steps:
+        if step.status != "rename":
+            skipped.append(step)
+        else:
+            folders.setdefault(os.path.dirname(step.src_path), []).append(step)
+
+    def rename_folder(folder_steps):
+        done, failed = [], []
+        for step in folder_steps:
+            try:
+                if resuming and not os.path.lexists(step.src_path) and os.path.lexists(step.dst_path):
+                    journal.record(step)
+                    done.append(step)
+                    continue
+                rename_no_replace(step.src_path, step.dst_path)
+                journal.record(step)
+                done.append(step)
+            except OSError as e:
+                step.reason = str(e)
+                failed.append(step)
+        return done, failed
+
+    done, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for folder_done, folder_failed in executor.map(rename_folder, folders.values()):
+            done.extend(folder_done)
+            failed.extend(folder_failed)
+
+    return done, skipped, failed
+
+# Upper bounds in ms of the histogram buckets, slower spans land in one last bucket
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+PERF_LOG_MAX_BYTES = 5 * 1024 * 1024  # Size at which the performance log is rotated
+PERF_LOG_BACKUPS = 3  # Rotated performance logs kept, perf.jsonl.1 being the most recent
+
+def perf_log_path():
+    """
+    JSONL file the performance log is appended to, SCENE_SAVER_PERF_LOG overrides the default
+    """
+    return os.environ.get("SCENE_SAVER_PERF_LOG") or os.path.join(os.path.expanduser("~"), ".scene_saver", "perf", "perf.jsonl")
+
+def append_jsonl_rotating(file_path, record, max_bytes=PERF_LOG_MAX_BYTES, backups=PERF_LOG_BACKUPS):
+    """
+    Append a record as one JSON line, first rotating the file to file_path.1 ... file_path.<backups> once it is full
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    try:
+        full = os.path.getsize(file_path) >= max_bytes
+    except OSError:
+        full = False
+
+    if full:
+        try:
+            for number in range(backups - 1, 0, -1):
+                if os.path.exists(f"{file_path}.{number}"):
+                    os.replace(f"{file_path}.{number}", f"{file_path}.{number + 1}")
+            if backups:
+                os.replace(file_path, file_path + ".1")
+            else:
+                os.remove(file_path)
+        except OSError:
+            pass  # Another session rotated it first
+
+    with open(file_path, "a") as file:
+        file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+def mount_point(path):
+    """
+    Mount point a path lives on, walking up from the path until os.path.ismount
+    """
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def filesystem_type(mount_path):
+    """
+    Filesystem type of a mount point from /proc/mounts ("nfs4", "ext4", ...), None where it is unknown
+    """
+    try:
+        with open("/proc/mounts", "r") as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) > 2 and fields[1].replace("\\040", " ") == mount_path:
+                    return fields[2]
+    except OSError:
+        pass
+    return None
+
+def destination_info(path):
+    """
+    Size, mount point and filesystem type of a saved file, to tell a slow share from a big scene
+    """
+    try:
+        size = os.path.getsize(path) if os.path.isfile(path) else None
+    except OSError:
+        size = None
+
+    mount = mount_point(path)
+    return {"size": size, "mount": mount, "fs_type": filesystem_type(mount)}
+
+class Histogram(object):
+    """
+    Count, total, extremes and bucketed distribution of the durations of one kind of span
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else None,
+            "min_ms": round(self.min * 1000, 3) if self.min is not None else None,
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+class PerfSpan(object):
+    """
+    Context manager timing one span, cheaper than a generator based one on hot paths
+    """
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class PerfRecorder(object):
+    """
+    Times named spans, keeps a histogram per span name and appends records to the performance log
+
+    Spans can be recorded from any thread. An operation groups the spans of one
+    action on the current thread, a save or a scan, into a single log record along
+    with the size, mount point and filesystem type of its path, so a slow save can
+    be told apart as a slow share, a big scene or a slow window. The session record
+    written by flush_session holds the histograms of every span. Log records are
+    written on a background thread and a failing write never reaches the caller.
+    """
+    def __init__(self, log_path=None, enabled=True):
+        self.log_path = log_path or perf_log_path()
+        self.enabled = enabled
+        self.session_id = uuid.uuid4().hex[:8]
+        self.session_start = time.time()
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene_saver_perf")
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Recorder logging to perf_log_path(), SCENE_SAVER_PERF=0 keeps the histograms but writes no log
+        """
+        return cls(enabled=os.environ.get("SCENE_SAVER_PERF", "1") != "0")
+
+    def record(self, name, seconds):
+        """
+        Add a duration to the histogram of name and to the operation running on this thread
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+        operation_spans = getattr(self.local, "spans", None)
+        if operation_spans is not None:
+            operation_spans[name] = operation_spans.get(name, 0.0) + seconds
+
+    def span(self, name):
+        """
+        Time the body of a with block as a span called name
+        """
+        return PerfSpan(self, name)
+
+    @contextlib.contextmanager
+    def operation(self, kind, profile=False):
+        """
+        Time one action and log it with the spans recorded meanwhile, yields a dict to describe it
+
+        A "path" in the yielded dict adds its size, mount point and filesystem type to
+        the record. With profile set the action runs under cProfile and the path of
+        the dumped stats is stored under "profile".
+        """
+        info = {}
+        self.local.spans = spans = {}
+        profiler = cProfile.Profile() if profile else None
+        error = None
+        start = time.perf_counter()
+
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield info
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            self.local.spans = None
+            self.record(kind, elapsed)
+
+            record = dict(info, event=kind, session=self.session_id, time=datetime.now().isoformat(timespec="seconds"),
+                          total_ms=round(elapsed * 1000, 3),
+                          spans={name: round(seconds * 1000, 3) for name, seconds in spans.items()})
+            if error is not None:
+                record["error"] = repr(error)
+            if profiler is not None:
+                info["profile"] = record["profile"] = self.dump_profile(profiler, kind)
+
+            self.write(record)
+
+    def dump_profile(self, profiler, kind):
+        """
+        Write cProfile stats next to the log and return their path, None when they can't be written
+        """
+        profile_path = os.path.join(os.path.dirname(self.log_path),
+                                    f"{kind}_{datetime.now():%Y%m%d_%H%M%S}_{self.session_id}.prof")
+        try:
+            os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+            profiler.dump_stats(profile_path)
+        except OSError as e:
+            print(f"Could not write the profile: {e}")
+            return None
+        return profile_path
+
+    def write(self, record):
+        """
+        Queue a record for the log, the destination is looked up on the log thread as well
+        """
+        if self.enabled:
+            self.executor.submit(self._write, record)
+
+    def _write(self, record):
+        try:
+            if record.get("path"):
+                record.update(destination_info(record["path"]))
+            append_jsonl_rotating(self.log_path, record)
+        except OSError as e:
+            print(f"Could not write the performance log: {e}")
+
+    def summary(self):
+        """
+        {span name: histogram dict} of everything recorded this session
+        """
+        with self.lock:
+            return {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+
+    def flush_session(self):
+        """
+        Log the session histograms and start a new session
+        """
+        histograms = self.summary()
+        if histograms:
+            self.write({"event": "session", "session": self.session_id,
+                        "time": datetime.fromtimestamp(self.session_start).isoformat(timespec="seconds"),
+                        "duration_s": round(time.time() - self.session_start, 1), "histograms": histograms})
+
+        with self.lock:
+            self.histograms = {}
+        self.session_id = uuid.uuid4().hex[:8]
+        self.session_start = time.time()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
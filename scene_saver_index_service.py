@@ -0,0 +1,50 @@
+"""
+Serve the project index to Scene Saver windows, so artists don't each crawl the share
+
+Crawls the given project roots, re-crawls them every --interval seconds (only
+folders whose mtime changed are listed again) and answers the windows whose
+SCENE_SAVER_INDEX_SERVICE points at the same address. Windows that can't reach
+the service, or open a root it doesn't serve, crawl the project themselves.
+
+Usage:
+    python scene_saver_index_service.py --listen unix:/tmp/scene_saver_index.sock --root /shows/MyShow
+    python scene_saver_index_service.py --listen 0.0.0.0:8642 --root /shows/MyShow --root /shows/Other --interval 60
+"""
+import sys
+import signal
+import argparse
+
+from scene_saver_core import INDEX_SERVICE_INTERVAL, ProjectIndexService, parse_service_address
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Serve the project index to Scene Saver windows")
+    parser.add_argument("--listen", required=True, help="unix:<socket path> or <host>:<port> to listen on")
+    parser.add_argument("--root", action="append", required=True, help="Project root to serve, can be repeated")
+    parser.add_argument("--interval", type=float, default=INDEX_SERVICE_INTERVAL,
+                        help=f"Seconds between crawls of each root (default: {INDEX_SERVICE_INTERVAL})")
+    return parser.parse_args(argv)
+
+def stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt  # Shut down like Ctrl+C, removing the socket file
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        parse_service_address(args.listen)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    service = ProjectIndexService(args.root, args.interval)
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    print(f"Serving {len(service.roots)} project(s) on {args.listen}")
+    try:
+        service.serve(args.listen)
+    except OSError as e:
+        raise SystemExit(f"Could not listen on {args.listen}: {e}")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Query the save ledger of a project
+
+Every save made with Scene Saver is added to <project>/.scene_saver/ledger.sqlite,
+so the latest version of a shot's department and who saved what are answered
+from it without listing the project folders. "import" fills the ledger from the
+department history manifests of saves made before it existed.
+
+Usage:
+    python scene_saver_ledger.py --project <root> latest --ep EP01 --sq SQ010 --sh SH0010 --dept Animation --tag PUB --tag FNL
+    python scene_saver_ledger.py --project <root> activity [--artist jdoe] [--since 2026-10-01] [--limit 50]
+    python scene_saver_ledger.py --project <root> import
+
+--json prints the saves as JSON for other tools.
+"""
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+from scene_saver_core import ProjectIndex, SaveLedger
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date like 2026-10-01, got {value!r}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Query the save ledger of a project")
+    parser.add_argument("--project", required=True, help="Project root folder")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    latest = commands.add_parser("latest", help="Path of the latest version of a shot's department")
+    latest.add_argument("--ep", required=True, help="Episode")
+    latest.add_argument("--sq", required=True, help="Sequence")
+    latest.add_argument("--sh", required=True, help="Shot")
+    latest.add_argument("--dept", required=True, help="Department")
+    latest.add_argument("--tag", action="append", default=[], help="Only these tags, e.g. --tag PUB --tag FNL")
+
+    activity = commands.add_parser("activity", help="Saves newest first, or the save count of every artist")
+    activity.add_argument("--artist", help="Saves of this artist, otherwise a summary per artist")
+    activity.add_argument("--since", type=parse_date, help="Only saves made since this date (YYYY-MM-DD)")
+    activity.add_argument("--limit", type=int, default=100, help="Saves listed for --artist (default: 100)")
+
+    commands.add_parser("import", help="Add the saves recorded in the department history manifests")
+    return parser.parse_args(argv)
+
+def print_save(save):
+    print(f"{save['timestamp']}  {save['artist'] or '-':<12} {save['tag'] or '-':<5} v{save['version'] or '-':<6} {save['path']}")
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    ledger = SaveLedger(args.project)
+
+    try:
+        if args.command == "import":
+            index = ProjectIndex(args.project).scan(previous=ProjectIndex.load(args.project))
+            print(f"{ledger.import_history(index)} saves added to {ledger.ledger_path}")
+            return 0
+
+        if not ledger.exists():
+            raise SystemExit(f"{args.project} has no save ledger yet, run the import command to create it from the history manifests")
+
+        if args.command == "latest":
+            save = ledger.latest(args.ep, args.sq, args.sh, args.dept, args.tag)
+            if args.json:
+                print(json.dumps(save, indent=4))
+            elif save:
+                print(save["path"])
+            return 0 if save else 1
+
+        if args.artist:
+            saves = ledger.activity(args.artist, args.since, args.limit)
+            if args.json:
+                print(json.dumps(saves, indent=4))
+            else:
+                for save in saves:
+                    print_save(save)
+            return 0
+
+        artists = ledger.artists(args.since)
+        if args.json:
+            print(json.dumps(artists, indent=4))
+        else:
+            for artist in artists:
+                print(f"{artist['artist'] or '-':<16} {artist['saves']:6d} saves, last {artist['last_save']}")
+        return 0
+    except sqlite3.Error as e:
+        raise SystemExit(f"Could not read the save ledger {ledger.ledger_path}: {e}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Rename existing scenes from one name format to another
+
+Every department folder of the project is listed, files matching the old format
+are parsed and their new names rendered with the new format. Without --execute
+only the plan is printed, collisions included. Renames run in parallel across
+folders and are journaled, so running the same command again after an
+interruption resumes the planned renames that weren't done yet.
+
+Usage:
+    python scene_saver_migrate.py --project <root> --old-format "{sh}_{dept}_{ver}.{ftype}" \\
+        --new-format "{proj}_{ep}_{sq}_{sh}_{dept}_{tag}_{ver}.{ftype}" --set tag=WIP [--execute]
+"""
+import os
+import sys
+import argparse
+
+from scene_saver_core import ProjectIndex, MigrationJournal, NameFormatError, plan_migration, execute_migration
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Rename existing scenes from one name format to another")
+    parser.add_argument("--project", required=True, help="Project root folder")
+    parser.add_argument("--old-format", required=True, help="Name format the files currently use")
+    parser.add_argument("--new-format", required=True, help="Name format to rename them to")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE",
+                        help="Value for a placeholder the old names don't have, e.g. --set tag=WIP")
+    parser.add_argument("--journal", help="Journal of the renames done (default: <project>/.scene_saver/migration_journal.jsonl)")
+    parser.add_argument("--workers", type=int, default=8, help="Folders listed and renamed in parallel")
+    parser.add_argument("--execute", action="store_true", help="Rename the files, otherwise only print the plan")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        overrides = dict(value.split("=", 1) for value in args.set)
+    except ValueError:
+        raise SystemExit("--set expects FIELD=VALUE")
+
+    index = ProjectIndex(args.project).scan(previous=ProjectIndex.load(args.project))
+    journal = MigrationJournal(args.journal or os.path.join(index.root_path, ".scene_saver", "migration_journal.jsonl"))
+
+    # Resume an interrupted run of the same migration rather than planning from a half renamed project
+    steps = journal.pending(args.old_format, args.new_format)
+    resuming = steps is not None
+
+    if resuming:
+        print(f"Resuming an interrupted migration from {journal.journal_path}")
+    else:
+        try:
+            steps = plan_migration(index, args.old_format, args.new_format, overrides, args.workers)
+        except NameFormatError as e:
+            raise SystemExit(str(e))
+
+    renames = [step for step in steps if step.status == "rename"]
+    problems = [step for step in steps if step.status != "rename"]
+
+    for step in renames:
+        print(f"rename     {step.src_path} -> {os.path.basename(step.dst_path)}")
+    for step in problems:
+        print(f"{step.status:<11}{step.src_path}: {step.reason}")
+    print(f"{len(renames)} to rename, {len(problems)} blocked")
+
+    if not args.execute:
+        return 1 if problems else 0
+
+    if not resuming:
+        journal.start(steps, args.old_format, args.new_format)
+
+    done, skipped, failed = execute_migration(steps, journal, args.workers, resuming)
+
+    for step in failed:
+        print(f"failed     {step.src_path}: {step.reason}")
+    if not failed:
+        journal.finish()
+
+    print(f"{len(done)} renamed, {len(skipped)} skipped, {len(failed)} failed (journal: {journal.journal_path})")
+    return 1 if failed or problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
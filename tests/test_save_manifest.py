@@ -0,0 +1,66 @@
+"""
+The department save manifest shared by several Maya sessions, each played by a process
+"""
+import os
+import sys
+import time
+import json
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scene_saver_core import SaveManifest, locked_file
+
+NAME_FORMAT = "{sh}_{dept}_{tag}_{ver}.{ftype}"
+
+def append_save(dept_folder, file_name):
+    manifest = SaveManifest(dept_folder)
+    manifest.append(SaveManifest.make_entry("save", file_name, {"ver": "002"}, 4))
+
+def repair(dept_folder):
+    SaveManifest(dept_folder).repair(NAME_FORMAT)
+
+def recorded_files(dept_folder):
+    with open(os.path.join(dept_folder, ".scene_saver_history.jsonl")) as manifest:
+        return [json.loads(line)["file"] for line in manifest]
+
+def write_scene(dept_folder, file_name, size):
+    with open(os.path.join(dept_folder, file_name), "wb") as scene:
+        scene.write(b"\0" * size)
+
+def test_append_waits_for_another_session(tmp_path):
+    dept_folder = str(tmp_path)
+    context = multiprocessing.get_context("spawn")
+    manifest_path = os.path.join(dept_folder, ".scene_saver_history.jsonl")
+
+    with locked_file(manifest_path):  # Another session's repair in progress
+        process = context.Process(target=append_save, args=(dept_folder, "SH0010_Anim_WIP_002.ma"))
+        process.start()
+        time.sleep(1.0)
+        assert process.is_alive()
+        assert not os.path.exists(manifest_path)
+
+    process.join(30)
+    assert process.exitcode == 0
+    assert recorded_files(dept_folder) == ["SH0010_Anim_WIP_002.ma"]
+
+def test_save_during_repair_is_kept(tmp_path):
+    dept_folder = str(tmp_path)
+    context = multiprocessing.get_context("spawn")
+    for version in range(1, 21):
+        write_scene(dept_folder, f"SH0010_Anim_WIP_{version:03d}.ma", 4 * 1024 * 1024)  # Slow enough to hash
+
+    process = context.Process(target=repair, args=(dept_folder,))
+    process.start()
+    deadline = time.monotonic() + 30
+    while not os.path.exists(os.path.join(dept_folder, ".scene_saver_history.jsonl.lock")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)  # The repair has listed the folder and is hashing
+
+    # A save from this session while the other one repairs: the scene, then its record
+    write_scene(dept_folder, "SH0010_Anim_PUB_021.ma", 4)
+    append_save(dept_folder, "SH0010_Anim_PUB_021.ma")
+
+    process.join(60)
+    assert process.exitcode == 0
+    assert "SH0010_Anim_PUB_021.ma" in recorded_files(dept_folder)